@@ -0,0 +1,87 @@
+"""
+Compression ratio vs. throughput for the value codecs.
+
+Usage:
+    python benchmarks/bench_codec.py [--size BYTES] [--repeat N] [--json]
+
+The input is synthetic fp16 data drawn from N(0, scale), which is close to
+real K/V activations. Use --input to benchmark a dumped KV block instead.
+"""
+
+import argparse
+import json
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from kvcache_api_layer.codec import available_codecs, get_codec, encode_value, decode_value_into
+
+
+def make_fp16_data(size: int, scale: float = 1.0, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    count = size // 2
+    return struct.pack(f"<{count}e", *(rng.gauss(0.0, scale) for _ in range(count)))
+
+
+def bench(data: bytes, codec_name: str, shuffle: int, repeat: int) -> dict:
+    codec = get_codec(codec_name)
+    out = bytearray(len(data))
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encoded = encode_value(data, codec, shuffle)
+    encode_s = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        decode_value_into(encoded, out)
+    decode_s = (time.perf_counter() - start) / repeat
+
+    assert out == data, f"{codec_name} roundtrip mismatch"
+    mb = len(data) / (1024 * 1024)
+    return {
+        "codec": codec_name,
+        "shuffle": shuffle,
+        "raw_bytes": len(data),
+        "encoded_bytes": len(encoded),
+        "ratio": len(data) / len(encoded),
+        "encode_mb_s": mb / encode_s,
+        "decode_mb_s": mb / decode_s,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark KV value codecs")
+    parser.add_argument("--size", type=int, default=4 * 1024 * 1024, help="value size in bytes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--input", help="read the value from this file instead")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, "rb") as f:
+            data = f.read()
+    else:
+        data = make_fp16_data(args.size)
+
+    results = []
+    for codec_name in available_codecs():
+        for shuffle in ((0,) if codec_name == "none" else (0, 2)):
+            results.append(bench(data, codec_name, shuffle, args.repeat))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'codec':<8}{'shuffle':>8}{'ratio':>8}{'enc MB/s':>12}{'dec MB/s':>12}")
+    for r in results:
+        print(f"{r['codec']:<8}{r['shuffle']:>8}{r['ratio']:>8.2f}"
+              f"{r['encode_mb_s']:>12.1f}{r['decode_mb_s']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Accuracy and throughput of quantized KV encoding.
+
+Usage:
+    python benchmarks/bench_quant.py [--tokens N] [--heads H] [--head-dim D] [--repeat N] [--json]
+
+Quantizes a synthetic fp16 K block of shape (tokens, heads, head_dim) with
+each qtype/granularity and reports roundtrip error next to quantize and
+dequantize throughput.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from kvcache_api_layer.quant import QTYPES, GRANULARITIES, quantize, dequantize, roundtrip_error
+
+
+def bench(array: np.ndarray, qtype: str, granularity: str, repeat: int) -> dict:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        payload, scales = quantize(array, qtype, granularity)
+    quant_s = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        dequantize(payload, scales, qtype, granularity)
+    dequant_s = (time.perf_counter() - start) / repeat
+
+    mb = array.nbytes / (1024 * 1024)
+    result = {"qtype": qtype, "granularity": granularity, "bytes": array.nbytes,
+              "quantize_mb_s": mb / quant_s, "dequantize_mb_s": mb / dequant_s}
+    result.update(roundtrip_error(array, qtype, granularity))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized KV encoding")
+    parser.add_argument("--tokens", type=int, default=4096)
+    parser.add_argument("--heads", type=int, default=8)
+    parser.add_argument("--head-dim", type=int, default=128)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Per-channel magnitudes vary a lot in real K caches; mimic that
+    channel_scale = rng.lognormal(0.0, 1.0, size=args.head_dim).astype(np.float32)
+    array = (rng.standard_normal((args.tokens, args.heads, args.head_dim), dtype=np.float32)
+             * channel_scale).astype(np.float16)
+
+    results = [bench(array, q, g, args.repeat) for q in QTYPES for g in GRANULARITIES]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'qtype':<10}{'gran':<9}{'ratio':>7}{'rel rmse':>10}{'snr dB':>8}"
+          f"{'q MB/s':>10}{'dq MB/s':>10}")
+    for r in results:
+        print(f"{r['qtype']:<10}{r['granularity']:<9}{r['compression_ratio']:>7.2f}"
+              f"{r['relative_rmse']:>10.4f}{r['snr_db']:>8.1f}"
+              f"{r['quantize_mb_s']:>10.1f}{r['dequantize_mb_s']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Read throughput vs. thread count for one shared store.
+
+Usage:
+    python benchmarks/bench_threads.py [--backend local|shm] [--size BYTES]
+                                       [--threads 1,2,4,8] [--seconds S] [--json]
+
+Every thread loops over ``get_into`` on the same store with its own output
+buffer. With the large-copy path releasing the GIL, GB/s should grow with
+the thread count until memory bandwidth or the store's locking saturates.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from kvcache_api_layer.backends import BackendType, create_store
+
+
+def make_store(backend: str, size: int, keys: int):
+    kwargs = {"name": "kvcache_bench_threads"} if backend == "shm" else {}
+    store = create_store(BackendType(backend), **kwargs)
+    pool = max(64 * 1024 * 1024, 2 * size * keys)
+    store.setup("localhost", "", pool, pool)
+    value = os.urandom(size)
+    for i in range(keys):
+        store.put(f"bench-{i}", value)
+    return store
+
+
+def run(store, threads: int, size: int, keys: int, seconds: float) -> dict:
+    counts = [0] * threads
+    stop = threading.Event()
+
+    def worker(idx: int):
+        out = bytearray(size)
+        n = 0
+        i = idx
+        while not stop.is_set():
+            if store.get_into(f"bench-{i % keys}", out) != size:
+                raise RuntimeError("get_into failed")
+            n += 1
+            i += 1
+        counts[idx] = n
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    time.sleep(seconds)
+    stop.set()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    ops = sum(counts)
+    return {
+        "threads": threads,
+        "ops_s": ops / elapsed,
+        "gb_s": ops * size / elapsed / 1e9,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-threaded reads")
+    parser.add_argument("--backend", default="local", choices=["local", "shm"])
+    parser.add_argument("--size", type=int, default=4 * 1024 * 1024, help="value size in bytes")
+    parser.add_argument("--keys", type=int, default=16)
+    parser.add_argument("--threads", default="1,2,4,8", help="comma-separated thread counts")
+    parser.add_argument("--seconds", type=float, default=2.0, help="duration of each run")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    store = make_store(args.backend, args.size, args.keys)
+    try:
+        results = [run(store, int(t), args.size, args.keys, args.seconds)
+                   for t in args.threads.split(",")]
+    finally:
+        store.close()
+        if args.backend == "shm":
+            store.destroy()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    base = results[0]["gb_s"]
+    print(f"{'threads':>8}{'ops/s':>12}{'GB/s':>10}{'speedup':>10}")
+    for r in results:
+        print(f"{r['threads']:>8}{r['ops_s']:>12.0f}{r['gb_s']:>10.2f}{r['gb_s'] / base:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
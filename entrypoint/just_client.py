@@ -0,0 +1,316 @@
+"""
+Server node entry point.
+
+Sets up a store from the YAML config, which contributes
+``contribute_to_cluster_pool_size`` bytes to the cluster pool, and stays
+resident. One HTTP port serves:
+
+    /metrics   Prometheus metrics
+    /livez     200 unless the store stopped answering
+    /readyz    200 once the store is set up, 503 while starting or draining
+
+Startup is kept short: the probe server comes up first, and the store
+package and backend are imported and set up (segment allocation and
+registration) in a background thread. If setup fails the process exits
+non-zero so that it is restarted.
+
+On SIGTERM or SIGINT the node drains: readiness turns 503 so no new work
+is routed here, it waits ``--drain-delay`` seconds for endpoints to update,
+flushes pending background writes, optionally spills locally held values
+to ``--spill-dir`` and finally closes the store. Values spilled on shutdown
+are loaded back in the background on the next start.
+
+Usage:
+    python entrypoint/just_client.py --config config.yaml [--metrics-port 9400]
+        [--drain-delay 5] [--drain-timeout 30] [--spill-dir DIR]
+        [--spill-max-bytes N]
+
+The Helm chart writes the node's address as ``local_hostname`` followed by
+the ``kvcache_config`` values, which nest the settings under ``server:``.
+Both that layout and a flat config are accepted.
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+logger = logging.getLogger("kvcache.server")
+
+STARTING = "starting"
+READY = "ready"
+DRAINING = "draining"
+
+# A store is reported dead after this many failed liveness checks in a row
+LIVENESS_FAILURES = 3
+
+
+def read_config(path: str, enable_metrics: bool) -> dict:
+    with open(path, 'r') as f:
+        raw = yaml.safe_load(f)
+    if not isinstance(raw, dict):
+        raise ValueError(f"Config file is empty or not a mapping: {path}")
+    if isinstance(raw.get('server'), dict):
+        raw = {**{k: v for k, v in raw.items() if k != 'server'}, **raw['server']}
+    if enable_metrics:
+        raw['enable_metrics'] = True
+    return raw
+
+
+class ServerNode:
+    """Lifecycle of one server node: start, serve probes, drain, close."""
+
+    def __init__(self, args: argparse.Namespace, raw_config: dict, stop: threading.Event):
+        self.args = args
+        self.raw_config = raw_config
+        # Set to shut down, by a signal or a failed setup
+        self.stop = stop
+        self.setup_failed = False
+        self.state = STARTING
+        self.store = None
+        self.config = None
+        self.http = None
+        self.setup_thread = None
+        self.warm_thread = None
+        self._liveness_failures = 0
+        self._lock = threading.Lock()
+
+    # Probes
+
+    def _livez(self):
+        store = self.store
+        if store is not None and self.state == READY:
+            from kvcache_api_layer.pool import default_health_check
+            with self._lock:
+                if default_health_check(store):
+                    self._liveness_failures = 0
+                else:
+                    self._liveness_failures += 1
+                if self._liveness_failures >= LIVENESS_FAILURES:
+                    return 503, "text/plain", "store is not answering\n"
+        return 200, "text/plain", f"{self.state}\n"
+
+    def _readyz(self):
+        return (200 if self.state == READY else 503), "text/plain", f"{self.state}\n"
+
+    def start_http(self) -> None:
+        if not self.args.metrics_port:
+            return
+        from kvcache_api_layer.exporter import MetricsServer
+
+        raw = self.raw_config
+        self.http = MetricsServer(None, self.args.metrics_host, self.args.metrics_port, constants={
+            'kvcache_pool_contributed_bytes': (raw.get('contribute_to_cluster_pool_size', 0),
+                                               "Bytes this node contributes to the cluster pool"),
+            'kvcache_local_buffer_bytes': (raw.get('mooncake_spec', {}).get('local_buffer_size', 0),
+                                           "Size of the local transfer buffer"),
+        })
+        self.http.add_route('/livez', self._livez)
+        self.http.add_route('/readyz', self._readyz)
+        self.http.start()
+        logger.info("serving /metrics, /livez and /readyz on :%d", self.http.port)
+
+    # Startup
+
+    def start_store(self) -> None:
+        self.setup_thread = threading.Thread(target=self._setup, name="kvcache-setup", daemon=True)
+        self.setup_thread.start()
+
+    def _setup(self) -> None:
+        start = time.monotonic()
+        try:
+            from kvcache_api_layer import KVCacheConfig, create_store_from_config
+
+            self.config = KVCacheConfig(self.raw_config)
+            store = create_store_from_config(self.config)
+        except Exception:
+            # Exit and let the orchestrator restart us with backoff
+            logger.exception("store setup failed")
+            self.setup_failed = True
+            self.stop.set()
+            return
+
+        self.store = store
+        if self.http is not None:
+            self.http.set_store(store)
+        with self._lock:
+            if self.state == STARTING:
+                self.state = READY
+        logger.info("store ready on %s in %.2fs, contributing %d bytes",
+                    self.config.local_hostname, time.monotonic() - start,
+                    self.config.global_segment_size)
+
+        if self.args.spill_dir and os.path.isdir(self.args.spill_dir):
+            self.warm_thread = threading.Thread(target=self._restore, name="kvcache-warm", daemon=True)
+            self.warm_thread.start()
+
+    def _restore(self) -> None:
+        """
+        Load values spilled by the previous shutdown back into the layers
+        they were read from, then discard the spill. A layer's values are
+        in its own representation (e.g. compressed frames below a
+        ``CompressedStore``), so they are skipped if the layer stack changed.
+        """
+        from kvcache_api_layer.backends.disk import DiskStore
+        from kvcache_api_layer.exporter import store_layers
+
+        layers = store_layers(self.store)
+        restored = 0
+        for name in sorted(os.listdir(self.args.spill_dir)):
+            depth, _, layer_type = name.partition("-")
+            path = os.path.join(self.args.spill_dir, name)
+            if not depth.isdigit() or not os.path.isdir(path):
+                continue
+            depth = int(depth)
+            if depth >= len(layers) or type(layers[depth]).__name__ != layer_type:
+                logger.warning("skipping spilled %s values: the store layers changed", layer_type)
+                continue
+            layer = layers[depth]
+            spill = DiskStore(path)
+            spill.setup("", "", 0, 0)
+            try:
+                for key in spill.keys():
+                    if self.state != READY:
+                        return
+                    buffer = spill.get_buffer(key)
+                    if buffer is not None and layer.put(key, buffer) == 0:
+                        restored += 1
+            finally:
+                spill.close()
+        shutil.rmtree(self.args.spill_dir, ignore_errors=True)
+        logger.info("restored %d spilled values", restored)
+
+    # Shutdown
+
+    def drain(self) -> None:
+        with self._lock:
+            previous = self.state
+            self.state = DRAINING
+        logger.info("draining")
+        deadline = time.monotonic() + self.args.drain_timeout
+
+        if previous == READY and self.args.drain_delay > 0:
+            # Give endpoints and clients time to notice readiness went away
+            time.sleep(min(self.args.drain_delay, self.args.drain_timeout))
+
+        if self.setup_thread is not None:
+            self.setup_thread.join(max(0.0, deadline - time.monotonic()))
+        if self.warm_thread is not None:
+            self.warm_thread.join(max(0.0, deadline - time.monotonic()))
+
+        store = self.store
+        if store is not None:
+            from kvcache_api_layer.exporter import store_layers
+
+            # Write-back tiers and queues finish their pending writes
+            for layer in store_layers(store):
+                flush = getattr(layer, 'flush', None)
+                if callable(flush):
+                    if not flush(timeout=max(0.0, deadline - time.monotonic())):
+                        logger.warning("%s did not finish pending writes in time",
+                                       type(layer).__name__)
+
+            if self.args.spill_dir:
+                self._spill(store, deadline)
+            store.close()
+
+        if self.http is not None:
+            self.http.stop()
+        logger.info("stopped")
+
+    def _spill(self, store, deadline: float) -> None:
+        """
+        Copy values held by local layers (L1 cache first, hottest first) to
+        the spill directory until the byte budget or the deadline runs out.
+        Remote backends cannot be enumerated and are skipped.
+
+        Each layer spills into a ``<depth>-<type>`` subdirectory, as its
+        values are only meaningful to that layer and ``_restore`` writes
+        them back into it.
+        """
+        from kvcache_api_layer.backends.disk import DiskStore
+        from kvcache_api_layer.exporter import store_layers
+
+        shutil.rmtree(self.args.spill_dir, ignore_errors=True)
+        spills = []
+        seen = set()
+        spilled = 0
+        spilled_bytes = 0
+        try:
+            for depth, layer in enumerate(store_layers(store)):
+                keys = getattr(layer, 'keys', None)
+                if not callable(keys):
+                    continue
+                spill = None
+                for key in keys():
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    if time.monotonic() >= deadline:
+                        logger.warning("drain deadline reached while spilling")
+                        return
+                    buffer = layer.get_buffer(key)
+                    if buffer is None:
+                        continue
+                    size = memoryview(buffer).nbytes
+                    limit = self.args.spill_max_bytes
+                    if limit is not None and spilled_bytes + size > limit:
+                        return
+                    if spill is None:
+                        spill = DiskStore(os.path.join(self.args.spill_dir,
+                                                       f"{depth}-{type(layer).__name__}"))
+                        spill.setup("", "", 0, 0)
+                        spills.append(spill)
+                    if spill.put(key, buffer) == 0:
+                        spilled += 1
+                        spilled_bytes += size
+        finally:
+            for spill in spills:
+                spill.close()
+            logger.info("spilled %d values (%d bytes) to %s", spilled, spilled_bytes, self.args.spill_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KV cache server node")
+    parser.add_argument("--config", default="config.yaml", help="YAML config file")
+    parser.add_argument("--metrics-host", default="0.0.0.0")
+    parser.add_argument("--metrics-port", type=int,
+                        default=int(os.environ.get("KVCACHE_METRICS_PORT", "9400")),
+                        help="port for /metrics and the probes; 0 disables them")
+    parser.add_argument("--drain-delay", type=float, default=5.0,
+                        help="seconds between failing readiness and closing the store")
+    parser.add_argument("--drain-timeout", type=float, default=30.0,
+                        help="upper bound in seconds on the whole drain")
+    parser.add_argument("--spill-dir", default=os.environ.get("KVCACHE_SPILL_DIR") or None,
+                        help="directory to spill locally held values to on shutdown "
+                             "and load them back from on start")
+    parser.add_argument("--spill-max-bytes", type=int, default=None,
+                        help="upper bound on the bytes spilled (default: no limit)")
+    args = parser.parse_args()
+
+    raw = read_config(args.config, enable_metrics=args.metrics_port != 0)
+    logging.basicConfig(level=str(raw.get('log_level', 'INFO')).upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    stop = threading.Event()
+    node = ServerNode(args, raw, stop)
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda signum, frame: stop.set())
+
+    node.start_http()
+    node.start_store()
+    stop.wait()
+    node.drain()
+    sys.exit(1 if node.setup_failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+kvcache-bench: latency and throughput benchmarks for any KV cache backend.
+
+Usage:
+    python entrypoint/kvcache_bench.py [--backend local|shm|mooncake|...]
+        [--config config.yaml] [--workloads put,get,batch_get,...]
+        [--sizes 4K,64K,1M,16M,64M] [--threads 1,4] [--processes 1]
+        [--distribution uniform|zipf] [--hit-ratio 0.9] [--output results.json]
+
+Each combination of workload, value size, thread count and process count is
+one run. Results are printed (or written to --output) as a JSON document
+with p50/p99/p999 latency in microseconds, ops/s and GB/s per run, so
+releases can be compared by diffing the files.
+
+Workloads:
+    put            single-part put of random keys
+    multipart_put  put(key, *parts) with --parts equal parts
+    get            get_into of populated keys
+    batch_put      batch_put of --batch keys per call
+    batch_get      batch_get_into of --batch keys per call
+    hit_ratio      get_into where a --hit-ratio fraction of keys exist
+"""
+
+import argparse
+import bisect
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from kvcache_api_layer import (
+    BackendType, create_store, create_store_from_config, list_available_backends, load_config,
+)
+
+WORKLOADS = ("put", "multipart_put", "get", "batch_put", "batch_get", "hit_ratio")
+READ_WORKLOADS = ("get", "batch_get", "hit_ratio")
+# Backends whose contents are visible to other processes on the host
+SHARED_BACKENDS = ("shm", "mooncake", "disk")
+
+_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    """Parse sizes like ``4096``, ``4K``, ``64M`` or ``1G``."""
+    text = text.strip().upper().rstrip("B")
+    unit = text[-1] if text and text[-1] in _UNITS else ""
+    return int(float(text[:len(text) - len(unit)]) * _UNITS[unit])
+
+
+class KeyChooser:
+    """Draws key indexes uniformly or from a Zipf distribution."""
+
+    def __init__(self, n_keys: int, distribution: str, zipf_s: float, seed: int):
+        self._n = n_keys
+        self._rng = random.Random(seed)
+        self._cdf = None
+        if distribution == "zipf":
+            weights = [1.0 / (rank ** zipf_s) for rank in range(1, n_keys + 1)]
+            total = sum(weights)
+            acc = 0.0
+            self._cdf = []
+            for w in weights:
+                acc += w / total
+                self._cdf.append(acc)
+
+    def next(self) -> int:
+        if self._cdf is None:
+            return self._rng.randrange(self._n)
+        return min(bisect.bisect_left(self._cdf, self._rng.random()), self._n - 1)
+
+    def random(self) -> float:
+        return self._rng.random()
+
+
+def open_store(spec: Dict[str, Any]):
+    """Create and set up the store described by a run spec."""
+    if spec["config"]:
+        return create_store_from_config(load_config(spec["config"]))
+    kwargs = dict(spec["backend_options"])
+    if spec["backend"] == "shm":
+        kwargs.setdefault("name", "kvcache_bench")
+    if spec["backend"] == "disk":
+        kwargs.setdefault("path", spec["disk_path"])
+    if spec["backend"] == "local":
+        # LocalStore rejects values larger than a slab page
+        kwargs.setdefault("page_size", max(16 * 1024 * 1024, spec["max_size"]))
+    store = create_store(BackendType(spec["backend"]), **kwargs)
+    status = store.setup("localhost", spec["metadata_server"], spec["pool_size"], spec["pool_size"],
+                         "tcp", "lo", spec["master_server_address"])
+    if status != 0:
+        raise RuntimeError(f"setup failed with code {status}")
+    return store
+
+
+def populate(store, spec: Dict[str, Any]) -> None:
+    value = os.urandom(spec["size"])
+    for i in range(spec["n_keys"]):
+        store.put(f"bench/{spec['size']}/{i}", value)
+
+
+def run_ops(store, spec: Dict[str, Any], worker_id: int, start_at: float) -> Dict[str, Any]:
+    """Run the configured number of operations and record per-call latency."""
+    size, batch, parts = spec["size"], spec["batch"], spec["parts"]
+    workload = spec["workload"]
+    chooser = KeyChooser(spec["n_keys"], spec["distribution"], spec["zipf_s"], seed=worker_id)
+    value = os.urandom(size)
+    part_size = -(-size // parts)
+    value_parts = [memoryview(value)[i:i + part_size] for i in range(0, size, part_size)]
+    outs = [bytearray(size) for _ in range(batch if workload.startswith("batch") else 1)]
+    prefix = f"bench/{size}/"
+
+    def key() -> str:
+        return prefix + str(chooser.next())
+
+    latencies: List[float] = []
+    errors = 0
+    hits = 0
+    nbytes = 0
+    while time.perf_counter() < start_at:
+        time.sleep(0.0005)
+
+    begin = time.perf_counter()
+    for _ in range(spec["ops"]):
+        if workload == "batch_put":
+            keys = [key() for _ in range(batch)]
+            t0 = time.perf_counter()
+            statuses = store.batch_put(keys, [value] * batch)
+            latencies.append(time.perf_counter() - t0)
+            errors += sum(1 for s in statuses if s != 0)
+            nbytes += size * batch
+        elif workload == "batch_get":
+            keys = [key() for _ in range(batch)]
+            t0 = time.perf_counter()
+            statuses = store.batch_get_into(keys, outs)
+            latencies.append(time.perf_counter() - t0)
+            for s in statuses:
+                if s >= 0:
+                    hits += 1
+                    nbytes += s
+                else:
+                    errors += 1
+        elif workload in ("put", "multipart_put"):
+            k = key()
+            t0 = time.perf_counter()
+            status = store.put(k, value) if workload == "put" else store.put(k, *value_parts)
+            latencies.append(time.perf_counter() - t0)
+            if status == 0:
+                nbytes += size
+            else:
+                errors += 1
+        else:
+            k = key()
+            if workload == "hit_ratio" and chooser.random() >= spec["hit_ratio"]:
+                k = f"bench/miss/{k}"
+            t0 = time.perf_counter()
+            written = store.get_into(k, outs[0])
+            latencies.append(time.perf_counter() - t0)
+            if written >= 0:
+                hits += 1
+                nbytes += written
+            elif workload == "get":
+                errors += 1
+    elapsed = time.perf_counter() - begin
+    return {"latencies": latencies, "errors": errors, "hits": hits, "bytes": nbytes,
+            "begin": begin, "end": begin + elapsed}
+
+
+def run_threads(store, spec: Dict[str, Any], base_id: int = 0) -> List[Dict[str, Any]]:
+    results: List[Optional[Dict[str, Any]]] = [None] * spec["threads"]
+    start_at = time.perf_counter() + 0.05
+
+    def worker(idx: int):
+        results[idx] = run_ops(store, spec, base_id + idx, start_at)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(spec["threads"])]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def _process_main(spec: Dict[str, Any], proc_id: int, barrier, queue) -> None:
+    store = open_store(spec)
+    try:
+        if spec["workload"] in READ_WORKLOADS and spec["backend"] not in SHARED_BACKENDS:
+            populate(store, spec)
+        barrier.wait()
+        results = run_threads(store, spec, base_id=proc_id * 1000)
+        # perf_counter is per process; report durations only
+        for r in results:
+            r["end"] -= r["begin"]
+            r["begin"] = 0.0
+        queue.put(results)
+    finally:
+        store.close()
+
+
+def run_processes(spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(spec["processes"])
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_process_main, args=(spec, i, barrier, queue))
+             for i in range(spec["processes"])]
+    for p in procs:
+        p.start()
+    results = []
+    for _ in procs:
+        results.extend(queue.get())
+    for p in procs:
+        p.join()
+    return results
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[idx]
+
+
+def summarize(spec: Dict[str, Any], workers: List[Dict[str, Any]]) -> Dict[str, Any]:
+    latencies = sorted(l for w in workers for l in w["latencies"])
+    wall = max(w["end"] for w in workers) - min(w["begin"] for w in workers)
+    total_bytes = sum(w["bytes"] for w in workers)
+    calls = len(latencies)
+    items = calls * (spec["batch"] if spec["workload"].startswith("batch") else 1)
+    result = {
+        "workload": spec["workload"],
+        "backend": spec["backend"] if not spec["config"] else "config",
+        "value_size": spec["size"],
+        "threads": spec["threads"],
+        "processes": spec["processes"],
+        "distribution": spec["distribution"],
+        "calls": calls,
+        "errors": sum(w["errors"] for w in workers),
+        "p50_us": percentile(latencies, 50) * 1e6,
+        "p99_us": percentile(latencies, 99) * 1e6,
+        "p999_us": percentile(latencies, 99.9) * 1e6,
+        "mean_us": sum(latencies) / calls * 1e6 if calls else 0.0,
+        "ops_s": items / wall if wall > 0 else 0.0,
+        "gb_s": total_bytes / wall / 1e9 if wall > 0 else 0.0,
+    }
+    if spec["workload"].startswith("batch"):
+        result["batch"] = spec["batch"]
+    if spec["workload"] == "multipart_put":
+        result["parts"] = spec["parts"]
+    if spec["workload"] in READ_WORKLOADS:
+        result["hit_ratio"] = sum(w["hits"] for w in workers) / items if items else 0.0
+    return result
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="kvcache-bench", description="Benchmark KV cache backends")
+    backends = [b.value for b in list_available_backends()]
+    parser.add_argument("--backend", default="local", choices=[b.value for b in BackendType],
+                        help=f"backend to benchmark (available here: {', '.join(backends)})")
+    parser.add_argument("--config", help="YAML config; the store is built with create_store_from_config")
+    parser.add_argument("--backend-option", action="append", default=[], metavar="KEY=VALUE",
+                        help="constructor argument for the backend, may be repeated")
+    parser.add_argument("--metadata-server", default="127.0.0.1:2379")
+    parser.add_argument("--master-server-address", default="127.0.0.1:50051")
+    parser.add_argument("--pool-size", default="2G", help="segment/buffer size passed to setup")
+    parser.add_argument("--disk-path", default="/tmp/kvcache-bench", help="directory for the disk backend")
+    parser.add_argument("--workloads", default="put,get,batch_get",
+                        help=f"comma-separated, from: {', '.join(WORKLOADS)}")
+    parser.add_argument("--sizes", default="4K,64K,1M,16M", help="comma-separated value sizes")
+    parser.add_argument("--threads", default="1", help="comma-separated thread counts")
+    parser.add_argument("--processes", default="1", help="comma-separated process counts")
+    parser.add_argument("--ops", type=int, default=1000, help="calls per thread and run")
+    parser.add_argument("--max-ops-bytes", default="1G",
+                        help="cap on bytes moved per thread and run; lowers --ops for large values")
+    parser.add_argument("--keys", type=int, default=1000, help="key space size")
+    parser.add_argument("--working-set", default="512M",
+                        help="cap on populated bytes; lowers --keys for large values")
+    parser.add_argument("--distribution", default="uniform", choices=["uniform", "zipf"])
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="Zipf exponent")
+    parser.add_argument("--hit-ratio", type=float, default=0.9, help="fraction of hits for hit_ratio")
+    parser.add_argument("--batch", type=int, default=16, help="keys per batch call")
+    parser.add_argument("--parts", type=int, default=4, help="parts per multipart_put")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    return parser
+
+
+def parse_option(text: str):
+    key, _, raw = text.partition("=")
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = raw
+    return key, value
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    workloads = [w.strip() for w in args.workloads.split(",") if w.strip()]
+    for w in workloads:
+        if w not in WORKLOADS:
+            raise SystemExit(f"unknown workload: {w}")
+
+    base = {
+        "backend": args.backend,
+        "config": args.config,
+        "backend_options": dict(parse_option(o) for o in args.backend_option),
+        "metadata_server": args.metadata_server,
+        "master_server_address": args.master_server_address,
+        "pool_size": parse_size(args.pool_size),
+        "disk_path": args.disk_path,
+        "distribution": args.distribution,
+        "zipf_s": args.zipf_s,
+        "hit_ratio": args.hit_ratio,
+        "batch": args.batch,
+        "parts": args.parts,
+    }
+    sizes = [parse_size(s) for s in args.sizes.split(",")]
+    base["max_size"] = max(sizes)
+    results = []
+    store = open_store(base)
+    try:
+        for size in sizes:
+            per_call = size * (args.batch if any(w.startswith("batch") for w in workloads) else 1)
+            spec = dict(base, size=size,
+                        n_keys=max(1, min(args.keys, parse_size(args.working_set) // size)),
+                        ops=max(1, min(args.ops, parse_size(args.max_ops_bytes) // per_call)))
+            populate(store, spec)
+            for workload in workloads:
+                for processes in [int(p) for p in args.processes.split(",")]:
+                    for threads in [int(t) for t in args.threads.split(",")]:
+                        run_spec = dict(spec, workload=workload, threads=threads, processes=processes)
+                        if processes > 1:
+                            workers = run_processes(run_spec)
+                        else:
+                            workers = run_threads(store, run_spec)
+                        result = summarize(run_spec, workers)
+                        results.append(result)
+                        print(f"{workload:<14}{size:>10} B {threads:>3}t {processes:>2}p  "
+                              f"p50 {result['p50_us']:>9.1f}us  p99 {result['p99_us']:>9.1f}us  "
+                              f"{result['gb_s']:>7.2f} GB/s", file=sys.stderr)
+    finally:
+        store.close()
+        if args.backend == "shm" and not args.config:
+            store.destroy()
+
+    document = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "args": vars(args),
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
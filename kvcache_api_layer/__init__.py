@@ -6,6 +6,19 @@ including Mooncake and Rust implementations.
 """
 
 from .api import KVCacheStore
+from .async_api import AsyncKVCacheStore
+from .cache import CachingStore
+from .codec import CompressedStore, available_codecs
+from .tier import TieredStore
+from .sharding import ShardedStore
+from .replication import ReplicatedStore
+from .metrics import InstrumentedStore, LatencyHistogram
+from .prefetch import PrefetchingStore, PrefetchHandle
+from .coalesce import CoalescingStore
+from .writebehind import WriteBehindStore
+from .eviction import EvictingStore, EvictionPolicy, create_policy
+from .prefix import PrefixKeyBuilder, longest_cached_prefix
+from .pool import StorePool, get_store_pool
 from .backends import BackendType, create_store, list_available_backends
 from .config import KVCacheConfig, load_config, create_default_config
 from .exceptions import (
@@ -30,6 +43,20 @@ __version__ = "0.1.0"
 __all__ = [
     # Core API
     "KVCacheStore",
+    "AsyncKVCacheStore",
+    "CachingStore",
+    "CompressedStore",
+    "TieredStore",
+    "ShardedStore",
+    "ReplicatedStore",
+    "InstrumentedStore",
+    "PrefetchingStore",
+    "PrefetchHandle",
+    "CoalescingStore",
+    "WriteBehindStore",
+    "EvictingStore",
+    "EvictionPolicy",
+    "create_policy",
     
     # Backend management
     "BackendType",
@@ -56,5 +83,17 @@ __all__ = [
     "detect_best_backend",
     "create_store_with_auto_backend",
     "create_store_from_config",
+    "StorePool",
+    "get_store_pool",
     "StoreConfig",  # Backward compatibility
+    
+    # Metrics
+    "LatencyHistogram",
+    
+    # Compression
+    "available_codecs",
+    
+    # Prefix keys
+    "PrefixKeyBuilder",
+    "longest_cached_prefix",
 ] 
\ No newline at end of file
@@ -4,12 +4,108 @@ Abstract base classes for the KV Cache API layer.
 This module defines the core interfaces that all backend implementations must follow.
 """
 
+import ctypes
 from abc import ABC, abstractmethod
-from typing import Union, Optional, Any
+from typing import Union, Optional, Any, List, Sequence, Dict, Tuple, Iterable, Iterator
+from .exceptions import KVCacheError, BufferError, InvalidOperationError
+
+
+# Names reported by ``put_path_stats``: whether a value was written straight
+# from the caller's buffers or staged through a contiguous copy first.
+PUT_PATH_ZERO_COPY = "zero_copy"
+PUT_PATH_COPY = "copy"
+
+# A batch value is either a single buffer or a sequence of parts that
+# would otherwise be passed as ``put(key, *parts)``.
+BatchValue = Union[bytes, bytearray, memoryview, Sequence[Union[bytes, bytearray, memoryview]]]
+
+# Copies of at least this many bytes go through ctypes.memmove, which
+# releases the GIL, so other threads keep running during large transfers.
+# Smaller copies use memoryview slice assignment, which is cheaper to start.
+GIL_FREE_COPY_THRESHOLD = 1024 * 1024
+
+_numpy = None
+
+
+def _address(view: memoryview) -> Optional[Tuple[int, Any]]:
+    """
+    Get the address of a contiguous byte view.
+    
+    Returns:
+        (address, holder) where ``holder`` keeps the buffer exported while
+        the address is in use, or None if the address cannot be obtained
+    """
+    global _numpy
+    try:
+        if not view.readonly:
+            holder = (ctypes.c_char * view.nbytes).from_buffer(view)
+            return ctypes.addressof(holder), holder
+        # ctypes cannot export read-only buffers; NumPy can, if installed
+        if _numpy is None:
+            import numpy
+            _numpy = numpy
+        holder = _numpy.frombuffer(view, dtype=_numpy.uint8)
+        return holder.ctypes.data, holder
+    except (ImportError, TypeError, ValueError):
+        return None
+
+
+def copy_bytes(dst: memoryview, src: memoryview) -> None:
+    """
+    Copy ``src`` into the start of ``dst``; both are byte (``'B'``) views.
+    
+    Large contiguous copies release the GIL, so several threads copying
+    at once scale across cores.
+    """
+    nbytes = src.nbytes
+    if nbytes >= GIL_FREE_COPY_THRESHOLD and dst.c_contiguous and src.c_contiguous:
+        dst_addr = _address(dst[:nbytes])
+        src_addr = _address(src)
+        if dst_addr is not None and src_addr is not None:
+            ctypes.memmove(dst_addr[0], src_addr[0], nbytes)
+            return
+    dst[:nbytes] = src
+
+
+def copy_into(src: Any, out: Any) -> int:
+    """
+    Copy a buffer-protocol object into a caller-provided writable buffer.
+    
+    Args:
+        src: Source buffer (bytes, memoryview, native buffer handle, ...)
+        out: Writable destination buffer, at least as large as ``src``
+        
+    Returns:
+        Number of bytes written, or -2 if ``out`` is too small
+        
+    Raises:
+        BufferError: If ``out`` is read-only or not contiguous
+    """
+    dst = memoryview(out)
+    if dst.readonly:
+        raise BufferError("Output buffer is read-only")
+    if not dst.c_contiguous:
+        raise BufferError("Output buffer must be C-contiguous")
+    src_view = memoryview(src).cast('B')
+    nbytes = src_view.nbytes
+    if nbytes > dst.nbytes:
+        return -2
+    copy_bytes(dst.cast('B'), src_view)
+    return nbytes
 
 
 class KVCacheStore(ABC):
-    """Abstract base class for distributed KV cache stores."""
+    """
+    Abstract base class for distributed KV cache stores.
+    
+    Thread safety: once ``setup()`` has returned, every store in this
+    package may be shared by any number of threads without an external
+    lock; each store documents how far its calls actually run in parallel.
+    ``setup()`` and ``close()`` must not overlap with other calls. Buffers
+    returned by ``get_buffer`` are not synchronized with later writes to
+    the same key. Copies of ``GIL_FREE_COPY_THRESHOLD`` bytes or more
+    release the GIL.
+    """
     
     @abstractmethod
     def setup(self, 
@@ -53,6 +149,83 @@ class KVCacheStore(ABC):
         """
         pass
     
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """
+        Store a value from one or more buffer-protocol slices, e.g.
+        memoryview slices of a registered local buffer holding per-layer
+        K and V tensors.
+        
+        The slices are stored as one value, like ``put(key, *buffers)``, but
+        backends write them without a Python-side concatenation where they
+        can. Which path was taken is counted in ``put_path_stats``. The
+        default implementation hands the slices to ``put`` and counts the
+        copy path, since a generic backend may stage them.
+        
+        Args:
+            key: The key to store
+            *buffers: One or more contiguous buffer-protocol objects
+            
+        Returns:
+            0 on success, non-zero error code on failure
+        """
+        if not buffers:
+            raise ValueError("At least one buffer must be provided")
+        
+        self._count_put_path(PUT_PATH_COPY)
+        return self.put(key, *[memoryview(b) for b in buffers])
+    
+    def put_path_stats(self) -> Dict[str, int]:
+        """
+        Report how many ``put_from`` and multi-part ``put`` calls took the
+        zero-copy path versus the copy fallback.
+        
+        Returns:
+            Dictionary with ``zero_copy`` and ``copy`` counters
+        """
+        counts = self.__dict__.get('_put_path_counts')
+        if counts is None:
+            return {PUT_PATH_ZERO_COPY: 0, PUT_PATH_COPY: 0}
+        return dict(counts)
+    
+    def _count_put_path(self, path: str) -> None:
+        """Increment the ``put_path_stats`` counter for ``path``."""
+        counts = self.__dict__.setdefault(
+            '_put_path_counts', {PUT_PATH_ZERO_COPY: 0, PUT_PATH_COPY: 0})
+        counts[path] += 1
+    
+    def put_with_hints(self, key: str, *values: Union[bytes, bytearray],
+                       ttl: Optional[float] = None, priority: int = 0, pin: bool = False) -> int:
+        """
+        Store a key-value pair with expiry and eviction hints.
+        
+        Lower priorities are evicted first and pinned values are never
+        evicted; values of equal priority are ordered by the store's
+        eviction policy (see ``eviction``). ``LocalStore`` honours the hints
+        natively, other backends through ``EvictingStore``. The default
+        implementation only accepts the default hints.
+        
+        Args:
+            key: The key to store
+            *values: One or more values, stored as with ``put``
+            ttl: Seconds until the value expires; None keeps it until it is
+                 removed or evicted
+            priority: Eviction priority, 0 by default
+            pin: Never evict the value; it stays until removed or expired
+            
+        Returns:
+            0 on success, non-zero error code on failure
+            
+        Raises:
+            InvalidOperationError: If hints are given and the store cannot
+                                   honour them
+        """
+        from .eviction import check_hints
+        check_hints(ttl, priority)
+        if ttl is not None or priority != 0 or pin:
+            raise InvalidOperationError(
+                f"{type(self).__name__} does not support put hints; wrap it in EvictingStore")
+        return self.put(key, *values)
+    
     @abstractmethod
     def get(self, key: str) -> bytes:
         """
@@ -79,6 +252,28 @@ class KVCacheStore(ABC):
         """
         pass
     
+    def get_into(self, key: str, out: Any) -> int:
+        """
+        Read a value directly into a caller-provided buffer.
+        
+        The default implementation copies the result of ``get_buffer`` into
+        ``out`` once. Backends that can transfer straight into user memory
+        should override it.
+        
+        Args:
+            key: The key to retrieve
+            out: Writable buffer-protocol object (bytearray, memoryview slice,
+                 pinned host buffer, ...) large enough to hold the value
+                 
+        Returns:
+            Number of bytes written, -1 if the key was not found, or -2 if
+            ``out`` is too small
+        """
+        data = self.get_buffer(key)
+        if data is None:
+            return -1
+        return copy_into(data, out)
+    
     @abstractmethod
     def get_size(self, key: str) -> int:
         """
@@ -118,6 +313,185 @@ class KVCacheStore(ABC):
         """
         pass
     
+    def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """
+        Store multiple key-value pairs in one call.
+        
+        The default implementation falls back to one ``put`` per key. Backends
+        with a native batch path should override it.
+        
+        Args:
+            keys: The keys to store
+            values: One value per key. A value may be a single buffer or a
+                    sequence of parts (stored like ``put(key, *parts)``)
+        
+        Returns:
+            One status per key: 0 on success, non-zero error code on failure
+        """
+        if len(keys) != len(values):
+            raise ValueError("keys and values must have the same length")
+        
+        results = []
+        for key, value in zip(keys, values):
+            parts = value if isinstance(value, (list, tuple)) else (value,)
+            try:
+                results.append(self.put(key, *parts))
+            except KVCacheError:
+                results.append(-1)
+        return results
+    
+    def batch_get(self, keys: List[str]) -> List[bytes]:
+        """
+        Retrieve multiple values in one call.
+        
+        Args:
+            keys: The keys to retrieve
+        
+        Returns:
+            One value per key, empty bytes for keys that were not found or
+            could not be read
+        """
+        results = []
+        for key in keys:
+            try:
+                results.append(self.get(key))
+            except KVCacheError:
+                results.append(b"")
+        return results
+    
+    def batch_get_into(self, keys: List[str], outs: List[Any]) -> List[int]:
+        """
+        Read multiple values directly into caller-provided buffers.
+        
+        Args:
+            keys: The keys to retrieve
+            outs: One writable buffer per key
+            
+        Returns:
+            One result per key: bytes written, or negative on failure
+            (see ``get_into``)
+        """
+        if len(keys) != len(outs):
+            raise ValueError("keys and outs must have the same length")
+        
+        results = []
+        for key, out in zip(keys, outs):
+            try:
+                results.append(self.get_into(key, out))
+            except KVCacheError:
+                results.append(-1)
+        return results
+    
+    def batch_is_exist(self, keys: List[str]) -> List[int]:
+        """
+        Check existence of multiple keys in one call.
+        
+        Args:
+            keys: The keys to check
+        
+        Returns:
+            One status per key: 1 if the key exists, 0 if not, negative on error
+        """
+        results = []
+        for key in keys:
+            try:
+                results.append(self.is_exist(key))
+            except KVCacheError:
+                results.append(-1)
+        return results
+    
+    def batch_remove(self, keys: List[str]) -> List[int]:
+        """
+        Remove multiple keys in one call.
+        
+        Args:
+            keys: The keys to remove
+        
+        Returns:
+            One status per key: 0 on success, non-zero error code on failure
+        """
+        results = []
+        for key in keys:
+            try:
+                results.append(self.remove(key))
+            except KVCacheError:
+                results.append(-1)
+        return results
+    
+    def put_stream(self, key: str, buffers: Iterable[Any], chunk_size: Optional[int] = None,
+                   max_in_flight: Optional[int] = None) -> int:
+        """
+        Store a value larger than one transfer as chunks under a manifest key.
+        
+        Args:
+            key: The stream key
+            buffers: Buffer-protocol objects making up the value, in order
+            chunk_size: Size of each chunk (default 8 MiB); at most the
+                        backend's ``local_buffer_size``
+            max_in_flight: Number of concurrent chunk writes (default 4)
+        
+        Returns:
+            0 on success, non-zero error code on failure
+        """
+        from .stream import put_stream, DEFAULT_CHUNK_SIZE, DEFAULT_MAX_IN_FLIGHT
+        return put_stream(self, key, buffers, chunk_size or DEFAULT_CHUNK_SIZE,
+                          max_in_flight or DEFAULT_MAX_IN_FLIGHT)
+    
+    def get_stream(self, key: str, max_in_flight: Optional[int] = None) -> Iterator[memoryview]:
+        """
+        Read a value written with ``put_stream`` chunk by chunk, fetching
+        ahead of the consumer.
+        
+        Each memoryview is only valid until the next one is requested.
+        
+        Args:
+            key: The stream key
+            max_in_flight: Number of chunks fetched ahead (default 4)
+        
+        Returns:
+            Iterator of read-only memoryviews of consecutive chunks
+        """
+        from .stream import get_stream, DEFAULT_MAX_IN_FLIGHT
+        return get_stream(self, key, max_in_flight or DEFAULT_MAX_IN_FLIGHT)
+    
+    def remove_stream(self, key: str) -> int:
+        """
+        Remove a value written with ``put_stream``, including its chunks.
+        
+        Returns:
+            0 on success, -1 if the key does not exist
+        """
+        from .stream import remove_stream
+        return remove_stream(self, key)
+    
+    def register_buffer(self, buffer: Any) -> int:
+        """
+        Register a local buffer so later transfers into or out of it can
+        avoid intermediate copies.
+        
+        Backends without memory registration accept any buffer, so the
+        default implementation does nothing.
+        
+        Args:
+            buffer: Writable buffer-protocol object to register
+            
+        Returns:
+            0 on success, non-zero error code on failure
+        """
+        return 0
+    
+    def unregister_buffer(self, buffer: Any) -> int:
+        """
+        Unregister a buffer previously passed to ``register_buffer``.
+        
+        Args:
+            buffer: The registered buffer
+            
+        Returns:
+            0 on success, non-zero error code on failure
+        """
+        return 0
+    
     @abstractmethod
     def close(self) -> int:
         """
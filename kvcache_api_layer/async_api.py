@@ -0,0 +1,289 @@
+"""
+Asyncio facade for the KV Cache API layer.
+
+Every ``KVCacheStore`` method blocks the calling thread. ``AsyncKVCacheStore``
+runs them on a dedicated thread pool so that an event loop keeps serving
+other requests while a transfer is in flight. With ``coalesce=True``,
+coroutines reading the same key at once share a single fetch.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, Optional, Any, List, Dict, Callable, Tuple
+from .api import KVCacheStore, BatchValue
+from .coalesce import GET, GET_BUFFER, share_buffer
+from .exceptions import InvalidOperationError
+
+
+class AsyncKVCacheStore:
+    """Awaitable wrapper around any ``KVCacheStore`` with bounded concurrency."""
+    
+    def __init__(self,
+                 store: KVCacheStore,
+                 max_workers: int = 8,
+                 max_in_flight: Optional[int] = None,
+                 coalesce: bool = False):
+        """
+        Wrap a store for use from asyncio code.
+        
+        Args:
+            store: The blocking store to wrap, e.g. from ``create_store``
+            max_workers: Number of threads in the dedicated executor
+            max_in_flight: Maximum number of operations submitted at once;
+                           further callers wait. Defaults to ``max_workers``
+            coalesce: Let concurrent ``get``, ``get_buffer`` and
+                      ``batch_get`` calls for the same key share one fetch.
+                      Waiting callers hold no executor slot, and shared
+                      ``get_buffer`` results are read-only memoryviews
+            
+        Raises:
+            ValueError: If a limit is not positive
+        """
+        if max_workers <= 0:
+            raise ValueError("max_workers must be positive")
+        if max_in_flight is not None and max_in_flight <= 0:
+            raise ValueError("max_in_flight must be positive")
+        
+        self._store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="kvcache-async")
+        self._max_in_flight = max_in_flight or max_workers
+        # Created lazily so the semaphore binds to the loop that uses it
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self._closed = False
+        
+        self._coalesce = coalesce
+        # Pending results by (kind, key); only touched from the event loop
+        self._flights: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._fetches = 0
+        self._saved = 0
+    
+    async def _run(self, fn: Callable, *args: Any) -> Any:
+        """
+        Run a blocking call on the executor.
+        
+        The in-flight slot is held until the call has actually finished in
+        its thread, so cancelling a waiter never lets more than
+        ``max_in_flight`` calls run. A call that has not started yet is
+        dropped from the executor queue on cancellation.
+        """
+        if self._closed:
+            raise InvalidOperationError("AsyncKVCacheStore is closed")
+        
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_in_flight)
+        semaphore = self._semaphore
+        
+        await semaphore.acquire()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            semaphore.release()
+            raise
+        self._in_flight += 1
+        
+        def _release(_):
+            def _done():
+                self._in_flight -= 1
+                semaphore.release()
+            try:
+                loop.call_soon_threadsafe(_done)
+            except RuntimeError:
+                # Loop already closed; nobody is left waiting on the slot
+                pass
+        
+        future.add_done_callback(_release)
+        return await asyncio.wrap_future(future, loop=loop)
+    
+    def _lead(self, kind: str, keys: List[str], fetch: Callable[[], List[Any]]) -> List[asyncio.Future]:
+        """
+        Start one fetch for ``keys`` that other coroutines can join per key.
+        ``fetch`` is a blocking call returning one result per key.
+        
+        The fetch runs as its own task, so cancelling any one waiter does not
+        cancel it for the others.
+        """
+        loop = asyncio.get_running_loop()
+        flights = []
+        for key in keys:
+            flight = loop.create_future()
+            self._flights[(kind, key)] = flight
+            flight.add_done_callback(lambda f, k=(kind, key): self._land(k, f))
+            flights.append(flight)
+        self._fetches += len(keys)
+        
+        def fan_out(task: asyncio.Future) -> None:
+            for i, flight in enumerate(flights):
+                if flight.done():
+                    continue
+                if task.cancelled():
+                    flight.cancel()
+                elif task.exception() is not None:
+                    flight.set_exception(task.exception())
+                else:
+                    flight.set_result(task.result()[i])
+        
+        asyncio.ensure_future(self._run(fetch)).add_done_callback(fan_out)
+        return flights
+    
+    def _land(self, flight_key: Tuple[str, str], flight: asyncio.Future) -> None:
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+        if not flight.cancelled():
+            # Mark the error as retrieved even if every waiter was cancelled
+            flight.exception()
+    
+    async def _coalesced(self, kind: str, key: str, fetch: Callable[[], Any]) -> Any:
+        flight = self._flights.get((kind, key))
+        if flight is None:
+            flight, = self._lead(kind, [key], lambda: [fetch()])
+        else:
+            self._saved += 1
+        return await asyncio.shield(flight)
+    
+    def _detach(self, keys: List[str]) -> None:
+        for key in keys:
+            self._flights.pop((GET, key), None)
+            self._flights.pop((GET_BUFFER, key), None)
+    
+    async def setup(self,
+                    local_hostname: str,
+                    metadata_server: str,
+                    global_segment_size: int,
+                    local_buffer_size: int,
+                    protocol: str = "tcp",
+                    device_name: str = "lo",
+                    master_server_address: Optional[str] = None) -> int:
+        """Awaitable ``KVCacheStore.setup``."""
+        return await self._run(self._store.setup, local_hostname, metadata_server,
+                               global_segment_size, local_buffer_size, protocol,
+                               device_name, master_server_address)
+    
+    async def put(self, key: str, *values: Union[bytes, bytearray]) -> int:
+        """Awaitable ``KVCacheStore.put``."""
+        self._detach([key])
+        return await self._run(self._store.put, key, *values)
+    
+    async def put_from(self, key: str, *buffers: Any) -> int:
+        """Awaitable ``KVCacheStore.put_from``."""
+        self._detach([key])
+        return await self._run(self._store.put_from, key, *buffers)
+    
+    async def put_with_hints(self, key: str, *values: Union[bytes, bytearray],
+                             ttl: Optional[float] = None, priority: int = 0, pin: bool = False) -> int:
+        """Awaitable ``KVCacheStore.put_with_hints``."""
+        self._detach([key])
+        return await self._run(lambda: self._store.put_with_hints(key, *values, ttl=ttl,
+                                                                  priority=priority, pin=pin))
+    
+    async def get(self, key: str) -> bytes:
+        """Awaitable ``KVCacheStore.get``."""
+        if self._coalesce:
+            return await self._coalesced(GET, key, lambda: self._store.get(key))
+        return await self._run(self._store.get, key)
+    
+    async def get_buffer(self, key: str) -> Optional[Any]:
+        """Awaitable ``KVCacheStore.get_buffer``."""
+        if self._coalesce:
+            return await self._coalesced(GET_BUFFER, key,
+                                         lambda: share_buffer(self._store.get_buffer(key)))
+        return await self._run(self._store.get_buffer, key)
+    
+    async def get_into(self, key: str, out: Any) -> int:
+        """Awaitable ``KVCacheStore.get_into``."""
+        return await self._run(self._store.get_into, key, out)
+    
+    async def get_size(self, key: str) -> int:
+        """Awaitable ``KVCacheStore.get_size``."""
+        return await self._run(self._store.get_size, key)
+    
+    async def is_exist(self, key: str) -> int:
+        """Awaitable ``KVCacheStore.is_exist``."""
+        return await self._run(self._store.is_exist, key)
+    
+    async def remove(self, key: str) -> int:
+        """Awaitable ``KVCacheStore.remove``."""
+        self._detach([key])
+        return await self._run(self._store.remove, key)
+    
+    async def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """Awaitable ``KVCacheStore.batch_put``."""
+        self._detach(keys)
+        return await self._run(self._store.batch_put, keys, values)
+    
+    async def batch_get(self, keys: List[str]) -> List[bytes]:
+        """Awaitable ``KVCacheStore.batch_get``."""
+        if not self._coalesce:
+            return await self._run(self._store.batch_get, keys)
+        
+        flights: List[Optional[asyncio.Future]] = [self._flights.get((GET, key)) for key in keys]
+        self._saved += sum(1 for flight in flights if flight is not None)
+        missing = list(dict.fromkeys(key for key, flight in zip(keys, flights) if flight is None))
+        if missing:
+            led = dict(zip(missing, self._lead(GET, missing, lambda: self._store.batch_get(missing))))
+            self._saved += sum(1 for flight in flights if flight is None) - len(missing)
+            flights = [led[key] if flight is None else flight for key, flight in zip(keys, flights)]
+        return list(await asyncio.gather(*[asyncio.shield(flight) for flight in flights]))
+    
+    async def batch_get_into(self, keys: List[str], outs: List[Any]) -> List[int]:
+        """Awaitable ``KVCacheStore.batch_get_into``."""
+        return await self._run(self._store.batch_get_into, keys, outs)
+    
+    async def batch_is_exist(self, keys: List[str]) -> List[int]:
+        """Awaitable ``KVCacheStore.batch_is_exist``."""
+        return await self._run(self._store.batch_is_exist, keys)
+    
+    async def batch_remove(self, keys: List[str]) -> List[int]:
+        """Awaitable ``KVCacheStore.batch_remove``."""
+        self._detach(keys)
+        return await self._run(self._store.batch_remove, keys)
+    
+    async def close(self) -> int:
+        """
+        Close the wrapped store and shut down the executor.
+        
+        Returns:
+            0 on success, non-zero error code on failure
+        """
+        if self._closed:
+            return 0
+        
+        retcode = await self._run(self._store.close)
+        self._closed = True
+        self._executor.shutdown(wait=False)
+        return retcode
+    
+    @property
+    def store(self) -> KVCacheStore:
+        """The wrapped blocking store."""
+        return self._store
+    
+    @property
+    def in_flight(self) -> int:
+        """Number of operations currently submitted to the executor."""
+        return self._in_flight
+    
+    def coalescing_stats(self) -> Dict[str, int]:
+        """
+        Get coalescing counters; all zero unless ``coalesce`` is set.
+        
+        Returns:
+            Dictionary with fetches (keys fetched from the store),
+            saved_fetches (reads served by another coroutine's fetch) and
+            in_flight (keys being fetched)
+        """
+        return {
+            'fetches': self._fetches,
+            'saved_fetches': self._saved,
+            'in_flight': len(self._flights),
+        }
+    
+    async def __aenter__(self):
+        """Async context manager entry."""
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit."""
+        await self.close()
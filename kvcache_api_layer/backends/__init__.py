@@ -12,6 +12,9 @@ class BackendType(Enum):
     """Available backend types."""
     MOONCAKE = "mooncake"
     RUST = "rust"
+    LOCAL = "local"
+    SHM = "shm"
+    DISK = "disk"
 
 
 def create_store(backend_type: BackendType, **kwargs) -> KVCacheStore:
@@ -42,6 +45,18 @@ def create_store(backend_type: BackendType, **kwargs) -> KVCacheStore:
         except ImportError as e:
             raise BackendNotFoundError(f"Rust backend not available: {e}")
     
+    elif backend_type == BackendType.LOCAL:
+        from .local import LocalStore
+        return LocalStore(**kwargs)
+    
+    elif backend_type == BackendType.SHM:
+        from .shm import SharedMemoryStore
+        return SharedMemoryStore(**kwargs)
+    
+    elif backend_type == BackendType.DISK:
+        from .disk import DiskStore
+        return DiskStore(**kwargs)
+    
     else:
         raise BackendNotFoundError(f"Unknown backend type: {backend_type}")
 
@@ -55,10 +70,11 @@ def list_available_backends() -> list[BackendType]:
     """
     available = []
     
-    # Check Mooncake
+    # Check Mooncake (the wrapper always imports; the native store may not)
     try:
-        from .mooncake import MooncakeStore
-        available.append(BackendType.MOONCAKE)
+        from .mooncake import MooncakeDistributedStore
+        if MooncakeDistributedStore is not None:
+            available.append(BackendType.MOONCAKE)
     except ImportError:
         pass
     
@@ -69,4 +85,15 @@ def list_available_backends() -> list[BackendType]:
     except ImportError:
         pass
     
+    # Local and disk backends have no external dependencies
+    available.append(BackendType.LOCAL)
+    available.append(BackendType.DISK)
+    
+    # Shared memory needs POSIX shm and record locks
+    try:
+        from .shm import SharedMemoryStore
+        available.append(BackendType.SHM)
+    except ImportError:
+        pass
+    
     return available 
\ No newline at end of file
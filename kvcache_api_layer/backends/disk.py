@@ -0,0 +1,484 @@
+"""
+Persistent disk tier for the KV Cache API layer.
+
+``DiskStore`` keeps values in append-only segment files on local disk
+(typically NVMe) and serves them from ``mmap``. Each segment file
+``NNNNNNNN.seg`` has a sidecar index ``NNNNNNNN.idx``: a list of small
+fixed-size entries (key, offset, size, sequence number) that are appended
+as values are written. On startup only the index files are read, so a
+store holding hundreds of GB is warm again in the time it takes to parse a
+few MB of index; payload pages are faulted in by the OS on first access.
+
+Segments are never rewritten. Overwritten and removed values become
+garbage that is reclaimed when the whole segment is dropped; once the
+store grows past ``max_bytes`` the oldest segment goes first.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Union, Optional, Any, List, Dict, Set, Tuple
+from ..api import KVCacheStore, BatchValue, copy_into, copy_bytes, PUT_PATH_ZERO_COPY
+from ..exceptions import StorageError, StoreInitializationError
+
+
+# crc32, flags, key length, offset, value size, seq; followed by the key.
+# The crc covers everything after itself, including the key.
+_INDEX_ENTRY = struct.Struct("<IBxHQQQ")
+_FLAG_PUT = 0
+_FLAG_REMOVE = 1
+_ALIGN = 64
+# Where the Helm chart mounts the disk tier
+DEFAULT_PATH = "/var/lib/kvcache"
+
+
+def _align(n: int) -> int:
+    return (n + _ALIGN - 1) & ~(_ALIGN - 1)
+
+
+class _Segment:
+    """One segment file, its mapping and the keys whose latest value it holds."""
+    
+    __slots__ = ('seg_id', 'path', 'size', 'used', 'mmap', 'view', 'index', 'keys')
+    
+    def __init__(self, seg_id: int, path: str, size: int, used: int):
+        self.seg_id = seg_id
+        self.path = path
+        self.size = size
+        self.used = used
+        self.mmap = None
+        self.view = None
+        self.index = None
+        self.keys: Set[str] = set()
+
+
+class DiskStore(KVCacheStore):
+    """
+    ``KVCacheStore`` persisted in mmap'd, append-only segment files.
+    
+    Values survive process restarts: a new ``DiskStore`` on the same
+    directory rebuilds its index from the ``.idx`` files and serves the
+    previous contents. ``get_buffer`` returns a read-only view of the
+    mapping; it stays valid until the segment holding it is dropped.
+    
+    All methods are thread-safe. Reads copy outside the store lock, and
+    large copies release the GIL.
+    
+    Writes are not synced to disk unless ``fsync`` is set, so a crash (as
+    opposed to a clean restart) may lose the most recent values. Index
+    entries are checksummed and a torn tail is ignored on load.
+    """
+    
+    def __init__(self,
+                 path: str = DEFAULT_PATH,
+                 segment_size: int = 256 * 1024 * 1024,
+                 max_bytes: Optional[int] = None,
+                 fsync: bool = False):
+        """
+        Initialize the disk store.
+        
+        Args:
+            path: Directory holding the segment files; created if missing.
+                  Defaults to the chart's disk tier mount, so that
+                  ``backend: disk`` works without options
+            segment_size: Size of each segment file. Larger values get a
+                          segment of their own
+            max_bytes: Upper bound on the total size of the segment files;
+                       the oldest segments are dropped beyond it. None for
+                       no limit
+            fsync: Flush data and index to disk on every write
+        """
+        if segment_size <= 0:
+            raise ValueError("segment_size must be positive")
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        
+        self._path = path
+        self._segment_size = segment_size
+        self._max_bytes = max_bytes
+        self._fsync = fsync
+        self._lock = threading.Lock()
+        self._initialized = False
+    
+    def setup(self,
+              local_hostname: str,
+              metadata_server: str,
+              global_segment_size: int,
+              local_buffer_size: int,
+              protocol: str = "tcp",
+              device_name: str = "lo",
+              master_server_address: Optional[str] = None) -> int:
+        """
+        Open the directory and rebuild the index from the ``.idx`` files.
+        The network and size arguments are accepted for interface
+        compatibility.
+        
+        Returns:
+            0 on success, non-zero error code on failure
+        """
+        with self._lock:
+            if self._initialized:
+                return 0
+            
+            self._segments: "OrderedDict[int, _Segment]" = OrderedDict()
+            self._entries: Dict[str, Tuple[int, int, int]] = {}
+            self._seq = 0
+            self._total_bytes = 0
+            self._dropped_segments = 0
+            try:
+                os.makedirs(self._path, exist_ok=True)
+                self._load()
+                self._active = None
+            except OSError as e:
+                raise StoreInitializationError(f"Failed to open disk store at {self._path}: {e}")
+            self._initialized = True
+        return 0
+    
+    # Recovery
+    
+    def _load(self) -> None:
+        """Replay every index file in segment order."""
+        seg_ids = sorted(int(name[:-4]) for name in os.listdir(self._path)
+                         if name.endswith(".seg") and name[:-4].isdigit())
+        latest: Dict[str, Tuple[int, int, int, int]] = {}
+        for seg_id in seg_ids:
+            seg_path = self._file(seg_id, "seg")
+            size = os.path.getsize(seg_path)
+            if size == 0:
+                os.remove(seg_path)
+                continue
+            try:
+                with open(self._file(seg_id, "idx"), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                data = b""
+            
+            pos = 0
+            while pos + _INDEX_ENTRY.size <= len(data):
+                crc, flags, key_len, offset, value_size, seq = _INDEX_ENTRY.unpack_from(data, pos)
+                end = pos + _INDEX_ENTRY.size + key_len
+                if end > len(data) or zlib.crc32(data[pos + 4:end]) != crc or offset + value_size > size:
+                    # Torn write at the tail of the index
+                    break
+                key = data[pos + _INDEX_ENTRY.size:end].decode()
+                pos = end
+                self._seq = max(self._seq, seq + 1)
+                prev = latest.get(key)
+                if prev is not None and prev[3] > seq:
+                    continue
+                if flags == _FLAG_REMOVE:
+                    latest[key] = (-1, 0, 0, seq)
+                else:
+                    latest[key] = (seg_id, offset, value_size, seq)
+            
+            # Segments from a previous run are sealed; writes go to a new one
+            segment = _Segment(seg_id, seg_path, size, size)
+            self._map(segment)
+            self._segments[seg_id] = segment
+            self._total_bytes += size
+        
+        for key, (seg_id, offset, value_size, _) in latest.items():
+            if seg_id >= 0:
+                self._entries[key] = (seg_id, offset, value_size)
+                self._segments[seg_id].keys.add(key)
+        self._next_id = (seg_ids[-1] + 1) if seg_ids else 1
+    
+    def _file(self, seg_id: int, ext: str) -> str:
+        return os.path.join(self._path, f"{seg_id:08d}.{ext}")
+    
+    def _map(self, segment: _Segment) -> None:
+        with open(segment.path, "r+b") as f:
+            segment.mmap = mmap.mmap(f.fileno(), segment.size)
+        segment.view = memoryview(segment.mmap)
+    
+    # Segment management; callers hold the lock
+    
+    def _open_segment(self, min_size: int) -> _Segment:
+        """Start a new segment; files are sparse, so preallocating is cheap."""
+        if self._active is not None:
+            self._seal(self._active)
+        
+        seg_id = self._next_id
+        self._next_id += 1
+        size = max(self._segment_size, _align(min_size))
+        path = self._file(seg_id, "seg")
+        with open(path, "wb") as f:
+            f.truncate(size)
+        segment = _Segment(seg_id, path, size, 0)
+        self._map(segment)
+        segment.index = open(self._file(seg_id, "idx"), "ab")
+        self._segments[seg_id] = segment
+        self._total_bytes += size
+        self._active = segment
+        self._enforce_limit()
+        return segment
+    
+    def _seal(self, segment: _Segment) -> None:
+        if segment.index is not None:
+            segment.index.close()
+            segment.index = None
+        self._active = None
+    
+    def _enforce_limit(self) -> None:
+        if self._max_bytes is None:
+            return
+        while self._total_bytes > self._max_bytes and len(self._segments) > 1:
+            oldest = next(iter(self._segments.values()))
+            if oldest is self._active:
+                break
+            self._drop_segment(oldest)
+    
+    def _drop_segment(self, segment: _Segment) -> None:
+        for key in segment.keys:
+            del self._entries[key]
+        del self._segments[segment.seg_id]
+        self._total_bytes -= segment.size
+        self._dropped_segments += 1
+        if segment.index is not None:
+            segment.index.close()
+        segment.view.release()
+        try:
+            segment.mmap.close()
+        except BufferError:
+            # A caller still holds a view; the mapping is freed with it and
+            # the unlinked file's blocks are released by the OS afterwards
+            pass
+        for ext in ("seg", "idx"):
+            try:
+                os.remove(self._file(segment.seg_id, ext))
+            except FileNotFoundError:
+                pass
+    
+    def _append_index(self, segment: _Segment, flags: int, key: bytes,
+                      offset: int, size: int, seq: int) -> None:
+        body = _INDEX_ENTRY.pack(0, flags, len(key), offset, size, seq)[4:] + key
+        segment.index.write(struct.pack("<I", zlib.crc32(body)) + body)
+        if self._fsync:
+            segment.index.flush()
+            os.fsync(segment.index.fileno())
+        else:
+            # Hand the entry to the OS so a process crash does not lose it
+            segment.index.flush()
+    
+    def _forget(self, key: str) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._segments[old[0]].keys.discard(key)
+    
+    def _put_locked(self, key: str, views: List[memoryview]) -> int:
+        size = sum(v.nbytes for v in views)
+        segment = self._active
+        if segment is None or segment.used + size > segment.size:
+            segment = self._open_segment(size)
+        
+        offset = segment.used
+        pos = offset
+        for view in views:
+            copy_bytes(segment.view[pos:pos + view.nbytes], view)
+            pos += view.nbytes
+        if self._fsync:
+            segment.mmap.flush()
+        segment.used = _align(offset + size)
+        
+        seq = self._seq
+        self._seq += 1
+        self._append_index(segment, _FLAG_PUT, key.encode(), offset, size, seq)
+        self._forget(key)
+        self._entries[key] = (segment.seg_id, offset, size)
+        segment.keys.add(key)
+        return 0
+    
+    def _lookup(self, key: str) -> Optional[memoryview]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        seg_id, offset, size = entry
+        return self._segments[seg_id].view[offset:offset + size]
+    
+    # KVCacheStore interface
+    
+    def _check(self) -> None:
+        if not self._initialized:
+            raise StorageError("Store not initialized. Call setup() first.")
+    
+    def put(self, key: str, *values: Union[bytes, bytearray]) -> int:
+        """Append a value to the active segment and record it in the index."""
+        self._check()
+        if not values:
+            raise ValueError("At least one value must be provided")
+        
+        views = [memoryview(v).cast('B') for v in values]
+        with self._lock:
+            try:
+                return self._put_locked(key, views)
+            except OSError as e:
+                raise StorageError(f"Failed to write key '{key}' to disk: {e}")
+    
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """Copy buffer-protocol slices straight into the segment mapping."""
+        self._check()
+        if not buffers:
+            raise ValueError("At least one buffer must be provided")
+        
+        self._count_put_path(PUT_PATH_ZERO_COPY)
+        return self.put(key, *buffers)
+    
+    def spill(self, key: str, value: Any) -> None:
+        """
+        Eviction callback for an upper tier, e.g.
+        ``LocalStore(on_evict=disk.spill)``. Errors are swallowed, since
+        losing a spilled block only costs a later recompute.
+        """
+        try:
+            self.put(key, value)
+        except Exception:
+            pass
+    
+    def demote(self, store: KVCacheStore, keys: List[str]) -> List[int]:
+        """
+        Move values from another store to disk, removing them there.
+        
+        Args:
+            store: The store to demote from
+            keys: Keys to move
+            
+        Returns:
+            List of status codes, -1 for keys not found in ``store``
+        """
+        results = []
+        for key in keys:
+            buffer = store.get_buffer(key)
+            if buffer is None:
+                results.append(-1)
+                continue
+            status = self.put(key, buffer)
+            if status == 0:
+                store.remove(key)
+            results.append(status)
+        return results
+    
+    def get(self, key: str) -> bytes:
+        """Retrieve a copy of a value, or empty bytes if not found."""
+        self._check()
+        with self._lock:
+            view = self._lookup(key)
+        # Segments are never rewritten and the view keeps the mapping alive,
+        # so the copy (and its page faults) can run outside the lock
+        return b"" if view is None else view.tobytes()
+    
+    def get_buffer(self, key: str) -> Optional[Any]:
+        """Get a read-only view of a value served from the mmap, or None."""
+        self._check()
+        with self._lock:
+            view = self._lookup(key)
+            return None if view is None else view.toreadonly()
+    
+    def get_into(self, key: str, out: Any) -> int:
+        """Copy a value into ``out``; returns bytes written or negative on failure."""
+        self._check()
+        with self._lock:
+            view = self._lookup(key)
+        return -1 if view is None else copy_into(view, out)
+    
+    def get_size(self, key: str) -> int:
+        """Get the size of a value, or -1 if not found."""
+        self._check()
+        entry = self._entries.get(key)
+        return -1 if entry is None else entry[2]
+    
+    def is_exist(self, key: str) -> int:
+        """Return 1 if the key exists, 0 if not."""
+        self._check()
+        return 1 if key in self._entries else 0
+    
+    def keys(self) -> List[str]:
+        """Get a snapshot of the stored keys, in no particular order."""
+        self._check()
+        with self._lock:
+            return list(self._entries)
+    
+    def remove(self, key: str) -> int:
+        """Remove a key by appending a tombstone to the index."""
+        self._check()
+        with self._lock:
+            if key not in self._entries:
+                return -1
+            segment = self._active
+            if segment is not None:
+                self._append_index(segment, _FLAG_REMOVE, key.encode(), 0, 0, self._seq)
+            else:
+                # No segment is open for writing: record the tombstone in
+                # the index of the segment holding the value instead of
+                # starting a new one; replay orders entries by seq
+                segment = self._segments[self._entries[key][0]]
+                segment.index = open(self._file(segment.seg_id, "idx"), "ab")
+                try:
+                    self._append_index(segment, _FLAG_REMOVE, key.encode(), 0, 0, self._seq)
+                finally:
+                    segment.index.close()
+                    segment.index = None
+            self._seq += 1
+            self._forget(key)
+        return 0
+    
+    def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """Store multiple values under a single lock acquisition."""
+        self._check()
+        if len(keys) != len(values):
+            raise ValueError("keys and values must have the same length")
+        
+        results = []
+        with self._lock:
+            for key, value in zip(keys, values):
+                parts = value if isinstance(value, (list, tuple)) else (value,)
+                try:
+                    results.append(self._put_locked(key, [memoryview(p).cast('B') for p in parts]))
+                except OSError:
+                    results.append(-1)
+        return results
+    
+    def batch_is_exist(self, keys: List[str]) -> List[int]:
+        """Check existence of multiple keys."""
+        self._check()
+        entries = self._entries
+        return [1 if key in entries else 0 for key in keys]
+    
+    def close(self) -> int:
+        """Flush and unmap all segments; the data stays on disk."""
+        with self._lock:
+            if not self._initialized:
+                return 0
+            self._initialized = False
+            for segment in self._segments.values():
+                if segment.index is not None:
+                    segment.index.close()
+                segment.view.release()
+                try:
+                    segment.mmap.flush()
+                    segment.mmap.close()
+                except BufferError:
+                    pass
+            self._segments = OrderedDict()
+            self._entries = {}
+            self._active = None
+        return 0
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get disk usage counters.
+        
+        Returns:
+            Dictionary with disk_bytes (size of all segment files),
+            segment_count, object_count and dropped_segments
+        """
+        self._check()
+        with self._lock:
+            return {
+                'disk_bytes': self._total_bytes,
+                'segment_count': len(self._segments),
+                'object_count': len(self._entries),
+                'dropped_segments': self._dropped_segments,
+            }
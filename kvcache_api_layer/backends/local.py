@@ -0,0 +1,570 @@
+"""
+In-process reference backend for the KV Cache API layer.
+
+``LocalStore`` keeps every value in one preallocated arena of
+``global_segment_size`` bytes. It needs no external services, so it serves
+as a performance baseline and as a stand-in for Mooncake in CI.
+
+The arena is carved into fixed-size pages. Each page is assigned on demand
+to one size class and split into equal chunks (memcached-style slab
+allocation), so allocation and free are O(1) free-list operations and the
+arena never fragments. When a size class runs out of chunks and no free
+page is left, values are evicted in the order of the eviction policy (LRU
+by default, see ``eviction``): first from the same class, otherwise a whole
+page is reclaimed from the class holding the coldest value. Values pinned
+with ``put_with_hints`` are never evicted, and values with a TTL are
+dropped once it runs out.
+"""
+
+import bisect
+import mmap
+import threading
+import time
+from typing import Union, Optional, Any, List, Dict, Callable, Tuple
+from ..api import (KVCacheStore, BatchValue, copy_into, copy_bytes,
+                   PUT_PATH_ZERO_COPY, GIL_FREE_COPY_THRESHOLD)
+from ..eviction import EvictionPolicy, Reaper, create_policy, check_hints
+from ..exceptions import StorageError
+
+
+class _Entry:
+    """Location of a stored value inside the arena."""
+    
+    __slots__ = ('offset', 'size', 'cls', 'expires', 'pinned', 'priority')
+    
+    def __init__(self, offset: int, size: int, cls: int):
+        self.offset = offset
+        self.size = size
+        self.cls = cls
+        # ``time.monotonic()`` deadline of a value put with a TTL
+        self.expires: Optional[float] = None
+        self.pinned = False
+        self.priority = 0
+
+
+def _live(entry: Optional[_Entry]) -> bool:
+    """Whether an entry exists and has not expired."""
+    return entry is not None and (entry.expires is None or entry.expires > time.monotonic())
+
+
+class _SizeClass:
+    """Chunks of one size: free list, live values and their eviction order."""
+    
+    __slots__ = ('chunk_size', 'free', 'live', 'policy', 'pages')
+    
+    def __init__(self, chunk_size: int, policy: EvictionPolicy):
+        self.chunk_size = chunk_size
+        self.free: List[int] = []
+        self.live: Dict[str, _Entry] = {}
+        # Tracks the unpinned values only
+        self.policy = policy
+        self.pages: List[int] = []
+
+
+class LocalStore(KVCacheStore):
+    """
+    Single-process ``KVCacheStore`` backed by a slab-allocated arena.
+    
+    All methods are thread-safe. Large ``get_into`` copies run outside the
+    store lock and release the GIL. ``get_buffer`` returns a read-only
+    ``memoryview`` into the arena without copying; it stays valid only
+    until the key is overwritten, removed or evicted, so callers that keep
+    data around must copy it (or use ``get``/``get_into``).
+    """
+    
+    def __init__(self,
+                 page_size: int = 16 * 1024 * 1024,
+                 min_chunk_size: int = 64,
+                 growth_factor: float = 1.25,
+                 on_evict: Optional[Callable[[str, memoryview], None]] = None,
+                 eviction_policy: str = 'lru'):
+        """
+        Initialize the local store.
+        
+        Args:
+            page_size: Size of each slab page; also the largest value that
+                       can be stored. Capped at the arena size
+            min_chunk_size: Smallest size class in bytes
+            growth_factor: Ratio between consecutive size classes
+            on_evict: Called with the key and a read-only view of each value
+                      just before it is evicted, e.g. ``DiskStore.spill``
+                      to keep evicted blocks on a disk tier. Runs under the
+                      store lock and must not call back into this store
+            eviction_policy: Order in which unpinned values are evicted,
+                             one of ``lru``, ``lfu`` or ``gdsf``
+        """
+        if page_size <= 0 or min_chunk_size <= 0:
+            raise ValueError("page_size and min_chunk_size must be positive")
+        if growth_factor <= 1.0:
+            raise ValueError("growth_factor must be greater than 1")
+        create_policy(eviction_policy)
+        
+        self._page_size = page_size
+        self._min_chunk_size = min_chunk_size
+        self._growth_factor = growth_factor
+        self._on_evict = on_evict
+        self._eviction_policy = eviction_policy
+        self._reaper: Optional[Reaper] = None
+        self._arena = None
+        self._view = None
+        self._lock = threading.Lock()
+        self._initialized = False
+    
+    def setup(self,
+              local_hostname: str,
+              metadata_server: str,
+              global_segment_size: int,
+              local_buffer_size: int,
+              protocol: str = "tcp",
+              device_name: str = "lo",
+              master_server_address: Optional[str] = None) -> int:
+        """
+        Allocate the arena. Only ``global_segment_size`` is used; the network
+        arguments are accepted for interface compatibility.
+        
+        Returns:
+            0 on success, non-zero error code on failure
+        """
+        if global_segment_size <= 0:
+            raise ValueError("global_segment_size must be positive")
+        
+        with self._lock:
+            if self._initialized:
+                return 0
+            
+            # Anonymous mmap: pages are committed lazily by the OS, so setup
+            # is fast even for multi-GB arenas
+            self._arena = mmap.mmap(-1, global_segment_size)
+            self._view = memoryview(self._arena)
+            self._capacity = global_segment_size
+            
+            page_size = min(self._page_size, global_segment_size)
+            self._page_size = page_size
+            self._free_pages = list(range(0, global_segment_size - page_size + 1, page_size))
+            self._free_pages.reverse()
+            
+            sizes = []
+            size = self._min_chunk_size
+            while size < page_size:
+                sizes.append(size)
+                size = max(size + 8, (int(size * self._growth_factor) + 7) & ~7)
+            sizes.append(page_size)
+            self._class_sizes = sizes
+            self._classes = [_SizeClass(s, create_policy(self._eviction_policy)) for s in sizes]
+            
+            self._entries: Dict[str, _Entry] = {}
+            self._page_live: Dict[int, int] = {}
+            self._used_bytes = 0
+            self._evictions = 0
+            self._expirations = 0
+            self._initialized = True
+        return 0
+    
+    # Allocation
+    
+    def _class_for(self, size: int) -> int:
+        idx = bisect.bisect_left(self._class_sizes, size)
+        if idx == len(self._class_sizes):
+            raise StorageError(
+                f"Value of {size} bytes exceeds the maximum of {self._page_size} bytes")
+        return idx
+    
+    def _assign_page(self, cls: _SizeClass, page: int) -> None:
+        cls.pages.append(page)
+        self._page_live[page] = 0
+        n_chunks = self._page_size // cls.chunk_size
+        cls.free.extend(page + i * cls.chunk_size for i in range(n_chunks - 1, -1, -1))
+    
+    def _drop(self, key: str, entry: _Entry, evicted: bool = False) -> None:
+        """Forget a value and return its chunk to the free list."""
+        cls = self._classes[entry.cls]
+        del self._entries[key]
+        del cls.live[key]
+        cls.policy.discard(key, evicted)
+        cls.free.append(entry.offset)
+        self._page_live[entry.offset - entry.offset % self._page_size] -= 1
+        self._used_bytes -= entry.size
+    
+    def _evict(self, key: str, entry: _Entry) -> None:
+        if self._on_evict is not None:
+            view = self._view[entry.offset:entry.offset + entry.size].toreadonly()
+            try:
+                self._on_evict(key, view)
+            except Exception:
+                # A failing spill must not fail the write that evicted
+                pass
+            finally:
+                view.release()
+        self._drop(key, entry, evicted=True)
+        self._evictions += 1
+    
+    def _release_page(self, cls: _SizeClass, page: int) -> None:
+        """Return an empty page of a size class to the free pool."""
+        page_end = page + self._page_size
+        cls.free = [off for off in cls.free if not page <= off < page_end]
+        cls.pages.remove(page)
+        del self._page_live[page]
+        self._free_pages.append(page)
+    
+    def _reclaim_empty_page(self, exclude: int) -> bool:
+        """Move a page without live values from another size class to the free pool."""
+        for idx, cls in enumerate(self._classes):
+            if idx == exclude:
+                continue
+            for page in cls.pages:
+                if self._page_live[page] == 0:
+                    self._release_page(cls, page)
+                    return True
+        return False
+    
+    def _coldest_class(self, exclude: int) -> Optional[Tuple[int, tuple]]:
+        """Index and victim score of the other size class holding the coldest value."""
+        coldest = None
+        for idx, cls in enumerate(self._classes):
+            if idx == exclude:
+                continue
+            key = cls.policy.victim()
+            if key is None:
+                continue
+            score = cls.policy.score(key)
+            if coldest is None or score < coldest[1]:
+                coldest = (idx, score)
+        return coldest
+    
+    def _reclaim_page(self, victim: int) -> bool:
+        """
+        Evict the values on the page holding a class's coldest value and
+        free the page, unless a value on it is pinned.
+        """
+        cls = self._classes[victim]
+        coldest = cls.live[cls.policy.victim()]
+        page = coldest.offset - coldest.offset % self._page_size
+        page_end = page + self._page_size
+        on_page = [(key, entry) for key, entry in cls.live.items() if page <= entry.offset < page_end]
+        if any(entry.pinned for _, entry in on_page):
+            return False
+        for key, entry in on_page:
+            self._evict(key, entry)
+        self._release_page(cls, page)
+        return True
+    
+    def _allocate(self, size: int) -> _Entry:
+        idx = self._class_for(size)
+        cls = self._classes[idx]
+        while not cls.free:
+            if self._free_pages:
+                self._assign_page(cls, self._free_pages.pop())
+                continue
+            if self._reclaim_empty_page(idx):
+                continue
+            
+            # Evict whichever is colder: this class's next victim, or the
+            # page of the class holding the globally coldest value
+            own = cls.policy.victim()
+            other = self._coldest_class(idx)
+            if own is not None and (other is None or cls.policy.score(own) <= other[1]):
+                self._evict(own, cls.live[own])
+            elif other is not None and self._reclaim_page(other[0]):
+                continue
+            elif own is not None:
+                self._evict(own, cls.live[own])
+            else:
+                raise StorageError("Arena is full")
+        return _Entry(cls.free.pop(), size, idx)
+    
+    def _touch(self, key: str, entry: _Entry) -> None:
+        if not entry.pinned:
+            self._classes[entry.cls].policy.touch(key)
+    
+    # Expiry
+    
+    def _schedule_expiry(self, key: str, entry: _Entry) -> None:
+        if self._reaper is None:
+            self._reaper = Reaper(self._reap, name="kvcache-local-reaper")
+        self._reaper.schedule(key, entry.expires, entry)
+    
+    def _reap(self, due: List[Tuple[str, _Entry]]) -> None:
+        """Drop values whose TTL ran out, unless they were replaced since."""
+        with self._lock:
+            if not self._initialized:
+                return
+            for key, entry in due:
+                if self._entries.get(key) is entry:
+                    self._drop(key, entry)
+                    self._expirations += 1
+    
+    # KVCacheStore interface
+    
+    def _check(self) -> None:
+        if not self._initialized:
+            raise StorageError("Store not initialized. Call setup() first.")
+    
+    def _put_locked(self, key: str, views: List[memoryview], ttl: Optional[float] = None,
+                    priority: int = 0, pin: bool = False) -> int:
+        size = sum(v.nbytes for v in views)
+        old = self._entries.get(key)
+        if old is None:
+            entry = self._allocate(size)
+        elif old.cls == self._class_for(size):
+            # Same size class: the released chunk is the next one handed
+            # out, so the allocation cannot fail
+            self._drop(key, old)
+            entry = self._allocate(size)
+        else:
+            # Allocate before releasing the old value, so an overwrite that
+            # cannot be placed leaves it in place; pin it meanwhile so the
+            # allocation cannot evict it
+            was_pinned = old.pinned
+            old_policy = self._classes[old.cls].policy
+            old_policy.discard(key)
+            old.pinned = True
+            try:
+                entry = self._allocate(size)
+            finally:
+                old.pinned = was_pinned
+                if not was_pinned:
+                    old_policy.add(key, old.size, old.priority)
+            self._drop(key, old)
+        
+        offset = entry.offset
+        for view in views:
+            copy_bytes(self._view[offset:offset + view.nbytes], view)
+            offset += view.nbytes
+        
+        entry.pinned = pin
+        entry.priority = priority
+        if ttl is not None:
+            entry.expires = time.monotonic() + ttl
+        self._entries[key] = entry
+        cls = self._classes[entry.cls]
+        cls.live[key] = entry
+        if not pin:
+            cls.policy.add(key, size, priority)
+        self._page_live[entry.offset - entry.offset % self._page_size] += 1
+        self._used_bytes += size
+        if ttl is not None:
+            self._schedule_expiry(key, entry)
+        return 0
+    
+    def put(self, key: str, *values: Union[bytes, bytearray]) -> int:
+        """
+        Store a key-value pair; multiple parts are copied back to back into
+        one chunk without concatenating them first.
+        
+        Returns:
+            0 on success, non-zero error code on failure
+        """
+        self._check()
+        if not values:
+            raise ValueError("At least one value must be provided")
+        
+        views = [memoryview(v).cast('B') for v in values]
+        with self._lock:
+            return self._put_locked(key, views)
+    
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """Store buffer-protocol slices directly into the arena."""
+        self._check()
+        if not buffers:
+            raise ValueError("At least one buffer must be provided")
+        
+        views = [memoryview(b).cast('B') for b in buffers]
+        with self._lock:
+            self._count_put_path(PUT_PATH_ZERO_COPY)
+            return self._put_locked(key, views)
+    
+    def put_with_hints(self, key: str, *values: Union[bytes, bytearray],
+                       ttl: Optional[float] = None, priority: int = 0, pin: bool = False) -> int:
+        """Store a value with a TTL, eviction priority and pin, applied by the arena."""
+        self._check()
+        check_hints(ttl, priority)
+        if not values:
+            raise ValueError("At least one value must be provided")
+        
+        views = [memoryview(v).cast('B') for v in values]
+        with self._lock:
+            return self._put_locked(key, views, ttl, priority, pin)
+    
+    def _lookup(self, key: str) -> Optional[memoryview]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if not _live(entry):
+            self._drop(key, entry)
+            self._expirations += 1
+            return None
+        self._touch(key, entry)
+        return self._view[entry.offset:entry.offset + entry.size]
+    
+    def get(self, key: str) -> bytes:
+        """Retrieve a copy of a value, or empty bytes if not found."""
+        self._check()
+        with self._lock:
+            view = self._lookup(key)
+            return b"" if view is None else view.tobytes()
+    
+    def get_buffer(self, key: str) -> Optional[Any]:
+        """Get a read-only, zero-copy view of a value, or None if not found."""
+        self._check()
+        with self._lock:
+            view = self._lookup(key)
+            return None if view is None else view.toreadonly()
+    
+    def get_into(self, key: str, out: Any) -> int:
+        """
+        Copy a value into ``out``; returns bytes written or negative on failure.
+        
+        Large values are copied outside the store lock (and without the
+        GIL), so concurrent readers scale across cores. If the value is
+        replaced or evicted during the copy, it is copied again under the
+        lock.
+        """
+        self._check()
+        with self._lock:
+            view = self._lookup(key)
+            if view is None:
+                return -1
+            if view.nbytes < GIL_FREE_COPY_THRESHOLD:
+                return copy_into(view, out)
+            entry = self._entries[key]
+        
+        written = copy_into(view, out)
+        with self._lock:
+            # Chunks are only reused after their entry is dropped, and every
+            # put creates a new entry, so an unchanged entry means the copy
+            # was not torn
+            if self._entries.get(key) is entry:
+                return written
+            view = self._lookup(key)
+            return -1 if view is None else copy_into(view, out)
+    
+    def get_size(self, key: str) -> int:
+        """Get the size of a value, or -1 if not found."""
+        self._check()
+        entry = self._entries.get(key)
+        return entry.size if _live(entry) else -1
+    
+    def is_exist(self, key: str) -> int:
+        """Return 1 if the key exists, 0 if not."""
+        self._check()
+        return 1 if _live(self._entries.get(key)) else 0
+    
+    def keys(self) -> List[str]:
+        """Get a snapshot of the stored keys, in no particular order."""
+        self._check()
+        with self._lock:
+            return [key for key, entry in self._entries.items() if _live(entry)]
+    
+    def remove(self, key: str) -> int:
+        """Remove a key; returns -1 if it does not exist."""
+        self._check()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return -1
+            self._drop(key, entry)
+            return 0
+    
+    def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """Store multiple values under a single lock acquisition."""
+        self._check()
+        if len(keys) != len(values):
+            raise ValueError("keys and values must have the same length")
+        
+        results = []
+        with self._lock:
+            for key, value in zip(keys, values):
+                parts = value if isinstance(value, (list, tuple)) else (value,)
+                try:
+                    results.append(self._put_locked(key, [memoryview(p).cast('B') for p in parts]))
+                except StorageError:
+                    results.append(-1)
+        return results
+    
+    def batch_get(self, keys: List[str]) -> List[bytes]:
+        """Retrieve copies of multiple values under a single lock acquisition."""
+        self._check()
+        with self._lock:
+            results = []
+            for key in keys:
+                view = self._lookup(key)
+                results.append(b"" if view is None else view.tobytes())
+            return results
+    
+    def batch_get_into(self, keys: List[str], outs: List[Any]) -> List[int]:
+        """Copy multiple values into caller buffers under a single lock acquisition."""
+        self._check()
+        if len(keys) != len(outs):
+            raise ValueError("keys and outs must have the same length")
+        
+        with self._lock:
+            results = []
+            for key, out in zip(keys, outs):
+                view = self._lookup(key)
+                results.append(-1 if view is None else copy_into(view, out))
+            return results
+    
+    def batch_is_exist(self, keys: List[str]) -> List[int]:
+        """Check existence of multiple keys."""
+        self._check()
+        entries = self._entries
+        return [1 if _live(entries.get(key)) else 0 for key in keys]
+    
+    def batch_remove(self, keys: List[str]) -> List[int]:
+        """Remove multiple keys under a single lock acquisition."""
+        self._check()
+        results = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    results.append(-1)
+                    continue
+                self._drop(key, entry)
+                results.append(0)
+        return results
+    
+    def close(self) -> int:
+        """Release the arena. Views returned by ``get_buffer`` become invalid."""
+        reaper, self._reaper = self._reaper, None
+        if reaper is not None:
+            # Outside the store lock, which a running reap holds
+            reaper.stop()
+        with self._lock:
+            if not self._initialized:
+                return 0
+            self._initialized = False
+            self._entries = {}
+            self._classes = []
+            self._view.release()
+            self._view = None
+            try:
+                self._arena.close()
+            except BufferError:
+                # A caller still holds a view; the mapping is freed with it
+                pass
+            self._arena = None
+        return 0
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get arena usage counters.
+        
+        Returns:
+            Dictionary with capacity_bytes, used_bytes (sum of value sizes),
+            allocated_bytes (pages assigned to size classes), object_count,
+            pinned (values exempt from eviction), evictions and expirations
+        """
+        with self._lock:
+            if not self._initialized:
+                return {'capacity_bytes': 0, 'used_bytes': 0, 'allocated_bytes': 0,
+                        'object_count': 0, 'pinned': 0, 'evictions': 0, 'expirations': 0}
+            return {
+                'capacity_bytes': self._capacity,
+                'used_bytes': self._used_bytes,
+                'allocated_bytes': sum(len(c.pages) for c in self._classes) * self._page_size,
+                'object_count': len(self._entries),
+                'pinned': sum(len(c.live) - len(c.policy) for c in self._classes),
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+            }
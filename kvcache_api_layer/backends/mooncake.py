@@ -5,9 +5,12 @@ This module provides a wrapper around the original MooncakeDistributedStore
 to conform to the unified KV Cache API.
 """
 
-from typing import Union, Optional, Any
-from ..api import KVCacheStore
-from ..exceptions import StoreInitializationError, StorageError
+import ctypes
+import threading
+import weakref
+from typing import Union, Optional, Any, List, Tuple, Dict
+from ..api import KVCacheStore, BatchValue, copy_into, copy_bytes, PUT_PATH_ZERO_COPY, PUT_PATH_COPY
+from ..exceptions import StoreInitializationError, StorageError, BufferError
 
 try:
     from mooncake.store import MooncakeDistributedStore
@@ -15,16 +18,168 @@ except ImportError:
     MooncakeDistributedStore = None
 
 
+def _buffer_address(buffer: Any) -> Tuple[int, int]:
+    """
+    Get the raw address and size of a writable, contiguous buffer.
+    
+    Args:
+        buffer: Buffer-protocol object
+        
+    Returns:
+        (address, size in bytes)
+        
+    Raises:
+        BufferError: If the buffer is read-only or not contiguous
+    """
+    view = memoryview(buffer)
+    if view.readonly:
+        raise BufferError("Buffer must be writable")
+    if not view.c_contiguous:
+        raise BufferError("Buffer must be C-contiguous")
+    nbytes = view.nbytes
+    if nbytes == 0:
+        return 0, 0
+    # from_buffer shares memory with the view; no data is copied
+    ptr = ctypes.addressof((ctypes.c_char * nbytes).from_buffer(view.cast('B')))
+    return ptr, nbytes
+
+
+class _ClientLease:
+    """A thread's hold on an extra native client, released when the thread exits."""
+    
+    __slots__ = ('client', '__weakref__')
+    
+    def __init__(self, client):
+        self.client = client
+
+
 class MooncakeStore(KVCacheStore):
-    """Mooncake implementation of the KV Cache Store interface."""
+    """
+    Mooncake implementation of the KV Cache Store interface.
+    
+    The wrapper takes no locks of its own around data calls. By default all
+    threads share one native client, and concurrency is whatever the
+    installed Mooncake build provides; its transfer calls run without the
+    GIL. With ``per_thread_clients=True`` each thread gets its own native
+    client instead, so threads never contend inside one client.
     
-    def __init__(self):
-        """Initialize the Mooncake store wrapper."""
+    Extra clients are pooled: at most ``max_thread_clients`` are set up, a
+    thread's client returns to the pool when the thread exits, and threads
+    beyond the limit share the first client.
+    """
+    
+    def __init__(self, per_thread_clients: bool = False, thread_segment_size: int = 0,
+                 max_thread_clients: int = 8, thread_buffer_size: Optional[int] = None):
+        """
+        Initialize the Mooncake store wrapper.
+        
+        Args:
+            per_thread_clients: Give every thread that uses the store its own
+                                native client, set up lazily on first use
+                                with the arguments passed to ``setup``
+            thread_segment_size: ``global_segment_size`` contributed by each
+                                 extra per-thread client. The default of 0
+                                 keeps the contributed pool at the size of
+                                 the first client's segment
+            max_thread_clients: Most extra per-thread clients to set up
+            thread_buffer_size: ``local_buffer_size`` of each extra
+                                per-thread client; None uses the size
+                                passed to ``setup``
+        """
         if MooncakeDistributedStore is None:
             raise ImportError("MooncakeDistributedStore is not available")
+        if thread_segment_size < 0:
+            raise ValueError("thread_segment_size must not be negative")
+        if max_thread_clients < 0:
+            raise ValueError("max_thread_clients must not be negative")
+        if thread_buffer_size is not None and thread_buffer_size < 0:
+            raise ValueError("thread_buffer_size must not be negative")
         
-        self._store = MooncakeDistributedStore()
+        self._main_store = MooncakeDistributedStore()
+        self._per_thread_clients = per_thread_clients
+        self._thread_segment_size = thread_segment_size
+        self._max_thread_clients = max_thread_clients
+        self._thread_buffer_size = thread_buffer_size
+        self._local = threading.local()
+        self._clients = [self._main_store]
+        # Extra clients whose threads have exited
+        self._idle_clients: List[Any] = []
+        self._starting_clients = 0
+        self._clients_lock = threading.Lock()
+        self._setup_args: Optional[Tuple[Any, ...]] = None
         self._initialized = False
+        # address -> (size, buffer); the buffer is kept alive while registered
+        self._registered_buffers: Dict[int, Tuple[int, Any]] = {}
+    
+    @property
+    def _store(self):
+        """The native client for the calling thread."""
+        if not self._per_thread_clients:
+            return self._main_store
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._acquire_thread_client()
+            self._local.client = client
+        return client
+    
+    def _acquire_thread_client(self):
+        """Lease a native client to the calling thread until it exits."""
+        if self._setup_args is None:
+            return self._main_store
+        
+        with self._clients_lock:
+            if self._idle_clients:
+                client = self._idle_clients.pop()
+            elif len(self._clients) - 1 + self._starting_clients < self._max_thread_clients:
+                # Reserve the slot so concurrent threads respect the limit
+                client = None
+                self._starting_clients += 1
+            else:
+                return self._main_store
+        
+        if client is None:
+            try:
+                client = self._new_thread_client()
+            finally:
+                with self._clients_lock:
+                    self._starting_clients -= 1
+            with self._clients_lock:
+                for ptr, (size, _) in self._registered_buffers.items():
+                    client.register_buffer(ptr, size)
+                self._clients.append(client)
+        
+        # The thread-local lease is dropped when the thread exits
+        lease = _ClientLease(client)
+        self._local.lease = lease
+        weakref.finalize(lease, MooncakeStore._release_thread_client, weakref.ref(self), client)
+        return client
+    
+    @staticmethod
+    def _release_thread_client(store_ref, client) -> None:
+        """Return an exited thread's client to the pool."""
+        store = store_ref()
+        if store is None:
+            return
+        with store._clients_lock:
+            # Clients dropped by close are not pooled again
+            if any(c is client for c in store._clients):
+                store._idle_clients.append(client)
+    
+    def _new_thread_client(self):
+        """Set up an extra native client."""
+        (local_hostname, metadata_server, _, local_buffer_size,
+         protocol, device_name, master_server_address) = self._setup_args
+        if self._thread_buffer_size is not None:
+            local_buffer_size = self._thread_buffer_size
+        client = MooncakeDistributedStore()
+        try:
+            retcode = client.setup(local_hostname, metadata_server, self._thread_segment_size,
+                                   local_buffer_size, protocol, device_name, master_server_address)
+        except Exception as e:
+            raise StorageError(f"Failed to set up per-thread Mooncake client: {e}")
+        if retcode != 0:
+            raise StorageError(f"Failed to set up per-thread Mooncake client. Return code: {retcode}")
+        return client
     
     def setup(self, 
               local_hostname: str,
@@ -50,7 +205,7 @@ class MooncakeStore(KVCacheStore):
             0 on success, non-zero error code on failure
         """
         try:
-            retcode = self._store.setup(
+            retcode = self._main_store.setup(
                 local_hostname,
                 metadata_server,
                 global_segment_size,
@@ -61,6 +216,10 @@ class MooncakeStore(KVCacheStore):
             )
             
             if retcode == 0:
+                self._setup_args = (local_hostname, metadata_server, global_segment_size,
+                                    local_buffer_size, protocol, device_name, master_server_address)
+                # The thread that ran setup keeps the main client
+                self._local.client = self._main_store
                 self._initialized = True
             
             return retcode
@@ -90,16 +249,95 @@ class MooncakeStore(KVCacheStore):
                 # Single value: use regular put
                 return self._store.put(key, values[0])
             else:
-                # Multiple values: use put_parts if available, otherwise concatenate
-                if hasattr(self._store, 'put_parts'):
-                    return self._store.put_parts(key, *values)
-                else:
-                    # Fallback: concatenate and use regular put
-                    combined_data = b''.join(values)
-                    return self._store.put(key, combined_data)
+                # Multiple values: write the parts in place (see put_from)
+                return self._put_views(key, [memoryview(v).cast('B') for v in values])
+        except Exception as e:
+            raise StorageError(f"Failed to put key '{key}': {e}")
+    
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """
+        Store a value from one or more buffer-protocol slices without
+        concatenating them in Python.
+        
+        Slices that are adjacent inside a buffer registered with
+        ``register_buffer`` are written with a single native ``put_from``.
+        Other slices go through the native scatter-gather ``put_parts``. Only
+        when neither is available are they staged into one contiguous copy.
+        The path taken is counted in ``put_path_stats``.
+        
+        Args:
+            key: The key to store
+            *buffers: One or more contiguous buffer-protocol objects
+            
+        Returns:
+            0 on success, non-zero error code on failure
+        """
+        if not self._initialized:
+            raise StorageError("Store not initialized. Call setup() first.")
+        
+        if not buffers:
+            raise ValueError("At least one buffer must be provided")
+        
+        try:
+            views = [memoryview(b).cast('B') for b in buffers]
+        except TypeError as e:
+            raise BufferError(f"Buffers must be contiguous: {e}")
+        
+        try:
+            return self._put_views(key, views)
         except Exception as e:
             raise StorageError(f"Failed to put key '{key}': {e}")
     
+    def _put_views(self, key: str, views: List[memoryview]) -> int:
+        """Write byte views as one value, preferring the zero-copy paths."""
+        if hasattr(self._store, 'put_from'):
+            span = self._registered_span(views)
+            if span is not None:
+                self._count_put_path(PUT_PATH_ZERO_COPY)
+                return self._store.put_from(key, *span)
+        
+        if len(views) == 1:
+            self._count_put_path(PUT_PATH_ZERO_COPY)
+            return self._store.put(key, views[0])
+        
+        if hasattr(self._store, 'put_parts'):
+            self._count_put_path(PUT_PATH_ZERO_COPY)
+            return self._store.put_parts(key, *views)
+        
+        # Fallback: stage the parts into one preallocated buffer
+        combined_data = bytearray(sum(v.nbytes for v in views))
+        staging = memoryview(combined_data)
+        offset = 0
+        for view in views:
+            copy_bytes(staging[offset:offset + view.nbytes], view)
+            offset += view.nbytes
+        self._count_put_path(PUT_PATH_COPY)
+        return self._store.put(key, combined_data)
+    
+    def _registered_span(self, views: List[memoryview]) -> Optional[Tuple[int, int]]:
+        """
+        Return (address, size) if the views are back-to-back inside one
+        registered buffer, otherwise None.
+        """
+        if not self._registered_buffers:
+            return None
+        
+        start = end = None
+        for view in views:
+            if view.readonly:
+                return None
+            ptr, size = _buffer_address(view)
+            if start is None:
+                start, end = ptr, ptr + size
+            elif ptr != end:
+                return None
+            else:
+                end += size
+        
+        if start is None or not self._is_registered(start, end - start):
+            return None
+        return start, end - start
+    
     def get(self, key: str) -> bytes:
         """
         Retrieve a value by key.
@@ -137,6 +375,38 @@ class MooncakeStore(KVCacheStore):
         except Exception as e:
             raise StorageError(f"Failed to get buffer for key '{key}': {e}")
     
+    def get_into(self, key: str, out: Any) -> int:
+        """
+        Read a value directly into a caller-provided buffer.
+        
+        If ``out`` lies inside a buffer registered with ``register_buffer``,
+        the native ``get_into`` transfers straight into it. Otherwise the
+        value is copied once from the native buffer handle.
+        
+        Args:
+            key: The key to retrieve
+            out: Writable buffer large enough to hold the value
+            
+        Returns:
+            Number of bytes written, or negative value on failure
+            (-1 if the key was not found, -2 if ``out`` is too small)
+        """
+        if not self._initialized:
+            raise StorageError("Store not initialized. Call setup() first.")
+        
+        try:
+            ptr, size = _buffer_address(out)
+            if hasattr(self._store, 'get_into') and self._is_registered(ptr, size):
+                return self._store.get_into(key, ptr, size)
+            data = self._store.get_buffer(key)
+            if data is None:
+                return -1
+            return copy_into(data, out)
+        except BufferError:
+            raise
+        except Exception as e:
+            raise StorageError(f"Failed to get key '{key}' into buffer: {e}")
+    
     def get_size(self, key: str) -> int:
         """
         Get the size of a stored value.
@@ -191,6 +461,273 @@ class MooncakeStore(KVCacheStore):
         except Exception as e:
             raise StorageError(f"Failed to remove key '{key}': {e}")
     
+    def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """
+        Store multiple key-value pairs in one call.
+        
+        Uses the native ``put_batch`` for single-part values when available;
+        multi-part values go through ``put`` individually. If the native
+        batch fails, only the keys it did not store are put again.
+        
+        Args:
+            keys: The keys to store
+            values: One value per key, either a buffer or a sequence of parts
+        
+        Returns:
+            One status per key: 0 on success, non-zero error code on failure
+        """
+        if not self._initialized:
+            raise StorageError("Store not initialized. Call setup() first.")
+        
+        if len(keys) != len(values):
+            raise ValueError("keys and values must have the same length")
+        
+        results = [0] * len(keys)
+        single_idx = []
+        single_values = []
+        for i, value in enumerate(values):
+            if isinstance(value, (list, tuple)):
+                if len(value) == 1:
+                    single_idx.append(i)
+                    single_values.append(value[0])
+                    continue
+                try:
+                    results[i] = self.put(keys[i], *value)
+                except StorageError:
+                    results[i] = -1
+            else:
+                single_idx.append(i)
+                single_values.append(value)
+        
+        if not single_idx:
+            return results
+        
+        single_keys = [keys[i] for i in single_idx]
+        pending = list(zip(single_idx, single_values))
+        if hasattr(self._store, 'put_batch'):
+            try:
+                # Native put_batch reports a single status for the whole batch
+                retcode = self._store.put_batch(single_keys, single_values)
+            except Exception:
+                retcode = -1
+            for i in single_idx:
+                results[i] = retcode
+            if retcode == 0:
+                return results
+            
+            # A failed batch may have stored part of the keys: only the
+            # missing ones are put again
+            exists = self.batch_is_exist(single_keys)
+            pending = []
+            for i, value, status in zip(single_idx, single_values, exists):
+                if status == 1:
+                    results[i] = 0
+                elif status == 0:
+                    pending.append((i, value))
+        
+        # Put the remaining keys one by one so that each gets its own status
+        for i, value in pending:
+            try:
+                results[i] = self._store.put(keys[i], value)
+            except Exception:
+                results[i] = -1
+        return results
+    
+    def batch_get(self, keys: List[str]) -> List[bytes]:
+        """
+        Retrieve multiple values in one call.
+        
+        Args:
+            keys: The keys to retrieve
+        
+        Returns:
+            One value per key, empty bytes for keys that were not found
+        """
+        if not self._initialized:
+            raise StorageError("Store not initialized. Call setup() first.")
+        
+        if hasattr(self._store, 'get_batch'):
+            try:
+                return list(self._store.get_batch(keys))
+            except Exception:
+                pass
+        
+        results = []
+        for key in keys:
+            try:
+                results.append(self._store.get(key))
+            except Exception:
+                results.append(b"")
+        return results
+    
+    def batch_get_into(self, keys: List[str], outs: List[Any]) -> List[int]:
+        """
+        Read multiple values directly into caller-provided buffers.
+        
+        Keys whose buffers are all registered go through one native
+        ``batch_get_into`` call; the rest are served per key.
+        
+        Args:
+            keys: The keys to retrieve
+            outs: One writable buffer per key
+            
+        Returns:
+            One result per key: bytes written, or negative on failure
+        """
+        if not self._initialized:
+            raise StorageError("Store not initialized. Call setup() first.")
+        
+        if len(keys) != len(outs):
+            raise ValueError("keys and outs must have the same length")
+        
+        results = [-1] * len(keys)
+        native_idx, ptrs, sizes = [], [], []
+        for i, out in enumerate(outs):
+            try:
+                ptr, size = _buffer_address(out)
+            except BufferError:
+                continue
+            if self._is_registered(ptr, size):
+                native_idx.append(i)
+                ptrs.append(ptr)
+                sizes.append(size)
+        
+        if native_idx and hasattr(self._store, 'batch_get_into'):
+            try:
+                native_results = self._store.batch_get_into(
+                    [keys[i] for i in native_idx], ptrs, sizes)
+                for i, result in zip(native_idx, native_results):
+                    results[i] = result
+            except Exception:
+                native_idx = []
+        else:
+            native_idx = []
+        
+        done = set(native_idx)
+        for i, (key, out) in enumerate(zip(keys, outs)):
+            if i in done:
+                continue
+            try:
+                results[i] = self.get_into(key, out)
+            except (StorageError, BufferError):
+                results[i] = -1
+        return results
+    
+    def batch_is_exist(self, keys: List[str]) -> List[int]:
+        """
+        Check existence of multiple keys in one call.
+        
+        Args:
+            keys: The keys to check
+        
+        Returns:
+            One status per key: 1 if the key exists, 0 if not, negative on error
+        """
+        if not self._initialized:
+            raise StorageError("Store not initialized. Call setup() first.")
+        
+        if hasattr(self._store, 'batch_is_exist'):
+            try:
+                return list(self._store.batch_is_exist(keys))
+            except Exception:
+                pass
+        
+        results = []
+        for key in keys:
+            try:
+                results.append(self._store.is_exist(key))
+            except Exception:
+                results.append(-1)
+        return results
+    
+    def batch_remove(self, keys: List[str]) -> List[int]:
+        """
+        Remove multiple keys in one call.
+        
+        Mooncake has no native batch remove, but the keys are removed in a
+        single pass without re-entering the per-key wrapper.
+        
+        Args:
+            keys: The keys to remove
+        
+        Returns:
+            One status per key: 0 on success, non-zero error code on failure
+        """
+        if not self._initialized:
+            raise StorageError("Store not initialized. Call setup() first.")
+        
+        results = []
+        for key in keys:
+            try:
+                results.append(self._store.remove(key))
+            except Exception:
+                results.append(-1)
+        return results
+    
+    def register_buffer(self, buffer: Any) -> int:
+        """
+        Register a local buffer with the transfer engine so that ``get_into``
+        and ``batch_get_into`` can write into it without staging.
+        
+        Args:
+            buffer: Writable, contiguous buffer-protocol object
+            
+        Returns:
+            0 on success, non-zero error code on failure
+        """
+        if not self._initialized:
+            raise StorageError("Store not initialized. Call setup() first.")
+        
+        ptr, size = _buffer_address(buffer)
+        with self._clients_lock:
+            if ptr in self._registered_buffers:
+                return 0
+        
+            # Every native client transfers into its own registrations
+            try:
+                for client in self._clients:
+                    retcode = client.register_buffer(ptr, size)
+                    if retcode != 0:
+                        return retcode
+            except Exception as e:
+                raise StorageError(f"Failed to register buffer: {e}")
+        
+            self._registered_buffers[ptr] = (size, buffer)
+        return 0
+    
+    def unregister_buffer(self, buffer: Any) -> int:
+        """
+        Unregister a buffer previously passed to ``register_buffer``.
+        
+        Args:
+            buffer: The registered buffer
+            
+        Returns:
+            0 on success, non-zero error code on failure
+        """
+        ptr, _ = _buffer_address(buffer)
+        with self._clients_lock:
+            if ptr not in self._registered_buffers:
+                return 0
+        
+            try:
+                for client in self._clients:
+                    retcode = client.unregister_buffer(ptr)
+                    if retcode != 0:
+                        return retcode
+            except Exception as e:
+                raise StorageError(f"Failed to unregister buffer: {e}")
+        
+            del self._registered_buffers[ptr]
+        return 0
+    
+    def _is_registered(self, ptr: int, size: int) -> bool:
+        """Check whether [ptr, ptr + size) lies inside a registered buffer."""
+        for base, (base_size, _) in list(self._registered_buffers.items()):
+            if base <= ptr and ptr + size <= base + base_size:
+                return True
+        return False
+    
     def close(self) -> int:
         """
         Close and tear down the store.
@@ -202,7 +739,15 @@ class MooncakeStore(KVCacheStore):
             return 0
         
         try:
-            retcode = self._store.close()
+            # Extra per-thread clients first; the main client owns the segment
+            with self._clients_lock:
+                extra, self._clients = self._clients[1:], [self._main_store]
+                self._idle_clients = []
+            for client in extra:
+                client.close()
+            self._local = threading.local()
+            
+            retcode = self._main_store.close()
             if retcode == 0:
                 self._initialized = False
             return retcode
@@ -211,5 +756,5 @@ class MooncakeStore(KVCacheStore):
     
     @property
     def native_store(self):
-        """Access to the underlying Mooncake store for advanced usage."""
+        """Access to the underlying Mooncake store (the calling thread's client) for advanced usage."""
         return self._store 
\ No newline at end of file
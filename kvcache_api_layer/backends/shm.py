@@ -0,0 +1,524 @@
+"""
+Node-local shared-memory backend for the KV Cache API layer.
+
+``SharedMemoryStore`` keeps values in a named ``multiprocessing.shared_memory``
+segment that every process on the host can attach to, so co-located worker
+processes share one copy of each KV block instead of holding (and fetching)
+their own.
+
+Segment layout::
+
+    header | state | hash index (buckets of fixed slots) | data ring
+    
+The data ring is a log: values are appended at ``head`` and the oldest
+records are evicted from ``tail`` when space runs out (FIFO eviction).
+Every key hashes to one bucket of the index. Buckets are guarded by striped
+locks, so readers of different keys never contend. Writers are serialized by
+one allocator lock because they advance the shared ring. Locks are POSIX
+record locks on a small lock file (released by the kernel if a process
+dies), combined with thread locks for callers inside one process.
+"""
+
+import fcntl
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Union, Optional, Any, List, Dict, Tuple
+from ..api import KVCacheStore, BatchValue, copy_into, copy_bytes, PUT_PATH_ZERO_COPY
+from ..exceptions import StorageError, StoreInitializationError
+
+
+_MAGIC = b"KVSHM001"
+# magic, data size, bucket count, slots per bucket, index offset, data offset
+_HEADER = struct.Struct("<8sQIIQQ")
+_HEADER_OFFSET = 0
+# head, tail, used, seq, object count, evictions; guarded by the allocator lock
+_STATE = struct.Struct("<QQQQQQ")
+_STATE_OFFSET = 64
+_INDEX_OFFSET = 4096
+# key hash, record offset in the ring, value size, record seq (0 = empty)
+_SLOT = struct.Struct("<QQQQ")
+# kind, key length, value length, seq, bucket
+_RECORD = struct.Struct("<IIQQI4x")
+_RECORD_KIND = 0x4B565231  # "KVR1"
+_WRAP_KIND = 0x4B565257    # "KVRW": rest of the ring is unused, continue at 0
+_ALIGN = 64
+
+_ALLOC_LOCK = 0
+
+
+def _align(n: int) -> int:
+    return (n + _ALIGN - 1) & ~(_ALIGN - 1)
+
+
+def _key_hash(key: bytes) -> int:
+    # Python's hash() is randomized per process, so use a stable digest
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+def _open_segment(name: str, size: int, create: bool) -> shared_memory.SharedMemory:
+    """Open a segment without letting the resource tracker unlink it at exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    except TypeError:
+        # Python < 3.13 has no track argument
+        shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+class _Locks:
+    """
+    Cross-process lock set: byte ``i`` of the lock file is lock ``i``.
+    
+    POSIX record locks belong to the process: they never conflict within
+    it, and closing any descriptor of the file drops all of them. Stores of
+    one process that use the same segment therefore share one refcounted
+    ``_Locks`` (one descriptor, one set of thread locks), taken with
+    ``acquire`` and given back with ``close``.
+    """
+    
+    _registry: Dict[str, "_Locks"] = {}
+    _registry_lock = threading.Lock()
+    
+    def __init__(self, path: str, count: int):
+        self._path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        self._thread_locks = [threading.Lock() for _ in range(count)]
+        self._refs = 0
+    
+    @classmethod
+    def acquire(cls, path: str, count: int) -> "_Locks":
+        """Return this process's lock set for ``path``, creating it on first use."""
+        with cls._registry_lock:
+            locks = cls._registry.get(path)
+            if locks is None:
+                locks = cls._registry[path] = cls(path, count)
+            elif len(locks._thread_locks) < count:
+                locks._thread_locks.extend(
+                    threading.Lock() for _ in range(count - len(locks._thread_locks)))
+            locks._refs += 1
+            return locks
+    
+    @contextmanager
+    def hold(self, idx: int, shared: bool = False):
+        # fcntl locks belong to the process, so threads are serialized first
+        with self._thread_locks[idx]:
+            fcntl.lockf(self._fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX, 1, idx)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, idx)
+    
+    def close(self) -> None:
+        """Give back one reference; the descriptor is closed with the last one."""
+        with self._registry_lock:
+            self._refs -= 1
+            if self._refs == 0:
+                del self._registry[self._path]
+                os.close(self._fd)
+
+
+class SharedMemoryStore(KVCacheStore):
+    """
+    ``KVCacheStore`` backed by a host-wide shared-memory segment.
+    
+    All processes that set up a store with the same ``name`` share its
+    contents. The first one creates and formats the segment with
+    ``local_buffer_size`` bytes of data; the others attach to it. The
+    segment outlives the processes until ``destroy()`` is called.
+    
+    ``get_buffer`` returns a read-only view into the segment without
+    copying. The view is not protected against eviction: once the ring
+    wraps over the record, its content changes. Callers that hold data
+    across later writes should use ``get``/``get_into``, which copy under
+    the bucket lock.
+    
+    All methods are thread-safe and process-safe. Reads of keys in
+    different lock stripes run in parallel, and large copies release the
+    GIL.
+    """
+    
+    def __init__(self,
+                 name: str = "kvcache_shm",
+                 expected_value_size: int = 256 * 1024,
+                 slots_per_bucket: int = 8,
+                 lock_stripes: int = 64,
+                 attach_timeout: float = 10.0):
+        """
+        Initialize the shared-memory store.
+        
+        Args:
+            name: Segment name shared by all processes on the host
+            expected_value_size: Typical value size, used to size the index
+                                 when creating the segment
+            slots_per_bucket: Index slots per hash bucket
+            lock_stripes: Number of bucket locks
+            attach_timeout: Seconds to wait for another process to finish
+                            formatting the segment
+        """
+        if expected_value_size <= 0 or slots_per_bucket <= 0 or lock_stripes <= 0:
+            raise ValueError("expected_value_size, slots_per_bucket and lock_stripes must be positive")
+        
+        self._name = name
+        self._expected_value_size = expected_value_size
+        self._slots_per_bucket = slots_per_bucket
+        self._lock_stripes = lock_stripes
+        self._attach_timeout = attach_timeout
+        self._shm = None
+        self._buf = None
+        self._locks = None
+        self._initialized = False
+    
+    def setup(self,
+              local_hostname: str,
+              metadata_server: str,
+              global_segment_size: int,
+              local_buffer_size: int,
+              protocol: str = "tcp",
+              device_name: str = "lo",
+              master_server_address: Optional[str] = None) -> int:
+        """
+        Create or attach to the shared segment. The node-local pool is sized
+        by ``local_buffer_size``; the network arguments are accepted for
+        interface compatibility.
+        
+        Returns:
+            0 on success, non-zero error code on failure
+        """
+        if self._initialized:
+            return 0
+        if local_buffer_size <= 0:
+            raise ValueError("local_buffer_size must be positive")
+        
+        lock_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        self._locks = _Locks.acquire(os.path.join(lock_dir, f"{self._name}.lock"), self._lock_stripes + 1)
+        
+        try:
+            # Creation and formatting happen under the allocator lock so
+            # that racing processes see either nothing or a ready segment
+            with self._locks.hold(_ALLOC_LOCK):
+                try:
+                    self._shm = _open_segment(self._name, 0, create=False)
+                    created = False
+                except FileNotFoundError:
+                    n_slots = max(64, 2 * local_buffer_size // self._expected_value_size)
+                    n_buckets = 1 << max(3, (n_slots // self._slots_per_bucket - 1).bit_length())
+                    index_size = n_buckets * self._slots_per_bucket * _SLOT.size
+                    data_offset = _align(_INDEX_OFFSET + index_size)
+                    self._shm = _open_segment(self._name, data_offset + local_buffer_size, create=True)
+                    _HEADER.pack_into(self._shm.buf, _HEADER_OFFSET, b"\0" * 8, local_buffer_size,
+                                      n_buckets, self._slots_per_bucket, _INDEX_OFFSET, data_offset)
+                    _STATE.pack_into(self._shm.buf, _STATE_OFFSET, 0, 0, 0, 1, 0, 0)
+                    # Fresh segments are zero-filled, so every slot starts empty
+                    self._shm.buf[_HEADER_OFFSET:_HEADER_OFFSET + 8] = _MAGIC
+                    created = True
+            
+            self._buf = self._shm.buf
+            deadline = time.monotonic() + self._attach_timeout
+            while bytes(self._buf[_HEADER_OFFSET:_HEADER_OFFSET + 8]) != _MAGIC:
+                if time.monotonic() > deadline:
+                    raise StoreInitializationError(f"Shared segment '{self._name}' was never formatted")
+                time.sleep(0.01)
+            
+            (_, self._data_size, self._n_buckets, self._slots,
+             self._index_offset, self._data_offset) = _HEADER.unpack_from(self._buf, _HEADER_OFFSET)
+            self._created = created
+        except Exception as e:
+            self._locks.close()
+            self._locks = None
+            if isinstance(e, StoreInitializationError):
+                raise
+            raise StoreInitializationError(f"Failed to set up shared-memory store: {e}")
+        
+        self._initialized = True
+        return 0
+    
+    # Index helpers; callers hold the bucket's stripe lock
+    
+    def _check(self) -> None:
+        if not self._initialized:
+            raise StorageError("Store not initialized. Call setup() first.")
+    
+    def _stripe(self, bucket: int) -> int:
+        return 1 + bucket % self._lock_stripes
+    
+    def _locate(self, key: str) -> Tuple[bytes, int, int]:
+        key_bytes = key.encode()
+        h = _key_hash(key_bytes)
+        return key_bytes, h, h % self._n_buckets
+    
+    def _slot_offset(self, bucket: int, i: int) -> int:
+        return self._index_offset + (bucket * self._slots + i) * _SLOT.size
+    
+    def _find_slot(self, bucket: int, h: int, key_bytes: bytes) -> Optional[Tuple[int, int, int, int]]:
+        """Return (slot offset, record offset, value size, seq) for a key, or None."""
+        buf = self._buf
+        for i in range(self._slots):
+            slot_off = self._slot_offset(bucket, i)
+            slot_hash, rec_off, size, seq = _SLOT.unpack_from(buf, slot_off)
+            if seq == 0 or slot_hash != h:
+                continue
+            start = self._data_offset + rec_off + _RECORD.size
+            if buf[start:start + len(key_bytes)] == key_bytes:
+                return slot_off, rec_off, size, seq
+        return None
+    
+    def _value_view(self, rec_off: int, key_len: int, size: int) -> memoryview:
+        start = self._data_offset + rec_off + _RECORD.size + key_len
+        return self._buf[start:start + size]
+    
+    # Ring allocation; callers hold the allocator lock
+    
+    def _evict_tail(self, state: List[int]) -> None:
+        head, tail, used = state[0], state[1], state[2]
+        buf = self._buf
+        if self._data_size - tail < _RECORD.size:
+            used -= self._data_size - tail
+            tail = 0
+        else:
+            kind, key_len, value_len, seq, bucket = _RECORD.unpack_from(buf, self._data_offset + tail)
+            if kind == _WRAP_KIND:
+                used -= self._data_size - tail
+                tail = 0
+            else:
+                length = _align(_RECORD.size + key_len + value_len)
+                with self._locks.hold(self._stripe(bucket)):
+                    for i in range(self._slots):
+                        slot_off = self._slot_offset(bucket, i)
+                        if _SLOT.unpack_from(buf, slot_off)[3] == seq:
+                            _SLOT.pack_into(buf, slot_off, 0, 0, 0, 0)
+                            state[4] -= 1
+                            state[5] += 1
+                            break
+                used -= length
+                tail += length
+                if tail >= self._data_size:
+                    tail = 0
+        state[1], state[2] = tail, used
+    
+    def _reserve(self, length: int, state: List[int]) -> int:
+        """Make room for ``length`` bytes at the head of the ring and return its offset."""
+        if length > self._data_size:
+            raise StorageError(f"Value of {length} bytes exceeds the shared pool of {self._data_size} bytes")
+        
+        while True:
+            head, tail, used = state[0], state[1], state[2]
+            if used == 0:
+                state[0] = state[1] = head = tail = 0
+            if head > tail or (head == tail and used == 0):
+                # Live records are [tail, head); free space runs to the end
+                if self._data_size - head >= length:
+                    return head
+                if tail == 0:
+                    self._evict_tail(state)
+                    continue
+                if self._data_size - head >= _RECORD.size:
+                    _RECORD.pack_into(self._buf, self._data_offset + head, _WRAP_KIND, 0, 0, 0, 0)
+                state[2] = used + self._data_size - head
+                state[0] = 0
+            else:
+                # Wrapped: free space is [head, tail)
+                if tail - head >= length:
+                    return head
+                self._evict_tail(state)
+    
+    def _read_state(self) -> List[int]:
+        return list(_STATE.unpack_from(self._buf, _STATE_OFFSET))
+    
+    def _write_state(self, state: List[int]) -> None:
+        _STATE.pack_into(self._buf, _STATE_OFFSET, *state)
+    
+    def _put_locked(self, key: str, views: List[memoryview], state: List[int]) -> int:
+        key_bytes, h, bucket = self._locate(key)
+        size = sum(v.nbytes for v in views)
+        length = _align(_RECORD.size + len(key_bytes) + size)
+        rec_off = self._reserve(length, state)
+        seq = state[3]
+        state[3] += 1
+        
+        buf = self._buf
+        start = self._data_offset + rec_off
+        _RECORD.pack_into(buf, start, _RECORD_KIND, len(key_bytes), size, seq, bucket)
+        pos = start + _RECORD.size
+        buf[pos:pos + len(key_bytes)] = key_bytes
+        pos += len(key_bytes)
+        for view in views:
+            copy_bytes(buf[pos:pos + view.nbytes], view)
+            pos += view.nbytes
+        state[0] = rec_off + length
+        state[2] += length
+        
+        with self._locks.hold(self._stripe(bucket)):
+            found = self._find_slot(bucket, h, key_bytes)
+            if found is not None:
+                slot_off = found[0]
+            else:
+                # Empty slot, else replace the oldest entry of the bucket
+                slot_off, oldest = None, None
+                for i in range(self._slots):
+                    off = self._slot_offset(bucket, i)
+                    slot_seq = _SLOT.unpack_from(buf, off)[3]
+                    if slot_seq == 0:
+                        slot_off = off
+                        break
+                    if oldest is None or slot_seq < oldest:
+                        slot_off, oldest = off, slot_seq
+                if oldest is not None and _SLOT.unpack_from(buf, slot_off)[3] != 0:
+                    state[5] += 1
+                else:
+                    state[4] += 1
+            _SLOT.pack_into(buf, slot_off, h, rec_off, size, seq)
+        return 0
+    
+    # KVCacheStore interface
+    
+    def put(self, key: str, *values: Union[bytes, bytearray]) -> int:
+        """Append a value to the shared ring and publish it in the index."""
+        self._check()
+        if not values:
+            raise ValueError("At least one value must be provided")
+        
+        views = [memoryview(v).cast('B') for v in values]
+        with self._locks.hold(_ALLOC_LOCK):
+            state = self._read_state()
+            try:
+                return self._put_locked(key, views, state)
+            finally:
+                self._write_state(state)
+    
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """Copy buffer-protocol slices straight into the shared ring."""
+        self._check()
+        if not buffers:
+            raise ValueError("At least one buffer must be provided")
+        
+        self._count_put_path(PUT_PATH_ZERO_COPY)
+        return self.put(key, *buffers)
+    
+    def _read(self, key: str, fn):
+        """Run ``fn(view)`` on a value under its bucket lock; None if not found."""
+        key_bytes, h, bucket = self._locate(key)
+        with self._locks.hold(self._stripe(bucket), shared=True):
+            found = self._find_slot(bucket, h, key_bytes)
+            if found is None:
+                return None
+            _, rec_off, size, _ = found
+            return fn(self._value_view(rec_off, len(key_bytes), size))
+    
+    def get(self, key: str) -> bytes:
+        """Retrieve a copy of a value, or empty bytes if not found."""
+        self._check()
+        data = self._read(key, lambda view: view.tobytes())
+        return b"" if data is None else data
+    
+    def get_buffer(self, key: str) -> Optional[Any]:
+        """Get a read-only, zero-copy view into the shared segment, or None."""
+        self._check()
+        return self._read(key, lambda view: view.toreadonly())
+    
+    def get_into(self, key: str, out: Any) -> int:
+        """Copy a value into ``out``; returns bytes written or negative on failure."""
+        self._check()
+        written = self._read(key, lambda view: copy_into(view, out))
+        return -1 if written is None else written
+    
+    def get_size(self, key: str) -> int:
+        """Get the size of a value, or -1 if not found."""
+        self._check()
+        key_bytes, h, bucket = self._locate(key)
+        with self._locks.hold(self._stripe(bucket), shared=True):
+            found = self._find_slot(bucket, h, key_bytes)
+        return -1 if found is None else found[2]
+    
+    def is_exist(self, key: str) -> int:
+        """Return 1 if the key exists, 0 if not."""
+        return 1 if self.get_size(key) >= 0 else 0
+    
+    def remove(self, key: str) -> int:
+        """Remove a key from the index; its ring space is reclaimed by eviction."""
+        self._check()
+        key_bytes, h, bucket = self._locate(key)
+        with self._locks.hold(_ALLOC_LOCK):
+            state = self._read_state()
+            with self._locks.hold(self._stripe(bucket)):
+                found = self._find_slot(bucket, h, key_bytes)
+                if found is None:
+                    return -1
+                _SLOT.pack_into(self._buf, found[0], 0, 0, 0, 0)
+            state[4] -= 1
+            self._write_state(state)
+        return 0
+    
+    def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """Store multiple values under a single allocator lock acquisition."""
+        self._check()
+        if len(keys) != len(values):
+            raise ValueError("keys and values must have the same length")
+        
+        results = []
+        with self._locks.hold(_ALLOC_LOCK):
+            state = self._read_state()
+            try:
+                for key, value in zip(keys, values):
+                    parts = value if isinstance(value, (list, tuple)) else (value,)
+                    try:
+                        results.append(self._put_locked(key, [memoryview(p).cast('B') for p in parts], state))
+                    except StorageError:
+                        results.append(-1)
+            finally:
+                self._write_state(state)
+        return results
+    
+    def close(self) -> int:
+        """Detach from the segment. The data stays for other processes."""
+        if not self._initialized:
+            return 0
+        self._initialized = False
+        self._buf = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A caller still holds a view from get_buffer; the mapping is
+            # released together with it
+            pass
+        self._locks.close()
+        return 0
+    
+    def destroy(self) -> None:
+        """Remove the segment from the host once every process has detached."""
+        try:
+            # Tracked open, so that unlink() also balances the tracker
+            shm = shared_memory.SharedMemory(name=self._name)
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get pool usage counters, shared by all attached processes.
+        
+        Returns:
+            Dictionary with capacity_bytes, used_bytes (ring bytes holding
+            records, including superseded ones not yet reclaimed),
+            object_count and evictions
+        """
+        self._check()
+        with self._locks.hold(_ALLOC_LOCK):
+            _, _, used, _, count, evictions = self._read_state()
+        return {
+            'capacity_bytes': self._data_size,
+            'used_bytes': used,
+            'object_count': count,
+            'evictions': evictions,
+        }
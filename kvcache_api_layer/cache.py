@@ -0,0 +1,463 @@
+"""
+Process-local L1 cache for the KV Cache API layer.
+
+``CachingStore`` wraps another ``KVCacheStore`` and keeps recently read values
+in process memory, so repeated reads of hot blocks (e.g. shared system-prompt
+prefixes) skip the network entirely.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Union, Optional, Any, List, Dict
+from .api import KVCacheStore, BatchValue, copy_into
+
+
+class _FrequencySketch:
+    """
+    Count-min sketch with periodic aging, used as the TinyLFU admission
+    filter. Counters saturate at 15 and are halved once the number of
+    recorded accesses reaches ``10 * width`` so that old popularity fades.
+    """
+    
+    _SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+    
+    def __init__(self, width: int):
+        # Round up to a power of two so that indexing is a mask
+        self._width = 1 << max(4, (width - 1).bit_length())
+        self._mask = self._width - 1
+        self._rows = [bytearray(self._width) for _ in self._SEEDS]
+        self._additions = 0
+        self._sample_size = 10 * self._width
+    
+    def _indexes(self, key: str):
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        for seed in self._SEEDS:
+            yield ((h * seed) >> 32) & self._mask
+    
+    def increment(self, key: str) -> None:
+        for row, idx in zip(self._rows, self._indexes(key)):
+            if row[idx] < 15:
+                row[idx] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._age()
+    
+    def frequency(self, key: str) -> int:
+        return min(row[idx] for row, idx in zip(self._rows, self._indexes(key)))
+    
+    def _age(self) -> None:
+        for row in self._rows:
+            for i, count in enumerate(row):
+                if count:
+                    row[i] = count >> 1
+        self._additions //= 2
+
+
+class CachingStore(KVCacheStore):
+    """
+    ``KVCacheStore`` decorator with a byte-budgeted in-process cache.
+    
+    Values are cached on read and invalidated on local ``put``/``remove``.
+    With the ``lru`` policy every read value is admitted and the least
+    recently used entries are evicted. With ``tinylfu`` a new value is only
+    admitted if it has been requested more often than the entries it would
+    evict, which keeps one-off scans from flushing hot prefixes.
+    
+    Cached values are immutable ``bytes``; ``get_buffer`` hands them out
+    directly, so callers must not expect a writable buffer. Values written
+    with a TTL through ``put_with_hints`` are served from the cache only
+    until they expire.
+    """
+    
+    POLICIES = ('lru', 'tinylfu')
+    
+    def __init__(self,
+                 store: KVCacheStore,
+                 capacity_bytes: int,
+                 policy: str = 'lru',
+                 max_item_size: Optional[int] = None,
+                 sketch_width: int = 16384):
+        """
+        Wrap a store with an L1 cache.
+        
+        Args:
+            store: The store to cache reads from
+            capacity_bytes: Maximum total size of cached values in bytes
+            policy: Eviction/admission policy, one of ``lru`` or ``tinylfu``
+            max_item_size: Values larger than this are never cached.
+                           Defaults to ``capacity_bytes``
+            sketch_width: Counters per row of the TinyLFU frequency sketch
+            
+        Raises:
+            ValueError: If the capacity or policy is invalid
+        """
+        if capacity_bytes <= 0:
+            raise ValueError("capacity_bytes must be positive")
+        if policy not in self.POLICIES:
+            raise ValueError(f"policy must be one of: {', '.join(self.POLICIES)}")
+        
+        self._store = store
+        self._capacity = capacity_bytes
+        self._policy = policy
+        self._max_item_size = min(max_item_size or capacity_bytes, capacity_bytes)
+        self._sketch = _FrequencySketch(sketch_width) if policy == 'tinylfu' else None
+        
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # Keys with fetches in flight -> [fetches, version]. A local write
+        # bumps the key's version; a fetch that overlaps a write of its key
+        # is not cached because it may have read the old value
+        self._reading: Dict[str, List[int]] = {}
+        # Expiry deadlines of keys written with a TTL
+        self._expires: Dict[str, float] = {}
+        
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._rejections = 0
+    
+    # Cache internals
+    
+    def _cached(self, key: str) -> Optional[bytes]:
+        """The cached value unless it expired, which drops it; called with the lock held."""
+        value = self._entries.get(key)
+        if value is not None and self._expires:
+            expires = self._expires.get(key)
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                del self._expires[key]
+                self._size -= len(value)
+                return None
+        return value
+    
+    def _lookup(self, key: str) -> Optional[bytes]:
+        """Return the cached value and update recency/frequency; count hit or miss."""
+        with self._lock:
+            if self._sketch is not None:
+                self._sketch.increment(key)
+            value = self._cached(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+    
+    def _admit(self, key: str, value: Any, version: int) -> Optional[bytes]:
+        """
+        Try to cache ``value`` fetched at ``version`` of its key.
+        
+        Returns:
+            The cached bytes object, or None if the value was not admitted
+        """
+        size = memoryview(value).nbytes
+        if size == 0 or size > self._max_item_size:
+            return None
+        
+        with self._lock:
+            state = self._reading.get(key)
+            if state is None or state[1] != version or key in self._entries:
+                return None
+            
+            victims = []
+            freed = 0
+            needed = self._size + size - self._capacity
+            for victim in self._entries:
+                if freed >= needed:
+                    break
+                victims.append(victim)
+                freed += len(self._entries[victim])
+            
+            if victims and self._sketch is not None:
+                candidate_freq = self._sketch.frequency(key)
+                if any(self._sketch.frequency(v) >= candidate_freq for v in victims):
+                    self._rejections += 1
+                    return None
+            
+            for victim in victims:
+                self._size -= len(self._entries.pop(victim))
+                self._evictions += 1
+            
+            data = value if isinstance(value, bytes) else bytes(value)
+            self._entries[key] = data
+            self._size += size
+            return data
+    
+    def _invalidate(self, keys: List[str]) -> None:
+        """Drop keys from the cache ahead of a local write."""
+        with self._lock:
+            for key in keys:
+                state = self._reading.get(key)
+                if state is not None:
+                    state[1] += 1
+                self._expires.pop(key, None)
+                value = self._entries.pop(key, None)
+                if value is not None:
+                    self._size -= len(value)
+    
+    def _write(self, keys: List[str], fn, *args: Any) -> Any:
+        """
+        Run a write on the wrapped store with the keys invalidated.
+        
+        The keys are invalidated both before and after the write so that a
+        read racing with it cannot cache the value it replaces.
+        """
+        self._invalidate(keys)
+        try:
+            return fn(*args)
+        finally:
+            self._invalidate(keys)
+    
+    def _begin_fetch(self, keys: List[str]) -> List[int]:
+        """Register fetches of ``keys``; returns the version of each key."""
+        versions = []
+        with self._lock:
+            for key in keys:
+                state = self._reading.setdefault(key, [0, 0])
+                state[0] += 1
+                versions.append(state[1])
+        return versions
+    
+    def _end_fetch(self, keys: List[str]) -> None:
+        """Unregister fetches started by ``_begin_fetch``."""
+        with self._lock:
+            for key in keys:
+                state = self._reading[key]
+                state[0] -= 1
+                if not state[0]:
+                    del self._reading[key]
+    
+    # KVCacheStore interface
+    
+    def setup(self,
+              local_hostname: str,
+              metadata_server: str,
+              global_segment_size: int,
+              local_buffer_size: int,
+              protocol: str = "tcp",
+              device_name: str = "lo",
+              master_server_address: Optional[str] = None) -> int:
+        """Set up the wrapped store."""
+        return self._store.setup(local_hostname, metadata_server, global_segment_size,
+                                 local_buffer_size, protocol, device_name,
+                                 master_server_address)
+    
+    def put(self, key: str, *values: Union[bytes, bytearray]) -> int:
+        """Invalidate the cached value and store through to the wrapped store."""
+        return self._write([key], self._store.put, key, *values)
+    
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """Invalidate the cached value and store through to the wrapped store."""
+        return self._write([key], self._store.put_from, key, *buffers)
+    
+    def put_with_hints(self, key: str, *values: Union[bytes, bytearray],
+                       ttl: Optional[float] = None, priority: int = 0, pin: bool = False) -> int:
+        """Invalidate the cached value and store through with the hints."""
+        status = self._write([key], lambda: self._store.put_with_hints(
+            key, *values, ttl=ttl, priority=priority, pin=pin))
+        if ttl is not None and status == 0:
+            now = time.monotonic()
+            with self._lock:
+                self._expires[key] = now + ttl
+                if len(self._expires) > 2 * len(self._entries) + 1024:
+                    # Forget deadlines of keys that expired without being read
+                    self._expires = {k: t for k, t in self._expires.items() if t > now}
+        return status
+    
+    def get(self, key: str) -> bytes:
+        """Retrieve a value, from the cache when possible."""
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        
+        version, = self._begin_fetch([key])
+        try:
+            value = self._store.get(key)
+            if value:
+                self._admit(key, value, version)
+        finally:
+            self._end_fetch([key])
+        return value
+    
+    def get_buffer(self, key: str) -> Optional[Any]:
+        """
+        Get a buffer for the value, from the cache when possible.
+        
+        On a miss the value is copied out of the backend buffer only if it
+        is admitted to the cache; otherwise the backend buffer is returned.
+        """
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        
+        version, = self._begin_fetch([key])
+        try:
+            buffer = self._store.get_buffer(key)
+            if buffer is None:
+                return None
+            data = self._admit(key, buffer, version)
+        finally:
+            self._end_fetch([key])
+        return data if data is not None else buffer
+    
+    def get_into(self, key: str, out: Any) -> int:
+        """Read a value into ``out``, from the cache when possible."""
+        cached = self._lookup(key)
+        if cached is not None:
+            return copy_into(cached, out)
+        
+        version, = self._begin_fetch([key])
+        try:
+            written = self._store.get_into(key, out)
+            if written > 0:
+                self._admit(key, memoryview(out).cast('B')[:written], version)
+        finally:
+            self._end_fetch([key])
+        return written
+    
+    def get_size(self, key: str) -> int:
+        """Get the size of a value, from the cache when possible."""
+        with self._lock:
+            value = self._cached(key)
+        if value is not None:
+            return len(value)
+        return self._store.get_size(key)
+    
+    def is_exist(self, key: str) -> int:
+        """Check existence, answering from the cache when possible."""
+        with self._lock:
+            if self._cached(key) is not None:
+                return 1
+        return self._store.is_exist(key)
+    
+    def remove(self, key: str) -> int:
+        """Invalidate the cached value and remove it from the wrapped store."""
+        return self._write([key], self._store.remove, key)
+    
+    def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """Invalidate the cached values and store through in one batch."""
+        return self._write(keys, self._store.batch_put, keys, values)
+    
+    def batch_get(self, keys: List[str]) -> List[bytes]:
+        """Serve hits from the cache and fetch all misses in one batch."""
+        results: List[Optional[bytes]] = [self._lookup(key) for key in keys]
+        miss_idx = [i for i, value in enumerate(results) if value is None]
+        if miss_idx:
+            miss_keys = [keys[i] for i in miss_idx]
+            versions = self._begin_fetch(miss_keys)
+            try:
+                fetched = self._store.batch_get(miss_keys)
+                for i, version, value in zip(miss_idx, versions, fetched):
+                    results[i] = value
+                    if value:
+                        self._admit(keys[i], value, version)
+            finally:
+                self._end_fetch(miss_keys)
+        return results
+    
+    def batch_get_into(self, keys: List[str], outs: List[Any]) -> List[int]:
+        """Serve hits from the cache and fetch all misses in one batch."""
+        if len(keys) != len(outs):
+            raise ValueError("keys and outs must have the same length")
+        
+        results = [0] * len(keys)
+        miss_idx = []
+        for i, key in enumerate(keys):
+            cached = self._lookup(key)
+            if cached is None:
+                miss_idx.append(i)
+            else:
+                results[i] = copy_into(cached, outs[i])
+        
+        if miss_idx:
+            miss_keys = [keys[i] for i in miss_idx]
+            versions = self._begin_fetch(miss_keys)
+            try:
+                fetched = self._store.batch_get_into(miss_keys, [outs[i] for i in miss_idx])
+                for i, version, written in zip(miss_idx, versions, fetched):
+                    results[i] = written
+                    if written > 0:
+                        self._admit(keys[i], memoryview(outs[i]).cast('B')[:written], version)
+            finally:
+                self._end_fetch(miss_keys)
+        return results
+    
+    def batch_is_exist(self, keys: List[str]) -> List[int]:
+        """Answer cached keys locally and check the rest in one batch."""
+        with self._lock:
+            results = [1 if self._cached(key) is not None else None for key in keys]
+        miss_idx = [i for i, value in enumerate(results) if value is None]
+        if miss_idx:
+            fetched = self._store.batch_is_exist([keys[i] for i in miss_idx])
+            for i, value in zip(miss_idx, fetched):
+                results[i] = value
+        return results
+    
+    def batch_remove(self, keys: List[str]) -> List[int]:
+        """Invalidate the cached values and remove them in one batch."""
+        return self._write(keys, self._store.batch_remove, keys)
+    
+    def register_buffer(self, buffer: Any) -> int:
+        """Register a buffer with the wrapped store."""
+        return self._store.register_buffer(buffer)
+    
+    def unregister_buffer(self, buffer: Any) -> int:
+        """Unregister a buffer from the wrapped store."""
+        return self._store.unregister_buffer(buffer)
+    
+    def close(self) -> int:
+        """Drop all cached values and close the wrapped store."""
+        self.clear()
+        return self._store.close()
+    
+    # Cache management
+    
+    def invalidate(self, keys: List[str]) -> None:
+        """
+        Drop keys from the cache, e.g. when the wrapped store evicted or
+        expired them; usable as a ``LocalStore`` or ``EvictingStore``
+        ``on_evict`` callback target.
+        """
+        self._invalidate(keys)
+    
+    def clear(self) -> None:
+        """Drop all cached values."""
+        with self._lock:
+            for state in self._reading.values():
+                state[1] += 1
+            self._entries.clear()
+            self._expires.clear()
+            self._size = 0
+    
+    def keys(self) -> List[str]:
+        """Get the cached keys, most recently used first."""
+        now = time.monotonic()
+        with self._lock:
+            return [key for key in reversed(self._entries) if self._expires.get(key, now + 1) > now]
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache counters.
+        
+        Returns:
+            Dictionary with hits, misses, evictions, rejections (values
+            refused by the admission filter), entries, size_bytes and
+            capacity_bytes
+        """
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'rejections': self._rejections,
+                'entries': len(self._entries),
+                'size_bytes': self._size,
+                'capacity_bytes': self._capacity,
+            }
+    
+    @property
+    def inner_store(self) -> KVCacheStore:
+        """The wrapped store."""
+        return self._store
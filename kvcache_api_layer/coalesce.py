@@ -0,0 +1,255 @@
+"""
+Single-flight request coalescing for the KV Cache API layer.
+
+When a popular prompt arrives as a burst, many threads read the same key at
+once and each would pay a full remote transfer. ``CoalescingStore`` lets
+the first reader of a key fetch it while concurrent readers of that key
+wait for and share its result, so a burst costs one transfer.
+``AsyncKVCacheStore(coalesce=True)`` does the same for asyncio callers
+without tying up executor threads.
+"""
+
+import threading
+from typing import Union, Optional, Any, List, Dict, Callable, Tuple
+from .api import KVCacheStore, BatchValue, copy_into
+
+# Flight kinds: ``get`` results are bytes, ``get_buffer`` results are buffers
+GET = "get"
+GET_BUFFER = "get_buffer"
+
+
+def share_buffer(buffer: Optional[Any]) -> Optional[memoryview]:
+    """Read-only view of a buffer handed to several callers."""
+    if buffer is None:
+        return None
+    return memoryview(buffer).toreadonly()
+
+
+class _Flight:
+    """One in-progress fetch and the callers waiting for it."""
+    
+    __slots__ = ('event', 'result', 'error', 'followers')
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+    
+    def wait(self) -> Any:
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class CoalescingStore(KVCacheStore):
+    """
+    ``KVCacheStore`` decorator that merges concurrent reads of the same key.
+    
+    ``get``, ``get_buffer`` and ``batch_get`` join a fetch of the same key
+    that is already under way, and ``batch_get`` fetches all keys nobody is
+    fetching yet in one call. ``get_into`` joins a running fetch and copies
+    its result, but does not start shared fetches itself, as its result
+    lands in a private buffer.
+    
+    All callers of a shared ``get_buffer`` receive the same buffer, so it is
+    always returned as a read-only memoryview. A write or remove of a key
+    detaches running fetches of it: callers that arrive afterwards start a
+    new fetch instead of receiving a value read before the write.
+    """
+    
+    def __init__(self, store: KVCacheStore):
+        """
+        Wrap a store with read coalescing.
+        
+        Args:
+            store: The store to coalesce reads on
+        """
+        self._store = store
+        self._lock = threading.Lock()
+        self._flights: Dict[Tuple[str, str], _Flight] = {}
+        self._fetches = 0
+        self._saved = 0
+    
+    # Flights
+    
+    def _join(self, kind: str, key: str) -> Tuple[_Flight, bool]:
+        """
+        Join the running fetch of a key or register a new one.
+        
+        Returns:
+            The flight and whether the caller leads it, i.e. must fetch
+        """
+        with self._lock:
+            flight = self._flights.get((kind, key))
+            if flight is not None:
+                flight.followers += 1
+                self._saved += 1
+                return flight, False
+            flight = _Flight()
+            self._flights[(kind, key)] = flight
+            self._fetches += 1
+            return flight, True
+    
+    def _publish(self, kind: str, key: str, flight: _Flight,
+                 result: Any = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if self._flights.get((kind, key)) is flight:
+                del self._flights[(kind, key)]
+        flight.result = result
+        flight.error = error
+        flight.event.set()
+    
+    def _single(self, kind: str, key: str, fetch: Callable[[], Any]) -> Any:
+        flight, leader = self._join(kind, key)
+        if not leader:
+            return flight.wait()
+        try:
+            result = fetch()
+        except BaseException as e:
+            self._publish(kind, key, flight, error=e)
+            raise
+        self._publish(kind, key, flight, result)
+        return result
+    
+    def _detach(self, keys: List[str]) -> None:
+        """Stop new readers from joining fetches that may predate a write."""
+        with self._lock:
+            for key in keys:
+                self._flights.pop((GET, key), None)
+                self._flights.pop((GET_BUFFER, key), None)
+    
+    # KVCacheStore interface
+    
+    def setup(self,
+              local_hostname: str,
+              metadata_server: str,
+              global_segment_size: int,
+              local_buffer_size: int,
+              protocol: str = "tcp",
+              device_name: str = "lo",
+              master_server_address: Optional[str] = None) -> int:
+        """Set up the wrapped store."""
+        return self._store.setup(local_hostname, metadata_server, global_segment_size,
+                                 local_buffer_size, protocol, device_name,
+                                 master_server_address)
+    
+    def put(self, key: str, *values: Union[bytes, bytearray]) -> int:
+        """Store a value; later reads do not join fetches started before it."""
+        self._detach([key])
+        return self._store.put(key, *values)
+    
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """Store buffer-protocol slices; later reads do not join older fetches."""
+        self._detach([key])
+        return self._store.put_from(key, *buffers)
+    
+    def put_with_hints(self, key: str, *values: Union[bytes, bytearray],
+                       ttl: Optional[float] = None, priority: int = 0, pin: bool = False) -> int:
+        """Store a value with hints; later reads do not join older fetches."""
+        self._detach([key])
+        return self._store.put_with_hints(key, *values, ttl=ttl, priority=priority, pin=pin)
+    
+    def get(self, key: str) -> bytes:
+        """Retrieve a value, sharing a concurrent fetch of the same key."""
+        return self._single(GET, key, lambda: self._store.get(key))
+    
+    def get_buffer(self, key: str) -> Optional[Any]:
+        """Get a read-only buffer, sharing a concurrent fetch of the same key."""
+        return self._single(GET_BUFFER, key, lambda: share_buffer(self._store.get_buffer(key)))
+    
+    def get_into(self, key: str, out: Any) -> int:
+        """Read a value into ``out``, copying from a concurrent fetch if one is running."""
+        with self._lock:
+            flight = self._flights.get((GET, key)) or self._flights.get((GET_BUFFER, key))
+            if flight is not None:
+                flight.followers += 1
+                self._saved += 1
+        if flight is None:
+            return self._store.get_into(key, out)
+        value = flight.wait()
+        if not value:
+            return -1
+        return copy_into(value, out)
+    
+    def get_size(self, key: str) -> int:
+        """Get the size of a value from the wrapped store."""
+        return self._store.get_size(key)
+    
+    def is_exist(self, key: str) -> int:
+        """Check existence on the wrapped store."""
+        return self._store.is_exist(key)
+    
+    def remove(self, key: str) -> int:
+        """Remove a key; later reads do not join fetches started before it."""
+        self._detach([key])
+        return self._store.remove(key)
+    
+    def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """Store multiple values; later reads do not join older fetches."""
+        self._detach(keys)
+        return self._store.batch_put(keys, values)
+    
+    def batch_get(self, keys: List[str]) -> List[bytes]:
+        """
+        Retrieve multiple values. Keys already being fetched are shared;
+        the others are fetched in one batch call that other readers can
+        join key by key.
+        """
+        flights = []
+        led: List[int] = []
+        for i, key in enumerate(keys):
+            flight, leader = self._join(GET, key)
+            flights.append(flight)
+            if leader:
+                led.append(i)
+        
+        if led:
+            try:
+                values = self._store.batch_get([keys[i] for i in led])
+            except BaseException as e:
+                for i in led:
+                    self._publish(GET, keys[i], flights[i], error=e)
+                raise
+            for i, value in zip(led, values):
+                self._publish(GET, keys[i], flights[i], value)
+        return [flight.wait() for flight in flights]
+    
+    def batch_remove(self, keys: List[str]) -> List[int]:
+        """Remove multiple keys; later reads do not join older fetches."""
+        self._detach(keys)
+        return self._store.batch_remove(keys)
+    
+    def register_buffer(self, buffer: Any) -> int:
+        """Register a buffer with the wrapped store."""
+        return self._store.register_buffer(buffer)
+    
+    def unregister_buffer(self, buffer: Any) -> int:
+        """Unregister a buffer from the wrapped store."""
+        return self._store.unregister_buffer(buffer)
+    
+    def close(self) -> int:
+        """Close the wrapped store."""
+        return self._store.close()
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get coalescing counters.
+        
+        Returns:
+            Dictionary with fetches (reads that went to the wrapped store),
+            saved_fetches (reads served by another caller's fetch) and
+            in_flight (fetches currently running)
+        """
+        with self._lock:
+            return {
+                'fetches': self._fetches,
+                'saved_fetches': self._saved,
+                'in_flight': len(self._flights),
+            }
+    
+    @property
+    def inner_store(self) -> KVCacheStore:
+        """The wrapped store."""
+        return self._store
@@ -0,0 +1,514 @@
+"""
+Value compression codecs for the KV Cache API layer.
+
+Every encoded value starts with a small self-describing header::
+
+    magic (4s) | codec id (B) | shuffle element size (B) | reserved (H) | raw size (Q)
+    
+so values written with different codecs, or without any codec at all, can
+live side by side in the same store. Data that does not start with the magic
+is returned unchanged.
+
+Available codecs:
+    none: stored as-is (header only)
+    zlib: built-in; optionally byte-shuffled first, which groups the
+          high and low bytes of fp16/bf16 elements and compresses much better
+    lz4:  if the ``lz4`` package is importable
+    zstd: if the ``zstandard`` package is importable
+"""
+
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Union, Optional, Any, List, Tuple
+from .api import KVCacheStore, BatchValue, copy_into, PUT_PATH_COPY
+from .exceptions import StorageError, BackendNotFoundError
+
+try:
+    import lz4.block as lz4_block
+except ImportError:
+    lz4_block = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+MAGIC = b"\x89KVC"
+HEADER = struct.Struct("<4sBBHQ")
+
+# Bytes handed to zlib per step when decompressing into a caller buffer
+_DECOMPRESS_CHUNK = 4 * 1024 * 1024
+
+# Decoded sizes a CompressedStore remembers for get_size
+SIZE_MEMO_ENTRIES = 65536
+
+
+class Codec:
+    """Base class for compression codecs. Subclasses set ``name`` and ``codec_id``."""
+    
+    name = "none"
+    codec_id = 0
+    
+    def __init__(self, level: Optional[int] = None):
+        self.level = level
+    
+    def compress(self, data: memoryview) -> bytes:
+        return bytes(data)
+    
+    def decompress(self, payload: memoryview, raw_size: int) -> bytes:
+        return bytes(payload)
+    
+    def decompress_into(self, payload: memoryview, out: memoryview) -> None:
+        """Decompress into ``out``, which is exactly the raw size."""
+        out[:] = self.decompress(payload, out.nbytes)
+
+
+class NoneCodec(Codec):
+    """Stores values uncompressed."""
+    
+    def decompress_into(self, payload: memoryview, out: memoryview) -> None:
+        out[:] = payload
+
+
+class ZlibCodec(Codec):
+    """zlib (deflate) from the standard library."""
+    
+    name = "zlib"
+    codec_id = 1
+    
+    def compress(self, data: memoryview) -> bytes:
+        return zlib.compress(data, 1 if self.level is None else self.level)
+    
+    def decompress(self, payload: memoryview, raw_size: int) -> bytes:
+        return zlib.decompress(payload, bufsize=max(raw_size, 1))
+    
+    def decompress_into(self, payload: memoryview, out: memoryview) -> None:
+        # Stream into the caller buffer so at most one chunk is staged
+        decompressor = zlib.decompressobj()
+        offset = 0
+        data = payload
+        while offset < out.nbytes:
+            chunk = decompressor.decompress(data, min(_DECOMPRESS_CHUNK, out.nbytes - offset))
+            if not chunk:
+                break
+            out[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+            data = decompressor.unconsumed_tail
+        if offset != out.nbytes:
+            raise StorageError("Decompressed size does not match header")
+
+
+class Lz4Codec(Codec):
+    """LZ4 block format (requires the ``lz4`` package)."""
+    
+    name = "lz4"
+    codec_id = 2
+    
+    def compress(self, data: memoryview) -> bytes:
+        return lz4_block.compress(data, store_size=False)
+    
+    def decompress(self, payload: memoryview, raw_size: int) -> bytes:
+        return lz4_block.decompress(payload, uncompressed_size=raw_size)
+
+
+class ZstdCodec(Codec):
+    """Zstandard (requires the ``zstandard`` package)."""
+    
+    name = "zstd"
+    codec_id = 3
+    
+    def compress(self, data: memoryview) -> bytes:
+        level = 1 if self.level is None else self.level
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    
+    def decompress(self, payload: memoryview, raw_size: int) -> bytes:
+        return zstandard.ZstdDecompressor().decompress(payload, max_output_size=raw_size)
+
+
+_CODECS = {cls.codec_id: cls for cls in (NoneCodec, ZlibCodec, Lz4Codec, ZstdCodec)}
+_CODECS_BY_NAME = {cls.name: cls for cls in _CODECS.values()}
+
+
+def available_codecs() -> List[str]:
+    """
+    List codecs usable on the current system.
+    
+    Returns:
+        Codec names, fastest first
+    """
+    available = ["none"]
+    if lz4_block is not None:
+        available.append("lz4")
+    if zstandard is not None:
+        available.append("zstd")
+    available.append("zlib")
+    return available
+
+
+def get_codec(name: str, level: Optional[int] = None) -> Codec:
+    """
+    Get a codec by name.
+    
+    Args:
+        name: One of ``none``, ``zlib``, ``lz4``, ``zstd`` or ``auto`` (the
+              best available: zstd, then lz4, then zlib)
+        level: Compression level, codec specific
+        
+    Returns:
+        A Codec instance
+        
+    Raises:
+        BackendNotFoundError: If the codec's package is not installed
+        ValueError: If the name is unknown
+    """
+    if name == "auto":
+        name = "zstd" if zstandard is not None else "lz4" if lz4_block is not None else "zlib"
+    if name not in _CODECS_BY_NAME:
+        raise ValueError(f"Unknown codec: {name}")
+    if name not in available_codecs():
+        raise BackendNotFoundError(f"Codec '{name}' is not available")
+    return _CODECS_BY_NAME[name](level)
+
+
+def shuffle_bytes(data: memoryview, elem_size: int) -> bytes:
+    """
+    Byte-shuffle ``data``: byte 0 of every element, then byte 1, and so on.
+    Trailing bytes that do not fill an element are appended unchanged.
+    """
+    n = data.nbytes - data.nbytes % elem_size
+    raw = data[:n].tobytes()
+    return b"".join(raw[i::elem_size] for i in range(elem_size)) + data[n:].tobytes()
+
+
+def unshuffle_bytes(data: memoryview, out: memoryview, elem_size: int) -> None:
+    """Inverse of ``shuffle_bytes``, writing into ``out`` (same size as ``data``)."""
+    n = data.nbytes - data.nbytes % elem_size
+    count = n // elem_size
+    for i in range(elem_size):
+        out[i:n:elem_size] = data[i * count:(i + 1) * count]
+    out[n:] = data[n:]
+
+
+def encode_value(data: Any,
+                 codec: Codec,
+                 shuffle: int = 0,
+                 min_size: int = 0) -> bytes:
+    """
+    Encode a value with a format header.
+    
+    Values smaller than ``min_size``, and values that do not shrink, are
+    stored with the ``none`` codec so reads never pay for useless
+    decompression.
+    
+    Args:
+        data: Buffer-protocol object to encode
+        codec: Codec to compress with
+        shuffle: Element size in bytes to byte-shuffle by before compressing
+                 (e.g. 2 for fp16); 0 or 1 disables shuffling
+        min_size: Minimum raw size worth compressing
+        
+    Returns:
+        Header followed by the encoded payload
+    """
+    view = memoryview(data).cast("B")
+    raw_size = view.nbytes
+    if codec.codec_id != NoneCodec.codec_id and raw_size >= max(min_size, 1):
+        shuffle = shuffle if shuffle > 1 else 0
+        source = memoryview(shuffle_bytes(view, shuffle)) if shuffle else view
+        payload = codec.compress(source)
+        if len(payload) < raw_size:
+            return HEADER.pack(MAGIC, codec.codec_id, shuffle, 0, raw_size) + payload
+    return HEADER.pack(MAGIC, NoneCodec.codec_id, 0, 0, raw_size) + view.tobytes()
+
+
+def _parse(data: Any):
+    """Return (codec, shuffle, raw_size, payload) or None for unencoded data."""
+    view = memoryview(data).cast("B")
+    if view.nbytes < HEADER.size or view[:4] != MAGIC:
+        return None
+    _, codec_id, shuffle, _, raw_size = HEADER.unpack(view[:HEADER.size])
+    codec_cls = _CODECS.get(codec_id)
+    if codec_cls is None:
+        raise StorageError(f"Unknown codec id {codec_id} in value header")
+    if codec_cls.name not in available_codecs():
+        raise BackendNotFoundError(f"Value is encoded with '{codec_cls.name}', which is not available")
+    return codec_cls(), shuffle, raw_size, view[HEADER.size:]
+
+
+def decoded_size(data: Any) -> int:
+    """
+    Get the raw size of an encoded value from its header.
+    
+    Args:
+        data: Encoded value (or unencoded data)
+        
+    Returns:
+        Size in bytes after decoding
+    """
+    parsed = _parse(data)
+    return memoryview(data).nbytes if parsed is None else parsed[2]
+
+
+def decode_value(data: Any) -> bytes:
+    """
+    Decode a value produced by ``encode_value``.
+    
+    Args:
+        data: Encoded value; data without a header is returned as bytes
+        
+    Returns:
+        The raw value
+    """
+    parsed = _parse(data)
+    if parsed is None:
+        return bytes(data)
+    codec, shuffle, raw_size, payload = parsed
+    if codec.codec_id == NoneCodec.codec_id:
+        return payload.tobytes()
+    if not shuffle:
+        return codec.decompress(payload, raw_size)
+    out = bytearray(raw_size)
+    unshuffle_bytes(memoryview(codec.decompress(payload, raw_size)), memoryview(out), shuffle)
+    return bytes(out)
+
+
+def decode_value_into(data: Any, out: Any) -> int:
+    """
+    Decode a value directly into a caller-provided buffer.
+    
+    Args:
+        data: Encoded value (or unencoded data)
+        out: Writable buffer at least as large as the raw value
+        
+    Returns:
+        Number of bytes written, or -2 if ``out`` is too small
+    """
+    parsed = _parse(data)
+    if parsed is None:
+        return copy_into(data, out)
+    codec, shuffle, raw_size, payload = parsed
+    dst = memoryview(out).cast("B")
+    if raw_size > dst.nbytes:
+        return -2
+    dst = dst[:raw_size]
+    if shuffle:
+        unshuffle_bytes(memoryview(codec.decompress(payload, raw_size)), dst, shuffle)
+    else:
+        codec.decompress_into(payload, dst)
+    return raw_size
+
+
+class CompressedStore(KVCacheStore):
+    """
+    ``KVCacheStore`` decorator that compresses values on write and
+    decompresses them on read.
+    
+    Reads understand every codec header, so the codec can be changed
+    without invalidating existing data. ``get_buffer`` returns the decoded
+    bytes. ``get_size`` answers from the decoded sizes of values this store
+    wrote or read, checked against the stored size, and only reads a value
+    whose size it has not seen.
+    """
+    
+    def __init__(self,
+                 store: KVCacheStore,
+                 codec: str = "auto",
+                 level: Optional[int] = None,
+                 shuffle: int = 2,
+                 min_size: int = 4096):
+        """
+        Wrap a store with a codec.
+        
+        Args:
+            store: The store holding encoded values
+            codec: Codec name, see ``get_codec``
+            level: Compression level, codec specific
+            shuffle: Element size to byte-shuffle by (2 for fp16/bf16,
+                     0 to disable)
+            min_size: Values smaller than this are stored uncompressed
+        """
+        self._store = store
+        self._codec = get_codec(codec, level)
+        self._shuffle = shuffle
+        self._min_size = min_size
+        # key -> (stored size, decoded size)
+        self._sizes: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        self._sizes_lock = threading.Lock()
+    
+    def _encode(self, *values: Any) -> bytes:
+        data = values[0] if len(values) == 1 else b"".join(values)
+        return encode_value(data, self._codec, self._shuffle, self._min_size)
+    
+    def _remember(self, key: str, encoded: Any) -> None:
+        sizes = (memoryview(encoded).nbytes, decoded_size(encoded))
+        with self._sizes_lock:
+            self._sizes[key] = sizes
+            self._sizes.move_to_end(key)
+            if len(self._sizes) > SIZE_MEMO_ENTRIES:
+                self._sizes.popitem(last=False)
+    
+    def _forget(self, keys: List[str]) -> None:
+        with self._sizes_lock:
+            for key in keys:
+                self._sizes.pop(key, None)
+    
+    def _put_encoded(self, key: str, encoded: bytes) -> int:
+        result = self._store.put(key, encoded)
+        if result == 0:
+            self._remember(key, encoded)
+        return result
+    
+    def setup(self,
+              local_hostname: str,
+              metadata_server: str,
+              global_segment_size: int,
+              local_buffer_size: int,
+              protocol: str = "tcp",
+              device_name: str = "lo",
+              master_server_address: Optional[str] = None) -> int:
+        """Set up the wrapped store."""
+        return self._store.setup(local_hostname, metadata_server, global_segment_size,
+                                 local_buffer_size, protocol, device_name,
+                                 master_server_address)
+    
+    def put(self, key: str, *values: Union[bytes, bytearray]) -> int:
+        """Encode and store a value; multiple parts are encoded as one value."""
+        if not values:
+            raise ValueError("At least one value must be provided")
+        return self._put_encoded(key, self._encode(*values))
+    
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """Encode and store a value from buffer-protocol slices."""
+        if not buffers:
+            raise ValueError("At least one buffer must be provided")
+        self._count_put_path(PUT_PATH_COPY)
+        return self._put_encoded(key, self._encode(*buffers))
+    
+    def put_with_hints(self, key: str, *values: Union[bytes, bytearray],
+                       ttl: Optional[float] = None, priority: int = 0, pin: bool = False) -> int:
+        """Encode and store a value with hints."""
+        if not values:
+            raise ValueError("At least one value must be provided")
+        encoded = self._encode(*values)
+        result = self._store.put_with_hints(key, encoded, ttl=ttl, priority=priority, pin=pin)
+        if result == 0:
+            self._remember(key, encoded)
+        return result
+    
+    # Reads decode from a private copy: a zero-copy ``get_buffer`` view may
+    # point into backend memory that a concurrent overwrite or eviction
+    # reuses while it is being decompressed
+    
+    def get(self, key: str) -> bytes:
+        """Retrieve and decode a value."""
+        data = self._store.get(key)
+        if not data:
+            return b""
+        self._remember(key, data)
+        return decode_value(data)
+    
+    def get_buffer(self, key: str) -> Optional[Any]:
+        """Retrieve and decode a value; returns bytes or None if not found."""
+        data = self._store.get(key)
+        if not data:
+            return None
+        self._remember(key, data)
+        return decode_value(data)
+    
+    def get_into(self, key: str, out: Any) -> int:
+        """Retrieve a value and decode it straight into ``out``."""
+        data = self._store.get(key)
+        if not data:
+            return -1
+        self._remember(key, data)
+        return decode_value_into(data, out)
+    
+    def get_size(self, key: str) -> int:
+        """
+        Get the decoded size of a value, or -1 if not found.
+        
+        The stored size identifies the value a remembered decoded size
+        belongs to. Values no larger than a header are read into a header
+        buffer; other unseen values are read once to learn their size.
+        """
+        stored = self._store.get_size(key)
+        if stored < 0:
+            return -1
+        with self._sizes_lock:
+            sizes = self._sizes.get(key)
+        if sizes is not None and sizes[0] == stored:
+            return sizes[1]
+        
+        if stored <= HEADER.size:
+            header = bytearray(HEADER.size)
+            written = self._store.get_into(key, header)
+            if written >= 0:
+                return decoded_size(memoryview(header)[:written])
+            if written != -2:
+                return -1
+            # Replaced by a larger value since get_size; read that instead
+        data = self._store.get(key)
+        if not data:
+            return -1
+        self._remember(key, data)
+        return decoded_size(data)
+    
+    def is_exist(self, key: str) -> int:
+        """Check if a key exists in the wrapped store."""
+        return self._store.is_exist(key)
+    
+    def remove(self, key: str) -> int:
+        """Remove a key from the wrapped store."""
+        self._forget([key])
+        return self._store.remove(key)
+    
+    def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """Encode all values and store them in one batch."""
+        if len(keys) != len(values):
+            raise ValueError("keys and values must have the same length")
+        encoded = [self._encode(*v) if isinstance(v, (list, tuple)) else self._encode(v)
+                   for v in values]
+        results = self._store.batch_put(keys, encoded)
+        for key, data, result in zip(keys, encoded, results):
+            if result == 0:
+                self._remember(key, data)
+        return results
+    
+    def batch_get(self, keys: List[str]) -> List[bytes]:
+        """Fetch values in one batch and decode them."""
+        return [decode_value(data) if data else b"" for data in self._store.batch_get(keys)]
+    
+    def batch_get_into(self, keys: List[str], outs: List[Any]) -> List[int]:
+        """Fetch values in one batch and decode each into its buffer."""
+        if len(keys) != len(outs):
+            raise ValueError("keys and outs must have the same length")
+        results = []
+        for data, out in zip(self._store.batch_get(keys), outs):
+            results.append(decode_value_into(data, out) if data else -1)
+        return results
+    
+    def batch_is_exist(self, keys: List[str]) -> List[int]:
+        """Check existence in the wrapped store in one batch."""
+        return self._store.batch_is_exist(keys)
+    
+    def batch_remove(self, keys: List[str]) -> List[int]:
+        """Remove keys from the wrapped store in one batch."""
+        self._forget(keys)
+        return self._store.batch_remove(keys)
+    
+    def close(self) -> int:
+        """Close the wrapped store."""
+        return self._store.close()
+    
+    @property
+    def codec(self) -> Codec:
+        """The codec used for writes."""
+        return self._codec
+    
+    @property
+    def inner_store(self) -> KVCacheStore:
+        """The wrapped store."""
+        return self._store
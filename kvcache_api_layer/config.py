@@ -4,6 +4,8 @@ Configuration management for the KV Cache API layer.
 This module handles reading configuration from YAML files only.
 """
 
+import hashlib
+import json
 import os
 from typing import Dict, Any, Optional, Union
 from pathlib import Path
@@ -20,6 +22,34 @@ import yaml
 #   local_buffer_size:
 #   metadata_server:
 #   master_server_address:
+# tiering:                 (optional, replaces backend)
+#   mode: write_through | write_back
+#   promote: true
+#   promote_after: 2       (lower-tier hits before a value is promoted)
+#   levels:
+#     - name:
+#       backend: local | shm | mooncake | rust | disk | sharded
+#       options: {}        (backend constructor arguments)
+# sharding:                (optional, replaces backend)
+#   vnodes:
+#   shards:
+#     - name:
+#       master_server_address:
+#       metadata_server:
+# replication:             (optional, places each key on several shards)
+#   replicas:
+#   hedge_delay_ms:
+#   hedge_percentile:
+# write_behind:            (optional, puts return once queued)
+#   max_batch_items:
+#   max_batch_bytes:
+#   max_delay_ms:
+#   max_queued_bytes:
+#   put_timeout_ms:
+# eviction:                (optional, policy for put_with_hints and eviction)
+#   policy: lru | lfu | gdsf
+#   capacity_bytes:        (non-local backends: budget for values written here)
+# enable_metrics:          (optional, per-operation latency and byte metrics)
 
 class ProtocolConfig:
     """Configuration for network protocol settings."""
@@ -61,6 +91,250 @@ class MooncakeSpec:
             raise ValueError("local_buffer_size must be positive")
 
 
+class L1CacheSpec:
+    """Configuration for the optional process-local L1 cache."""
+    
+    def __init__(self, config_dict: Dict[str, Any]):
+        """
+        Initialize L1 cache specifications from dictionary.
+        
+        Args:
+            config_dict: L1 cache configuration dictionary
+        """
+        self.capacity_bytes = config_dict['capacity_bytes']
+        self.policy = config_dict.get('policy', 'lru')
+        self.max_item_size = config_dict.get('max_item_size')
+        
+        # Validate configuration
+        if self.capacity_bytes <= 0:
+            raise ValueError("l1_cache.capacity_bytes must be positive")
+        
+        if self.policy not in ['lru', 'tinylfu']:
+            raise ValueError("l1_cache.policy must be one of: lru, tinylfu")
+        
+        if self.max_item_size is not None and self.max_item_size <= 0:
+            raise ValueError("l1_cache.max_item_size must be positive")
+
+
+class WriteBehindSpec:
+    """Configuration for the optional write-behind put queue."""
+    
+    def __init__(self, config_dict: Dict[str, Any]):
+        """
+        Initialize write-behind specifications from dictionary.
+        
+        Args:
+            config_dict: Write-behind configuration dictionary
+        """
+        self.max_batch_items = config_dict.get('max_batch_items', 64)
+        self.max_batch_bytes = config_dict.get('max_batch_bytes', 64 * 1024 * 1024)
+        self.max_delay_ms = config_dict.get('max_delay_ms', 5)
+        self.max_queued_bytes = config_dict.get('max_queued_bytes', 256 * 1024 * 1024)
+        self.put_timeout_ms = config_dict.get('put_timeout_ms')
+        
+        # Validate configuration
+        for name in ('max_batch_items', 'max_batch_bytes', 'max_queued_bytes'):
+            if getattr(self, name) <= 0:
+                raise ValueError(f"write_behind.{name} must be positive")
+        
+        if self.max_delay_ms < 0:
+            raise ValueError("write_behind.max_delay_ms must not be negative")
+        
+        if self.put_timeout_ms is not None and self.put_timeout_ms < 0:
+            raise ValueError("write_behind.put_timeout_ms must not be negative")
+
+
+class EvictionSpec:
+    """Configuration for expiry, pinning and the eviction policy."""
+    
+    def __init__(self, config_dict: Dict[str, Any]):
+        """
+        Initialize eviction specifications from dictionary.
+        
+        Args:
+            config_dict: Eviction configuration dictionary
+        """
+        self.policy = config_dict.get('policy', 'lru')
+        self.capacity_bytes = config_dict.get('capacity_bytes')
+        
+        # Validate configuration
+        if self.policy not in ['lru', 'lfu', 'gdsf']:
+            raise ValueError("eviction.policy must be one of: lru, lfu, gdsf")
+        
+        if self.capacity_bytes is not None and self.capacity_bytes <= 0:
+            raise ValueError("eviction.capacity_bytes must be positive")
+
+
+class CompressionSpec:
+    """Configuration for optional value compression."""
+    
+    def __init__(self, config_dict: Dict[str, Any]):
+        """
+        Initialize compression specifications from dictionary.
+        
+        Args:
+            config_dict: Compression configuration dictionary
+        """
+        self.codec = config_dict.get('codec', 'auto')
+        self.level = config_dict.get('level')
+        self.shuffle = config_dict.get('shuffle', 2)
+        self.min_size = config_dict.get('min_size', 4096)
+        
+        # Validate configuration
+        if self.codec not in ['auto', 'none', 'zlib', 'lz4', 'zstd']:
+            raise ValueError("compression.codec must be one of: auto, none, zlib, lz4, zstd")
+        
+        if self.shuffle < 0 or self.shuffle > 255:
+            raise ValueError("compression.shuffle must be between 0 and 255")
+        
+        if self.min_size < 0:
+            raise ValueError("compression.min_size must not be negative")
+
+
+class ShardSpec:
+    """Configuration for one shard of a sharded store."""
+    
+    _SETUP_KEYS = ('metadata_server', 'master_server_address',
+                   'global_segment_size', 'local_buffer_size')
+    
+    def __init__(self, config_dict: Dict[str, Any]):
+        """
+        Initialize shard specifications from dictionary.
+        
+        Args:
+            config_dict: Shard configuration dictionary with ``name``,
+                         optional ``backend`` (default: mooncake), optional
+                         ``options`` passed to the backend constructor, and
+                         optional ``metadata_server``,
+                         ``master_server_address``, ``global_segment_size``
+                         and ``local_buffer_size`` overriding the shared
+                         setup arguments
+        """
+        self.name = str(config_dict['name'])
+        self.backend = config_dict.get('backend', 'mooncake')
+        self.options = dict(config_dict.get('options') or {})
+        self.setup_overrides = {k: config_dict[k] for k in self._SETUP_KEYS if k in config_dict}
+        
+        # Validate configuration
+        if self.backend not in ['local', 'shm', 'mooncake', 'rust', 'disk']:
+            raise ValueError("shard backend must be one of: local, shm, mooncake, rust, disk")
+
+
+class ShardingSpec:
+    """Configuration for optional client-side sharding over several stores."""
+    
+    def __init__(self, config_dict: Dict[str, Any]):
+        """
+        Initialize sharding specifications from dictionary.
+        
+        Args:
+            config_dict: Sharding configuration dictionary
+        """
+        self.vnodes = config_dict.get('vnodes', 160)
+        self.shards = [ShardSpec(shard) for shard in config_dict['shards']]
+        
+        # Validate configuration
+        if self.vnodes <= 0:
+            raise ValueError("sharding.vnodes must be positive")
+        
+        if not self.shards:
+            raise ValueError("sharding.shards must not be empty")
+        
+        names = [shard.name for shard in self.shards]
+        if len(set(names)) != len(names):
+            raise ValueError("sharding.shards names must be unique")
+
+
+class ReplicationSpec:
+    """Configuration for optional replication with hedged reads over the shards."""
+    
+    def __init__(self, config_dict: Dict[str, Any]):
+        """
+        Initialize replication specifications from dictionary.
+        
+        Args:
+            config_dict: Replication configuration dictionary
+        """
+        self.replicas = config_dict.get('replicas', 2)
+        self.write_quorum = config_dict.get('write_quorum')
+        self.hedge_delay_ms = config_dict.get('hedge_delay_ms', 5.0)
+        self.hedge_percentile = config_dict.get('hedge_percentile')
+        
+        # Validate configuration
+        if self.replicas <= 0:
+            raise ValueError("replication.replicas must be positive")
+        
+        if self.write_quorum is not None and not 1 <= self.write_quorum <= self.replicas:
+            raise ValueError("replication.write_quorum must be between 1 and replicas")
+        
+        if self.hedge_delay_ms < 0:
+            raise ValueError("replication.hedge_delay_ms must not be negative")
+        
+        if self.hedge_percentile is not None and not 0 < self.hedge_percentile < 100:
+            raise ValueError("replication.hedge_percentile must be between 0 and 100")
+
+
+class TierSpec:
+    """Configuration for one level of a tiered store."""
+    
+    _SETUP_KEYS = ('global_segment_size', 'local_buffer_size')
+    
+    def __init__(self, config_dict: Dict[str, Any]):
+        """
+        Initialize tier specifications from dictionary.
+        
+        Args:
+            config_dict: Tier configuration dictionary with ``name``,
+                         ``backend`` (``sharded`` for the stores declared
+                         under ``sharding``), optional ``options`` passed
+                         to the backend constructor, and optional
+                         ``global_segment_size``/``local_buffer_size``
+                         overriding the shared setup arguments
+        """
+        self.name = config_dict['name']
+        self.backend = config_dict['backend']
+        self.options = dict(config_dict.get('options') or {})
+        self.setup_overrides = {k: config_dict[k] for k in self._SETUP_KEYS if k in config_dict}
+        
+        # Validate configuration
+        if self.backend not in ['local', 'shm', 'mooncake', 'rust', 'disk', 'sharded']:
+            raise ValueError("tier backend must be one of: local, shm, mooncake, rust, disk, sharded")
+        
+        for key, value in self.setup_overrides.items():
+            if value <= 0:
+                raise ValueError(f"tier {key} must be positive")
+
+
+class TieringSpec:
+    """Configuration for an optional tiered store replacing the single backend."""
+    
+    def __init__(self, config_dict: Dict[str, Any]):
+        """
+        Initialize tiering specifications from dictionary.
+        
+        Args:
+            config_dict: Tiering configuration dictionary
+        """
+        self.mode = config_dict.get('mode', 'write_through')
+        self.promote = config_dict.get('promote', True)
+        self.promote_after = config_dict.get('promote_after', 2)
+        self.levels = [TierSpec(level) for level in config_dict['levels']]
+        
+        # Validate configuration
+        if self.mode not in ['write_through', 'write_back']:
+            raise ValueError("tiering.mode must be one of: write_through, write_back")
+        
+        if self.promote_after < 1:
+            raise ValueError("tiering.promote_after must be at least 1")
+        
+        if not self.levels:
+            raise ValueError("tiering.levels must not be empty")
+        
+        names = [level.name for level in self.levels]
+        if len(set(names)) != len(names):
+            raise ValueError("tiering.levels names must be unique")
+
+
 class KVCacheConfig:
     """Configuration class for KV Cache stores that reads from YAML config files."""
     
@@ -74,7 +348,8 @@ class KVCacheConfig:
         # Extract known parameters (new structure)
         new_structure_params = {
             'local_hostname', 'contribute_to_cluster_pool_size', 'protocal',
-            'log_level', 'mooncake_spec'
+            'log_level', 'mooncake_spec', 'l1_cache', 'compression', 'tiering',
+            'sharding', 'replication', 'write_behind', 'eviction'
         }
         
         # Extract backward compatibility parameters
@@ -109,7 +384,7 @@ class KVCacheConfig:
         specs=[
             'mooncake_spec',
         ]
-
+        
         # Handle mooncake_spec configuration (new nested structure)
         # Validation happens in MooncakeSpec constructor
         if specs[0] in config_dict:
@@ -117,5 +392,160 @@ class KVCacheConfig:
         else:
             raise ValueError(f"at least one of the following is required: {specs}")
         
+        # Optional process-local L1 cache in front of the backend
+        if 'l1_cache' in config_dict:
+            self.l1_cache = L1CacheSpec(config_dict['l1_cache'])
+        else:
+            self.l1_cache = None
+        
+        # Optional value compression between the API and the backend
+        if 'compression' in config_dict:
+            self.compression = CompressionSpec(config_dict['compression'])
+        else:
+            self.compression = None
+        
+        # Optional write-behind queue, so puts return once queued
+        if 'write_behind' in config_dict:
+            self.write_behind = WriteBehindSpec(config_dict['write_behind'])
+        else:
+            self.write_behind = None
+        
+        # Optional eviction policy, also enabling put_with_hints
+        if 'eviction' in config_dict:
+            self.eviction = EvictionSpec(config_dict['eviction'])
+        else:
+            self.eviction = None
+        
+        # Optional sharding over several stores, replacing ``backend``
+        if 'sharding' in config_dict:
+            self.sharding = ShardingSpec(config_dict['sharding'])
+        else:
+            self.sharding = None
+        
+        # Optional replication of every key over the shards
+        if 'replication' in config_dict:
+            if self.sharding is None:
+                raise ValueError("replication requires a sharding section")
+            self.replication = ReplicationSpec(config_dict['replication'])
+            if self.replication.replicas > len(self.sharding.shards):
+                raise ValueError("replication.replicas must not exceed the number of shards")
+        else:
+            self.replication = None
+        
+        # Optional tiers (memory, shm, remote, disk) replacing ``backend``
+        if 'tiering' in config_dict:
+            self.tiering = TieringSpec(config_dict['tiering'])
+            uses_shards = any(level.backend == 'sharded' for level in self.tiering.levels)
+            if uses_shards and self.sharding is None:
+                raise ValueError("a 'sharded' tier requires a sharding section")
+        else:
+            self.tiering = None
+        
+        self.backend = config_dict.get('backend', 'mooncake')
+        self.enable_metrics = config_dict.get('enable_metrics', False)
+        
         # Store any extra configuration
         self.extra_config = extra_config
+        
+        # Canonical form of the input, used to identify equal configurations
+        self._canonical = json.dumps(config_dict, sort_keys=True, default=str)
+    
+    def get_backend_type(self):
+        """
+        Get the configured backend type.
+        
+        Returns:
+            The BackendType named by the ``backend`` key (default: mooncake)
+        """
+        from .backends import BackendType
+        
+        try:
+            return BackendType(self.backend)
+        except ValueError:
+            raise ValueError(f"Unknown backend: {self.backend}")
+    
+    def fingerprint(self) -> str:
+        """
+        Get a stable identifier of this configuration.
+        
+        Returns:
+            Hex digest that is equal for configurations with equal contents
+        """
+        return hashlib.sha256(self._canonical.encode()).hexdigest()
+    
+    # Setup arguments derived from the nested structure, in the shape
+    # expected by KVCacheStore.setup()
+    
+    @property
+    def metadata_server(self) -> str:
+        return self.mooncake_spec.metadata_server
+    
+    @property
+    def master_server_address(self) -> str:
+        return self.mooncake_spec.master_server_address
+    
+    @property
+    def global_segment_size(self) -> int:
+        return self.contribute_to_cluster_pool_size
+    
+    @property
+    def local_buffer_size(self) -> int:
+        return self.mooncake_spec.local_buffer_size
+    
+    @property
+    def protocol(self) -> str:
+        return self.protocal.type
+    
+    @property
+    def device_name(self) -> str:
+        return self.protocal.rdma_device_name or "lo"
+
+
+def load_config(config_path: Union[str, Path]) -> KVCacheConfig:
+    """
+    Load configuration from a YAML file.
+    
+    Args:
+        config_path: Path to the YAML config file
+        
+    Returns:
+        KVCacheConfig instance
+        
+    Raises:
+        FileNotFoundError: If the config file does not exist
+        ValueError: If the config file is empty or invalid
+    """
+    config_path = Path(config_path)
+    if not config_path.exists():
+        raise FileNotFoundError(f"Config file not found: {config_path}")
+    
+    with open(config_path, 'r') as f:
+        config_dict = yaml.safe_load(f)
+    
+    if not isinstance(config_dict, dict):
+        raise ValueError(f"Config file is empty or not a mapping: {config_path}")
+    
+    return KVCacheConfig(config_dict)
+
+
+def create_default_config(local_hostname: str = "localhost") -> KVCacheConfig:
+    """
+    Create a configuration with default values for a single local node.
+    
+    Args:
+        local_hostname: The local hostname
+        
+    Returns:
+        KVCacheConfig instance
+    """
+    return KVCacheConfig({
+        'local_hostname': local_hostname,
+        'contribute_to_cluster_pool_size': 3200 * 1024 * 1024,
+        'protocal': {'type': 'tcp'},
+        'log_level': 'INFO',
+        'mooncake_spec': {
+            'local_buffer_size': 512 * 1024 * 1024,
+            'metadata_server': "127.0.0.1:2379",
+            'master_server_address': "127.0.0.1:50051",
+        },
+    })
@@ -0,0 +1,722 @@
+"""
+Expiry, pinning and eviction policies for the KV Cache API layer.
+
+``put_with_hints`` stores a value with an optional TTL, a priority and a
+pin. Lower priorities are always evicted first, pinned values never, and
+within a priority an ``EvictionPolicy`` picks the victim:
+
+    lru    least recently used
+    lfu    least frequently used, ties broken by recency
+    gdsf   Greedy-Dual-Size-Frequency: frequency per byte plus an aging
+           term, so large cold values go before small hot ones
+
+``LocalStore`` applies the hints and policy natively in its arena.
+``EvictingStore`` emulates them for stores that cannot, such as Mooncake,
+by keeping metadata for the keys written through it: expired keys are
+hidden and removed, and with a ``capacity_bytes`` budget the policy picks
+which keys to remove before the backend's own eviction would.
+
+Expiry times live in a heap served by a ``Reaper`` thread that sleeps
+until the earliest deadline.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Union, Optional, Any, List, Dict, Callable, Tuple
+from .api import KVCacheStore, BatchValue
+from .exceptions import StorageError
+
+# Shared logical clock, so scores of different policy instances compare
+_ticks = itertools.count(1)
+
+
+class EvictionPolicy(ABC):
+    """
+    Orders the evictable keys of a store; pinned keys are never added.
+    
+    Scores are tuples starting with the priority, and the key with the
+    lowest score is the next victim. Scores of instances of the same policy
+    class can be compared with each other.
+    """
+    
+    name = ""
+    
+    @abstractmethod
+    def add(self, key: str, size: int, priority: int) -> None:
+        """Start tracking a key, replacing earlier state for it."""
+        pass
+    
+    @abstractmethod
+    def touch(self, key: str) -> None:
+        """Record an access to a tracked key."""
+        pass
+    
+    @abstractmethod
+    def discard(self, key: str, evicted: bool = False) -> None:
+        """Stop tracking a key; ``evicted`` if it was removed to make room."""
+        pass
+    
+    @abstractmethod
+    def victim(self) -> Optional[str]:
+        """The key to evict next, or None if nothing is evictable."""
+        pass
+    
+    @abstractmethod
+    def score(self, key: str) -> tuple:
+        """Eviction score of a tracked key; lower is evicted first."""
+        pass
+    
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of tracked keys."""
+        pass
+    
+    @abstractmethod
+    def __contains__(self, key: str) -> bool:
+        """Whether a key is tracked."""
+        pass
+
+
+class LRUPolicy(EvictionPolicy):
+    """Least recently used first, with O(1) updates per priority level."""
+    
+    name = "lru"
+    
+    def __init__(self):
+        self._levels: Dict[int, "OrderedDict[str, int]"] = {}
+        self._priority: Dict[str, int] = {}
+    
+    def add(self, key: str, size: int, priority: int) -> None:
+        self.discard(key)
+        self._levels.setdefault(priority, OrderedDict())[key] = next(_ticks)
+        self._priority[key] = priority
+    
+    def touch(self, key: str) -> None:
+        level = self._levels[self._priority[key]]
+        level[key] = next(_ticks)
+        level.move_to_end(key)
+    
+    def discard(self, key: str, evicted: bool = False) -> None:
+        priority = self._priority.pop(key, None)
+        if priority is None:
+            return
+        level = self._levels[priority]
+        del level[key]
+        if not level:
+            del self._levels[priority]
+    
+    def victim(self) -> Optional[str]:
+        if not self._levels:
+            return None
+        return next(iter(self._levels[min(self._levels)]))
+    
+    def score(self, key: str) -> tuple:
+        priority = self._priority[key]
+        return (priority, self._levels[priority][key])
+    
+    def __len__(self) -> int:
+        return len(self._priority)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._priority
+
+
+class _HeapPolicy(EvictionPolicy):
+    """
+    Policy over a min-heap of scores with lazy deletion: updates push a new
+    entry and outdated ones are skipped when they reach the top.
+    """
+    
+    def __init__(self):
+        self._scores: Dict[str, tuple] = {}
+        self._heap: List[Tuple[tuple, str]] = []
+    
+    def _push(self, key: str, score: tuple) -> None:
+        self._scores[key] = score
+        heapq.heappush(self._heap, (score, key))
+        if len(self._heap) > 2 * len(self._scores) + 64:
+            self._heap = [(s, k) for k, s in self._scores.items()]
+            heapq.heapify(self._heap)
+    
+    def discard(self, key: str, evicted: bool = False) -> None:
+        self._scores.pop(key, None)
+    
+    def victim(self) -> Optional[str]:
+        heap = self._heap
+        while heap:
+            score, key = heap[0]
+            if self._scores.get(key) == score:
+                return key
+            heapq.heappop(heap)
+        return None
+    
+    def score(self, key: str) -> tuple:
+        return self._scores[key]
+    
+    def __len__(self) -> int:
+        return len(self._scores)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._scores
+
+
+class LFUPolicy(_HeapPolicy):
+    """Least frequently used first; equally frequent keys in LRU order."""
+    
+    name = "lfu"
+    
+    def add(self, key: str, size: int, priority: int) -> None:
+        self._push(key, (priority, 1, next(_ticks)))
+    
+    def touch(self, key: str) -> None:
+        priority, count, _ = self._scores[key]
+        self._push(key, (priority, count + 1, next(_ticks)))
+
+
+class GDSFPolicy(_HeapPolicy):
+    """
+    Greedy-Dual-Size-Frequency: a key's value is ``L + frequency / size``
+    in KiB, where ``L`` is raised to the value of each evicted key, so that
+    keys which stopped being read eventually fall below newer ones.
+    """
+    
+    name = "gdsf"
+    
+    def __init__(self):
+        super().__init__()
+        self._inflation = 0.0
+        # key -> (frequency, size in KiB)
+        self._usage: Dict[str, Tuple[int, float]] = {}
+    
+    def _score(self, key: str, priority: int) -> None:
+        count, size = self._usage[key]
+        self._push(key, (priority, self._inflation + count / size, next(_ticks)))
+    
+    def add(self, key: str, size: int, priority: int) -> None:
+        self._usage[key] = (1, max(size, 1) / 1024)
+        self._score(key, priority)
+    
+    def touch(self, key: str) -> None:
+        count, size = self._usage[key]
+        self._usage[key] = (count + 1, size)
+        self._score(key, self._scores[key][0])
+    
+    def discard(self, key: str, evicted: bool = False) -> None:
+        score = self._scores.pop(key, None)
+        self._usage.pop(key, None)
+        if evicted and score is not None:
+            self._inflation = max(self._inflation, score[1])
+
+
+POLICIES: Dict[str, Callable[[], EvictionPolicy]] = {
+    LRUPolicy.name: LRUPolicy,
+    LFUPolicy.name: LFUPolicy,
+    GDSFPolicy.name: GDSFPolicy,
+}
+
+
+def create_policy(name: str) -> EvictionPolicy:
+    """
+    Create an eviction policy by name.
+    
+    Raises:
+        ValueError: If the name is not one of ``POLICIES``
+    """
+    factory = POLICIES.get(name)
+    if factory is None:
+        raise ValueError(f"eviction policy must be one of: {', '.join(POLICIES)}")
+    return factory()
+
+
+def check_hints(ttl: Optional[float], priority: int) -> None:
+    """Validate ``put_with_hints`` arguments."""
+    if ttl is not None and ttl <= 0:
+        raise ValueError("ttl must be positive")
+    if not isinstance(priority, int):
+        raise ValueError("priority must be an integer")
+
+
+class Reaper:
+    """
+    Background thread that expires keys at their deadlines.
+    
+    Deadlines are kept in a heap and the thread sleeps until the earliest
+    one. Entries are never cancelled: the ``expire`` callback receives
+    (key, token) pairs and must ignore those whose token is outdated, e.g.
+    because the key was overwritten or removed in the meantime.
+    """
+    
+    def __init__(self,
+                 expire: Callable[[List[Tuple[str, Any]]], None],
+                 name: str = "kvcache-reaper",
+                 max_batch: int = 1024):
+        """
+        Args:
+            expire: Called from the reaper thread with due (key, token)
+                    pairs, at most ``max_batch`` at a time
+            name: Name of the reaper thread
+            max_batch: Largest number of keys passed to one ``expire`` call
+        """
+        self._expire = expire
+        self._name = name
+        self._max_batch = max_batch
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, str, Any]] = []
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self.errors = 0
+    
+    def schedule(self, key: str, deadline: float, token: Any) -> None:
+        """Expire ``key`` at ``deadline`` (``time.monotonic()`` clock)."""
+        with self._cond:
+            if self._stopped:
+                return
+            entry = (deadline, next(self._seq), key, token)
+            heapq.heappush(self._heap, entry)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+            elif self._heap[0] is entry:
+                # New earliest deadline; wake the thread to shorten its sleep
+                self._cond.notify()
+    
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    now = time.monotonic()
+                    if self._heap and self._heap[0][0] <= now:
+                        break
+                    self._cond.wait(self._heap[0][0] - now if self._heap else None)
+                if self._stopped:
+                    return
+                due = []
+                while self._heap and self._heap[0][0] <= now and len(due) < self._max_batch:
+                    _, _, key, token = heapq.heappop(self._heap)
+                    due.append((key, token))
+            try:
+                self._expire(due)
+            except Exception:
+                # Keep reaping; the keys are hidden from reads regardless
+                self.errors += 1
+    
+    def __len__(self) -> int:
+        """Number of scheduled, possibly outdated, deadlines."""
+        with self._cond:
+            return len(self._heap)
+    
+    def stop(self) -> None:
+        """Stop the thread; pending deadlines are dropped."""
+        with self._cond:
+            self._stopped = True
+            thread = self._thread
+            self._heap = []
+            self._cond.notify()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+
+class _Meta:
+    __slots__ = ('size', 'expires', 'pinned', 'priority')
+    
+    def __init__(self, size: int, expires: Optional[float], pinned: bool, priority: int):
+        self.size = size
+        self.expires = expires
+        self.pinned = pinned
+        self.priority = priority
+    
+    def expired(self, now: float) -> bool:
+        return self.expires is not None and self.expires <= now
+
+
+def _nbytes(value: Any) -> int:
+    if isinstance(value, (list, tuple)):
+        return sum(memoryview(part).nbytes for part in value)
+    return memoryview(value).nbytes
+
+
+class EvictingStore(KVCacheStore):
+    """
+    ``KVCacheStore`` decorator that emulates TTLs, pins and an eviction
+    policy with metadata, for backends without native support.
+    
+    Only keys written through this instance are governed; keys written by
+    other clients of a shared pool pass through untouched. A key past its
+    TTL reads as absent at once and is removed from the wrapped store by
+    the reaper. With ``capacity_bytes``, writes that would exceed the budget
+    first remove unpinned keys in policy order, lowest priority first; if
+    only pinned keys are left, the write fails with -1.
+    """
+    
+    def __init__(self,
+                 store: KVCacheStore,
+                 policy: str = "lru",
+                 capacity_bytes: Optional[int] = None,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        """
+        Wrap a store with metadata-based expiry and eviction.
+        
+        Args:
+            store: The store to govern, e.g. a ``MooncakeStore``
+            policy: Eviction policy, one of ``POLICIES``
+            capacity_bytes: Budget for the values written through this
+                            instance; None leaves eviction to the backend
+                            and only applies TTLs
+            on_evict: Called with each key removed by the policy or by
+                      expiry, once it is gone from the wrapped store, e.g.
+                      to drop it from a cache layered above
+            
+        Raises:
+            ValueError: If the policy or capacity is invalid
+        """
+        if capacity_bytes is not None and capacity_bytes <= 0:
+            raise ValueError("capacity_bytes must be positive")
+        
+        self._store = store
+        self._policy = create_policy(policy)
+        self._capacity = capacity_bytes
+        self._on_evict = on_evict
+        self._lock = threading.Lock()
+        self._meta: Dict[str, _Meta] = {}
+        # Number of writes in flight per key
+        self._writing: Dict[str, int] = {}
+        self._used = 0
+        self._reaper = Reaper(self._reap, name="kvcache-evicting-reaper")
+        self._closed = False
+        
+        self._expirations = 0
+        self._evictions = 0
+        self._rejections = 0
+    
+    # Metadata
+    
+    def _forget(self, key: str, evicted: bool = False) -> Optional[_Meta]:
+        """Drop a key's metadata; called with the lock held."""
+        meta = self._meta.pop(key, None)
+        if meta is not None:
+            self._used -= meta.size
+            self._policy.discard(key, evicted)
+        return meta
+    
+    def _admit(self, keys: List[str], sizes: List[int]) -> Tuple[List[str], List[bool]]:
+        """
+        Make room for values about to be written. Every key must be passed
+        to ``_record`` afterwards, also if the write is not attempted.
+        
+        Returns:
+            Keys to remove from the wrapped store first, and per key
+            whether it fits the budget
+        """
+        victims: List[str] = []
+        fits: List[bool] = []
+        with self._lock:
+            for key, size in zip(keys, sizes):
+                self._writing[key] = self._writing.get(key, 0) + 1
+                # A value being overwritten stays tracked until the write
+                # succeeds, but leaves the policy so it is not evicted
+                # meanwhile; its space counts as free for the new value
+                old = self._meta.get(key)
+                if old is not None:
+                    self._policy.discard(key)
+                if self._capacity is None:
+                    fits.append(True)
+                    continue
+                credit = old.size if old is not None else 0
+                # A value larger than the whole budget is rejected outright
+                while size <= self._capacity and self._used - credit + size > self._capacity:
+                    victim = self._policy.victim()
+                    if victim is None:
+                        break
+                    self._forget(victim, evicted=True)
+                    self._evictions += 1
+                    victims.append(victim)
+                ok = self._used - credit + size <= self._capacity
+                if ok:
+                    # Reserve the space until the write is recorded
+                    self._used += size
+                else:
+                    self._rejections += 1
+                fits.append(ok)
+        return victims, fits
+    
+    def _record(self, key: str, size: int, status: int, ttl: Optional[float],
+                priority: int, pin: bool, reserved: bool = True) -> None:
+        """
+        Replace a key's metadata after a successful write. After a failed
+        or rejected one (``reserved`` False) the previous value, if any,
+        stays tracked.
+        """
+        with self._lock:
+            if self._capacity is not None and reserved:
+                self._used -= size
+            self._writing[key] -= 1
+            if not self._writing[key]:
+                del self._writing[key]
+            if status == 0:
+                self._forget(key)
+                expires = time.monotonic() + ttl if ttl is not None else None
+                meta = _Meta(size, expires, pin, priority)
+                self._meta[key] = meta
+                self._used += size
+                if not pin:
+                    self._policy.add(key, size, priority)
+            else:
+                meta = self._meta.get(key)
+                if meta is None or key in self._writing:
+                    return
+                if not meta.pinned:
+                    self._policy.add(key, meta.size, meta.priority)
+                # The reaper skips keys being written; check again
+                expires = meta.expires
+        if expires is not None:
+            self._reaper.schedule(key, expires, meta)
+    
+    def _expired(self, key: str) -> bool:
+        """Whether a key is past its TTL; such a key is forgotten and removed."""
+        with self._lock:
+            meta = self._meta.get(key)
+            if meta is None or key in self._writing or not meta.expired(time.monotonic()):
+                return False
+            self._forget(key)
+            self._expirations += 1
+        self._store.remove(key)
+        self._notify([key])
+        return True
+    
+    def _touch(self, key: str) -> None:
+        with self._lock:
+            if key in self._policy:
+                self._policy.touch(key)
+    
+    def _reap(self, due: List[Tuple[str, Any]]) -> None:
+        expired = []
+        with self._lock:
+            for key, meta in due:
+                # A key being overwritten is left alone, see ``_record``
+                if self._meta.get(key) is meta and key not in self._writing:
+                    self._forget(key)
+                    self._expirations += 1
+                    expired.append(key)
+        if expired:
+            self._store.batch_remove(expired)
+            self._notify(expired)
+    
+    def _notify(self, keys: List[str]) -> None:
+        """Report keys removed by the policy or by expiry to ``on_evict``."""
+        if self._on_evict is None:
+            return
+        for key in keys:
+            try:
+                self._on_evict(key)
+            except Exception:
+                # A failing listener must not fail the read or write
+                pass
+    
+    def _write(self, key: str, size: int, fn: Callable[[], int], ttl: Optional[float] = None,
+               priority: int = 0, pin: bool = False) -> int:
+        if self._closed:
+            raise StorageError("EvictingStore is closed")
+        victims, fits = self._admit([key], [size])
+        status = -1
+        try:
+            if victims:
+                self._store.batch_remove(victims)
+                self._notify(victims)
+            if fits[0]:
+                status = fn()
+        finally:
+            self._record(key, size, status, ttl, priority, pin, reserved=fits[0])
+        return status
+    
+    # KVCacheStore interface
+    
+    def setup(self,
+              local_hostname: str,
+              metadata_server: str,
+              global_segment_size: int,
+              local_buffer_size: int,
+              protocol: str = "tcp",
+              device_name: str = "lo",
+              master_server_address: Optional[str] = None) -> int:
+        """Set up the wrapped store."""
+        return self._store.setup(local_hostname, metadata_server, global_segment_size,
+                                 local_buffer_size, protocol, device_name,
+                                 master_server_address)
+    
+    def put(self, key: str, *values: Union[bytes, bytearray]) -> int:
+        """Store a value with default hints: no TTL, priority 0, unpinned."""
+        return self._write(key, sum(_nbytes(v) for v in values),
+                           lambda: self._store.put(key, *values))
+    
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """Store buffer-protocol slices with default hints."""
+        return self._write(key, sum(_nbytes(b) for b in buffers),
+                           lambda: self._store.put_from(key, *buffers))
+    
+    def put_with_hints(self, key: str, *values: Union[bytes, bytearray],
+                       ttl: Optional[float] = None, priority: int = 0, pin: bool = False) -> int:
+        """Store a value and track its TTL, priority and pin."""
+        check_hints(ttl, priority)
+        return self._write(key, sum(_nbytes(v) for v in values),
+                           lambda: self._store.put(key, *values), ttl, priority, pin)
+    
+    def get(self, key: str) -> bytes:
+        """Retrieve a value; expired keys read as absent."""
+        if self._expired(key):
+            return b""
+        value = self._store.get(key)
+        if value:
+            self._touch(key)
+        return value
+    
+    def get_buffer(self, key: str) -> Optional[Any]:
+        """Get a buffer for a value; expired keys read as absent."""
+        if self._expired(key):
+            return None
+        buffer = self._store.get_buffer(key)
+        if buffer is not None:
+            self._touch(key)
+        return buffer
+    
+    def get_into(self, key: str, out: Any) -> int:
+        """Read a value into ``out``; expired keys read as absent."""
+        if self._expired(key):
+            return -1
+        written = self._store.get_into(key, out)
+        if written >= 0:
+            self._touch(key)
+        return written
+    
+    def get_size(self, key: str) -> int:
+        """Get the size of a value; -1 for expired keys."""
+        if self._expired(key):
+            return -1
+        return self._store.get_size(key)
+    
+    def is_exist(self, key: str) -> int:
+        """Check existence; expired keys do not exist."""
+        if self._expired(key):
+            return 0
+        return self._store.is_exist(key)
+    
+    def remove(self, key: str) -> int:
+        """Remove a key and its metadata."""
+        with self._lock:
+            self._forget(key)
+        return self._store.remove(key)
+    
+    def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """Store multiple values with default hints in one batch."""
+        if len(keys) != len(values):
+            raise ValueError("keys and values must have the same length")
+        if self._closed:
+            raise StorageError("EvictingStore is closed")
+        
+        sizes = [_nbytes(v) for v in values]
+        victims, fits = self._admit(keys, sizes)
+        results = [-1] * len(keys)
+        idx = [i for i, ok in enumerate(fits) if ok]
+        statuses = [-1] * len(idx)
+        try:
+            if victims:
+                self._store.batch_remove(victims)
+                self._notify(victims)
+            if idx:
+                statuses = self._store.batch_put([keys[i] for i in idx], [values[i] for i in idx])
+        finally:
+            for i, status in zip(idx, statuses):
+                results[i] = status
+                self._record(keys[i], sizes[i], status, None, 0, False)
+            for i, ok in enumerate(fits):
+                if not ok:
+                    self._record(keys[i], sizes[i], -1, None, 0, False, reserved=False)
+        return results
+    
+    def batch_get(self, keys: List[str]) -> List[bytes]:
+        """Retrieve multiple values in one batch; expired keys read as absent."""
+        live = [i for i, key in enumerate(keys) if not self._expired(key)]
+        results = [b""] * len(keys)
+        if live:
+            for i, value in zip(live, self._store.batch_get([keys[i] for i in live])):
+                results[i] = value
+                if value:
+                    self._touch(keys[i])
+        return results
+    
+    def batch_get_into(self, keys: List[str], outs: List[Any]) -> List[int]:
+        """Read multiple values into caller buffers; expired keys read as absent."""
+        if len(keys) != len(outs):
+            raise ValueError("keys and outs must have the same length")
+        
+        live = [i for i, key in enumerate(keys) if not self._expired(key)]
+        results = [-1] * len(keys)
+        if live:
+            fetched = self._store.batch_get_into([keys[i] for i in live], [outs[i] for i in live])
+            for i, written in zip(live, fetched):
+                results[i] = written
+                if written >= 0:
+                    self._touch(keys[i])
+        return results
+    
+    def batch_is_exist(self, keys: List[str]) -> List[int]:
+        """Check existence of multiple keys; expired keys do not exist."""
+        live = [i for i, key in enumerate(keys) if not self._expired(key)]
+        results = [0] * len(keys)
+        if live:
+            for i, value in zip(live, self._store.batch_is_exist([keys[i] for i in live])):
+                results[i] = value
+        return results
+    
+    def batch_remove(self, keys: List[str]) -> List[int]:
+        """Remove multiple keys and their metadata in one batch."""
+        with self._lock:
+            for key in keys:
+                self._forget(key)
+        return self._store.batch_remove(keys)
+    
+    def register_buffer(self, buffer: Any) -> int:
+        """Register a buffer with the wrapped store."""
+        return self._store.register_buffer(buffer)
+    
+    def unregister_buffer(self, buffer: Any) -> int:
+        """Unregister a buffer from the wrapped store."""
+        return self._store.unregister_buffer(buffer)
+    
+    def close(self) -> int:
+        """Stop the reaper and close the wrapped store."""
+        self._closed = True
+        self._reaper.stop()
+        return self._store.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get expiry and eviction counters.
+        
+        Returns:
+            Dictionary with policy, tracked_keys, pinned, used_bytes,
+            capacity_bytes (None without a budget), expirations, evictions,
+            rejections (writes refused because only pinned keys were left)
+            and scheduled_expiries
+        """
+        with self._lock:
+            return {
+                'policy': self._policy.name,
+                'tracked_keys': len(self._meta),
+                'pinned': len(self._meta) - len(self._policy),
+                'used_bytes': self._used,
+                'capacity_bytes': self._capacity,
+                'expirations': self._expirations,
+                'evictions': self._evictions,
+                'rejections': self._rejections,
+                'scheduled_expiries': len(self._reaper),
+            }
+    
+    @property
+    def inner_store(self) -> KVCacheStore:
+        """The wrapped store."""
+        return self._store
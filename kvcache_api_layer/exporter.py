@@ -0,0 +1,247 @@
+"""
+Prometheus exporter for the KV Cache API layer.
+
+``render_metrics`` turns a store's counters into the Prometheus text
+exposition format: per-operation rates and latency histograms from an
+``InstrumentedStore``, and pool size, used bytes, object count and
+evictions from every layer that has a ``stats()`` method. ``MetricsServer``
+serves them on ``/metrics`` with the standard library HTTP server, so
+scraping needs no extra dependency.
+"""
+
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Any, List, Dict, Callable, Tuple
+from .api import KVCacheStore
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds of the exported latency histogram buckets, in seconds
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0,
+)
+
+# Well-known ``stats()`` keys exported under their own metric names
+_POOL_METRICS = {
+    'capacity_bytes': ('kvcache_pool_capacity_bytes', 'gauge', "Bytes the store may hold"),
+    'used_bytes': ('kvcache_pool_used_bytes', 'gauge', "Bytes held by stored values"),
+    'object_count': ('kvcache_objects', 'gauge', "Number of stored objects"),
+    'entries': ('kvcache_objects', 'gauge', "Number of stored objects"),
+    'evictions': ('kvcache_evictions_total', 'counter', "Objects evicted to make room"),
+    'expirations': ('kvcache_expirations_total', 'counter', "Objects removed when their TTL ran out"),
+}
+
+# InstrumentedStore snapshot counters and their metric names
+_OP_METRICS = (
+    ('calls', 'kvcache_ops_total', "Store calls"),
+    ('items', 'kvcache_op_items_total', "Keys handled, counting every key of a batch call"),
+    ('errors', 'kvcache_op_errors_total', "Failed store calls or batch items"),
+    ('misses', 'kvcache_op_misses_total', "Reads of absent keys"),
+    ('bytes_in', 'kvcache_op_bytes_in_total', "Bytes written to the store"),
+    ('bytes_out', 'kvcache_op_bytes_out_total', "Bytes read from the store"),
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def store_layers(store: KVCacheStore) -> List[KVCacheStore]:
+    """The store and every store it wraps via ``inner_store``, outermost first."""
+    layers = [store]
+    while hasattr(layers[-1], 'inner_store'):
+        layers.append(layers[-1].inner_store)
+    return layers
+
+
+class _Families:
+    """Samples grouped by metric family, each with one HELP/TYPE header."""
+    
+    def __init__(self):
+        self._families: Dict[str, Tuple[str, str, List[str]]] = {}
+    
+    def add(self, name: str, kind: str, help_text: str, value: float,
+            labels: Optional[Dict[str, str]] = None, suffix: str = "") -> None:
+        family = self._families.setdefault(name, (kind, help_text, []))
+        family[2].append(f"{name}{suffix}{_labels(labels or {})} {_number(value)}")
+    
+    def render(self) -> str:
+        lines = []
+        for name, (kind, help_text, samples) in self._families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+def render_metrics(store: Optional[KVCacheStore], constants: Optional[Dict[str, Tuple[float, str]]] = None) -> str:
+    """
+    Render a store's metrics in the Prometheus text format.
+    
+    Args:
+        store: The store; wrapped layers are found through ``inner_store``.
+               None renders only ``constants``
+        constants: Extra gauges, metric name to (value, help text), e.g.
+                   the configured ``kvcache_pool_contributed_bytes``
+        
+    Returns:
+        The exposition text
+    """
+    families = _Families()
+    for name, (value, help_text) in (constants or {}).items():
+        families.add(name, 'gauge', help_text, value)
+    
+    for layer in store_layers(store) if store is not None else []:
+        layer_name = type(layer).__name__
+        
+        snapshot = getattr(layer, 'snapshot', None)
+        histogram = getattr(layer, 'histogram', None)
+        if callable(snapshot) and callable(histogram):
+            for op, counters in snapshot().items():
+                labels = {'op': op}
+                for key, name, help_text in _OP_METRICS:
+                    families.add(name, 'counter', help_text, counters[key], labels)
+                hist = histogram(op)
+                if hist is not None:
+                    _add_histogram(families, labels, hist)
+        
+        stats = getattr(layer, 'stats', None)
+        if not callable(stats):
+            continue
+        try:
+            values = stats()
+        except Exception:
+            # An uninitialized backend refuses stats(); export what we can
+            continue
+        labels = {'store': layer_name}
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key in _POOL_METRICS:
+                name, kind, help_text = _POOL_METRICS[key]
+                families.add(name, kind, help_text, value, labels)
+            else:
+                families.add('kvcache_store_stat', 'gauge', "Other counters reported by store layers",
+                             value, {**labels, 'stat': key})
+    return families.render()
+
+
+def _add_histogram(families: _Families, labels: Dict[str, str], hist: Any) -> None:
+    name = 'kvcache_op_latency_seconds'
+    help_text = "Store call latency"
+    # Each source bucket counts towards the first bound at or above its
+    # upper edge, so exported counts never understate latency
+    counts = [0] * (len(LATENCY_BUCKETS) + 1)
+    idx = 0
+    for upper_ns, n in hist.buckets():
+        while idx < len(LATENCY_BUCKETS) and upper_ns / 1e9 > LATENCY_BUCKETS[idx]:
+            idx += 1
+        counts[idx] += n
+    cumulative = 0
+    for bound, n in zip(LATENCY_BUCKETS + (float('inf'),), counts):
+        cumulative += n
+        families.add(name, 'histogram', help_text, cumulative,
+                     {**labels, 'le': _number(bound)}, suffix='_bucket')
+    families.add(name, 'histogram', help_text, hist.total_ns / 1e9, labels, suffix='_sum')
+    families.add(name, 'histogram', help_text, hist.count, labels, suffix='_count')
+
+
+class MetricsServer:
+    """
+    Background HTTP server exposing ``/metrics``.
+    
+    Extra paths can be served with ``add_route``, e.g. health probes.
+    """
+    
+    def __init__(self,
+                 store: Optional[KVCacheStore],
+                 host: str = "0.0.0.0",
+                 port: int = 9400,
+                 constants: Optional[Dict[str, Tuple[float, str]]] = None):
+        """
+        Initialize the server; call ``start`` to listen.
+        
+        Args:
+            store: The store whose metrics are served. May be None while
+                   the store is still being set up; see ``set_store``
+            host: Address to bind
+            port: Port to bind; 0 picks a free port
+            constants: Extra gauges passed to ``render_metrics``
+        """
+        self._store = store
+        self._constants = dict(constants or {})
+        # Path to handler returning (status, content type, body)
+        self._routes: Dict[str, Callable[[], Tuple[int, str, str]]] = {'/metrics': self._metrics}
+        self._address = (host, port)
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+    
+    def _metrics(self) -> Tuple[int, str, str]:
+        return 200, CONTENT_TYPE, render_metrics(self._store, self._constants)
+    
+    def set_store(self, store: Optional[KVCacheStore]) -> None:
+        """Start (or, with None, stop) serving a store's metrics."""
+        self._store = store
+    
+    def add_route(self, path: str, handler: Callable[[], Tuple[int, str, str]]) -> None:
+        """Serve ``handler()`` -> (status, content type, body) on ``path``."""
+        self._routes[path] = handler
+    
+    @property
+    def port(self) -> int:
+        """The bound port, once started."""
+        return self._httpd.server_address[1] if self._httpd else self._address[1]
+    
+    def start(self) -> None:
+        """Bind and serve in a daemon thread."""
+        routes = self._routes
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                handler = routes.get(self.path.split('?', 1)[0])
+                if handler is None:
+                    status, content_type, body = 404, "text/plain", "not found\n"
+                else:
+                    try:
+                        status, content_type, body = handler()
+                    except Exception as e:
+                        status, content_type, body = 500, "text/plain", f"{e}\n"
+                data = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def log_message(self, format, *args):
+                # Scrapes and probes every few seconds would flood the log
+                pass
+        
+        self._httpd = ThreadingHTTPServer(self._address, Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        name="kvcache-metrics", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop serving and release the port."""
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+        self._httpd = None
+        self._thread = None
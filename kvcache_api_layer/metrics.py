@@ -0,0 +1,423 @@
+"""
+Hot-path instrumentation for the KV Cache API layer.
+
+``InstrumentedStore`` wraps another ``KVCacheStore`` and records per
+operation call counts, errors, misses, bytes moved and latency histograms.
+Latencies go into ``LatencyHistogram``, a fixed-size log-linear histogram in
+the style of HdrHistogram: recording is one index computation and one
+increment, and percentiles are accurate to about 6% at any magnitude.
+
+Instrumentation is opt-in: ``create_store_from_config`` only adds the
+wrapper when ``enable_metrics`` is set, and ``InstrumentedStore.enabled``
+can switch recording off at runtime, leaving one attribute check per call.
+"""
+
+import threading
+import time
+from typing import Union, Optional, Any, List, Dict, Callable
+from .api import KVCacheStore, BatchValue
+
+# Percentiles reported by snapshots
+SNAPSHOT_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+def _nbytes(value: Any) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return memoryview(value).nbytes
+
+
+def _value_nbytes(value: BatchValue) -> int:
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(part) for part in value)
+    return _nbytes(value)
+
+
+class LatencyHistogram:
+    """
+    Log-linear latency histogram over nanoseconds.
+    
+    Each power-of-two range is split into ``2 ** sub_bucket_bits`` equal
+    buckets, so the relative error of a reported value is at most
+    ``2 ** -sub_bucket_bits``. Values above ``max_value_ns`` are clamped
+    into the last bucket. Not thread-safe on its own.
+    """
+    
+    def __init__(self, sub_bucket_bits: int = 4, max_value_ns: int = 1 << 40):
+        """
+        Initialize an empty histogram.
+        
+        Args:
+            sub_bucket_bits: Buckets per power of two, as a power of two
+            max_value_ns: Largest value tracked exactly (default ~18 minutes)
+        """
+        if not 1 <= sub_bucket_bits <= 10:
+            raise ValueError("sub_bucket_bits must be between 1 and 10")
+        self._bits = sub_bucket_bits
+        self._sub = 1 << sub_bucket_bits
+        self._max_index = self._index(max_value_ns)
+        self._counts = [0] * (self._max_index + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = 0
+        self.max_ns = 0
+    
+    def _index(self, value: int) -> int:
+        if value < self._sub:
+            return value
+        shift = value.bit_length() - 1 - self._bits
+        return (shift + 1) * self._sub + (value >> shift) - self._sub
+    
+    def _upper_bound(self, index: int) -> int:
+        """Largest value that falls into bucket ``index``."""
+        if index < self._sub:
+            return index
+        shift = index // self._sub - 1
+        mantissa = index % self._sub + self._sub
+        return ((mantissa + 1) << shift) - 1
+    
+    def record(self, value_ns: int) -> None:
+        """Record one latency in nanoseconds."""
+        if value_ns < 0:
+            value_ns = 0
+        index = self._index(value_ns)
+        self._counts[index if index < self._max_index else self._max_index] += 1
+        if self.count == 0 or value_ns < self.min_ns:
+            self.min_ns = value_ns
+        if value_ns > self.max_ns:
+            self.max_ns = value_ns
+        self.count += 1
+        self.total_ns += value_ns
+    
+    def percentile(self, pct: float) -> int:
+        """
+        Get the latency at a percentile.
+        
+        Args:
+            pct: Percentile between 0 and 100
+            
+        Returns:
+            Upper bound of the bucket holding the percentile, in nanoseconds,
+            capped at the largest recorded value; 0 if nothing was recorded
+        """
+        if self.count == 0:
+            return 0
+        target = max(1, -(-self.count * pct // 100))
+        seen = 0
+        for index, n in enumerate(self._counts):
+            seen += n
+            if seen >= target:
+                return min(self._upper_bound(index), self.max_ns)
+        return self.max_ns
+    
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Add the counts of a histogram with the same layout."""
+        if other._bits != self._bits or len(other._counts) != len(self._counts):
+            raise ValueError("histograms have different layouts")
+        if other.count == 0:
+            return
+        for index, n in enumerate(other._counts):
+            if n:
+                self._counts[index] += n
+        self.min_ns = other.min_ns if self.count == 0 else min(self.min_ns, other.min_ns)
+        self.max_ns = max(self.max_ns, other.max_ns)
+        self.count += other.count
+        self.total_ns += other.total_ns
+    
+    def copy(self) -> "LatencyHistogram":
+        """Get an independent copy."""
+        clone = LatencyHistogram.__new__(LatencyHistogram)
+        clone.__dict__.update(self.__dict__)
+        clone._counts = list(self._counts)
+        return clone
+    
+    def buckets(self) -> List[tuple]:
+        """
+        Get the non-empty buckets.
+        
+        Returns:
+            List of (upper bound in nanoseconds, count), in increasing order
+        """
+        return [(self._upper_bound(index), n) for index, n in enumerate(self._counts) if n]
+
+
+class OpStats:
+    """Counters and latency histogram of one operation."""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.items = 0
+        self.errors = 0
+        self.misses = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latency = LatencyHistogram()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            latency = self.latency.copy()
+            result = {
+                'calls': self.calls,
+                'items': self.items,
+                'errors': self.errors,
+                'misses': self.misses,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+            }
+        result['latency_us'] = {
+            'mean': latency.total_ns / latency.count / 1000 if latency.count else 0.0,
+            'min': latency.min_ns / 1000,
+            'max': latency.max_ns / 1000,
+        }
+        for pct in SNAPSHOT_PERCENTILES:
+            result['latency_us'][f'p{pct:g}'] = latency.percentile(pct) / 1000
+        return result
+
+
+class InstrumentedStore(KVCacheStore):
+    """
+    ``KVCacheStore`` decorator that records per-operation metrics.
+    
+    For each method it counts calls, items (keys in batch calls), errors
+    (non-zero statuses and exceptions), misses (absent keys on reads),
+    bytes written (``bytes_in``) and read (``bytes_out``), and records the
+    call latency. Exceptions are counted and re-raised unchanged.
+    """
+    
+    def __init__(self, store: KVCacheStore, enabled: bool = True):
+        """
+        Wrap a store with instrumentation.
+        
+        Args:
+            store: The store to instrument
+            enabled: Whether to record from the start
+        """
+        self._store = store
+        self.enabled = enabled
+        self._ops: Dict[str, OpStats] = {}
+        self._ops_lock = threading.Lock()
+    
+    # Recording
+    
+    def _stats(self, op: str) -> OpStats:
+        stats = self._ops.get(op)
+        if stats is None:
+            with self._ops_lock:
+                stats = self._ops.setdefault(op, OpStats())
+        return stats
+    
+    def _call(self, op: str, fn: Callable, args: tuple,
+              account: Callable[[Any], tuple], items: int = 1, bytes_in: int = 0) -> Any:
+        """
+        Run ``fn(*args)`` and record it under ``op``.
+        
+        ``account`` maps the result to (errors, misses, bytes_out).
+        """
+        start = time.perf_counter_ns()
+        try:
+            result = fn(*args)
+        except BaseException:
+            elapsed = time.perf_counter_ns() - start
+            stats = self._stats(op)
+            with stats.lock:
+                stats.calls += 1
+                stats.items += items
+                stats.errors += 1
+                stats.latency.record(elapsed)
+            raise
+        elapsed = time.perf_counter_ns() - start
+        errors, misses, bytes_out = account(result)
+        stats = self._stats(op)
+        with stats.lock:
+            stats.calls += 1
+            stats.items += items
+            stats.errors += errors
+            stats.misses += misses
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+            stats.latency.record(elapsed)
+        return result
+    
+    @staticmethod
+    def _status(result: int) -> tuple:
+        return (1 if result != 0 else 0, 0, 0)
+    
+    @staticmethod
+    def _statuses(results: List[int]) -> tuple:
+        return (sum(1 for r in results if r != 0), 0, 0)
+    
+    # KVCacheStore interface
+    
+    def setup(self,
+              local_hostname: str,
+              metadata_server: str,
+              global_segment_size: int,
+              local_buffer_size: int,
+              protocol: str = "tcp",
+              device_name: str = "lo",
+              master_server_address: Optional[str] = None) -> int:
+        """Set up the wrapped store."""
+        return self._store.setup(local_hostname, metadata_server, global_segment_size,
+                                 local_buffer_size, protocol, device_name,
+                                 master_server_address)
+    
+    def put(self, key: str, *values: Union[bytes, bytearray]) -> int:
+        """Store a value and record the call."""
+        if not self.enabled:
+            return self._store.put(key, *values)
+        return self._call('put', self._store.put, (key, *values), self._status,
+                          bytes_in=sum(_nbytes(v) for v in values))
+    
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """Store buffer-protocol slices and record the call."""
+        if not self.enabled:
+            return self._store.put_from(key, *buffers)
+        return self._call('put_from', self._store.put_from, (key, *buffers), self._status,
+                          bytes_in=sum(_nbytes(b) for b in buffers))
+    
+    def put_with_hints(self, key: str, *values: Union[bytes, bytearray],
+                       ttl: Optional[float] = None, priority: int = 0, pin: bool = False) -> int:
+        """Store a value with hints and record the call."""
+        if not self.enabled:
+            return self._store.put_with_hints(key, *values, ttl=ttl, priority=priority, pin=pin)
+        return self._call('put_with_hints',
+                          lambda *args: self._store.put_with_hints(*args, ttl=ttl, priority=priority, pin=pin),
+                          (key, *values), self._status, bytes_in=sum(_nbytes(v) for v in values))
+    
+    def get(self, key: str) -> bytes:
+        """Retrieve a value and record the call; an empty value is a miss."""
+        if not self.enabled:
+            return self._store.get(key)
+        return self._call('get', self._store.get, (key,),
+                          lambda value: (0, 0, len(value)) if value else (0, 1, 0))
+    
+    def get_buffer(self, key: str) -> Optional[Any]:
+        """Get a buffer and record the call; None is a miss."""
+        if not self.enabled:
+            return self._store.get_buffer(key)
+        return self._call('get_buffer', self._store.get_buffer, (key,),
+                          lambda buffer: (0, 1, 0) if buffer is None else (0, 0, _nbytes(buffer)))
+    
+    def get_into(self, key: str, out: Any) -> int:
+        """Read a value into ``out`` and record the call."""
+        if not self.enabled:
+            return self._store.get_into(key, out)
+        return self._call('get_into', self._store.get_into, (key, out),
+                          lambda n: (0, 0, n) if n >= 0 else (0, 1, 0))
+    
+    def get_size(self, key: str) -> int:
+        """Get the size of a value and record the call."""
+        if not self.enabled:
+            return self._store.get_size(key)
+        return self._call('get_size', self._store.get_size, (key,),
+                          lambda n: (0, 0, 0) if n >= 0 else (0, 1, 0))
+    
+    def is_exist(self, key: str) -> int:
+        """Check existence and record the call; 0 is a miss."""
+        if not self.enabled:
+            return self._store.is_exist(key)
+        return self._call('is_exist', self._store.is_exist, (key,),
+                          lambda status: (0, 0, 0) if status == 1 else (0, 1, 0))
+    
+    def remove(self, key: str) -> int:
+        """Remove a key and record the call; a failed remove is a miss."""
+        if not self.enabled:
+            return self._store.remove(key)
+        return self._call('remove', self._store.remove, (key,),
+                          lambda status: (0, 0, 0) if status == 0 else (0, 1, 0))
+    
+    def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """Store multiple values and record the call."""
+        if not self.enabled:
+            return self._store.batch_put(keys, values)
+        return self._call('batch_put', self._store.batch_put, (keys, values), self._statuses,
+                          items=len(keys), bytes_in=sum(_value_nbytes(v) for v in values))
+    
+    def batch_get(self, keys: List[str]) -> List[bytes]:
+        """Retrieve multiple values and record the call."""
+        if not self.enabled:
+            return self._store.batch_get(keys)
+        return self._call('batch_get', self._store.batch_get, (keys,),
+                          lambda values: (0, sum(1 for v in values if not v),
+                                          sum(len(v) for v in values)),
+                          items=len(keys))
+    
+    def batch_get_into(self, keys: List[str], outs: List[Any]) -> List[int]:
+        """Read multiple values into caller buffers and record the call."""
+        if not self.enabled:
+            return self._store.batch_get_into(keys, outs)
+        return self._call('batch_get_into', self._store.batch_get_into, (keys, outs),
+                          lambda results: (0, sum(1 for n in results if n < 0),
+                                           sum(n for n in results if n > 0)),
+                          items=len(keys))
+    
+    def batch_is_exist(self, keys: List[str]) -> List[int]:
+        """Check existence of multiple keys and record the call."""
+        if not self.enabled:
+            return self._store.batch_is_exist(keys)
+        return self._call('batch_is_exist', self._store.batch_is_exist, (keys,),
+                          lambda results: (0, sum(1 for s in results if s != 1), 0),
+                          items=len(keys))
+    
+    def batch_remove(self, keys: List[str]) -> List[int]:
+        """Remove multiple keys and record the call."""
+        if not self.enabled:
+            return self._store.batch_remove(keys)
+        return self._call('batch_remove', self._store.batch_remove, (keys,),
+                          lambda results: (0, sum(1 for s in results if s != 0), 0),
+                          items=len(keys))
+    
+    def register_buffer(self, buffer: Any) -> int:
+        """Register a buffer with the wrapped store."""
+        return self._store.register_buffer(buffer)
+    
+    def unregister_buffer(self, buffer: Any) -> int:
+        """Unregister a buffer from the wrapped store."""
+        return self._store.unregister_buffer(buffer)
+    
+    def close(self) -> int:
+        """Close the wrapped store."""
+        return self._store.close()
+    
+    def put_path_stats(self) -> Dict[str, int]:
+        """Report the wrapped store's put path counters."""
+        return self._store.put_path_stats()
+    
+    # Metrics
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get a consistent copy of the metrics of every operation called so far.
+        
+        Returns:
+            Operation name to a dictionary with calls, items, errors, misses,
+            bytes_in, bytes_out and latency_us (mean, min, max, p50, p90,
+            p99, p99.9 in microseconds)
+        """
+        with self._ops_lock:
+            ops = dict(self._ops)
+        return {op: stats.snapshot() for op, stats in sorted(ops.items())}
+    
+    def histogram(self, op: str) -> Optional[LatencyHistogram]:
+        """
+        Get a copy of an operation's latency histogram.
+        
+        Returns:
+            The histogram, or None if ``op`` was never recorded
+        """
+        stats = self._ops.get(op)
+        if stats is None:
+            return None
+        with stats.lock:
+            return stats.latency.copy()
+    
+    def reset(self) -> None:
+        """Drop all recorded metrics."""
+        with self._ops_lock:
+            self._ops = {}
+    
+    @property
+    def inner_store(self) -> KVCacheStore:
+        """The wrapped store."""
+        return self._store
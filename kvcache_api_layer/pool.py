@@ -0,0 +1,414 @@
+"""
+Pooling of set-up stores for the KV Cache API layer.
+
+Creating a store and running ``setup()`` dials the master and registers
+buffers, which can take hundreds of milliseconds. ``StorePool`` keeps
+set-up stores around so worker threads check out a warm one instead.
+
+``get_store_pool`` returns the process-wide pool for a configuration. Its
+stores are handles on one store set up from the configuration, so the
+process contributes its segment once and all checkouts share one L1
+cache, write-behind queue and in-process backend; ``max_size`` only bounds
+how many are checked out at a time. Use a ``StorePool`` with a factory of
+your own for independent stores.
+"""
+
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from typing import Union, Optional, Any, List, Dict, Callable, Tuple
+from .api import KVCacheStore, BatchValue
+from .config import KVCacheConfig
+from .exceptions import StorageError
+
+_HEALTH_CHECK_KEY = "__kvcache_pool_health__"
+
+
+def default_health_check(store: KVCacheStore) -> bool:
+    """A store is healthy if a cheap existence check answers without error."""
+    try:
+        return store.is_exist(_HEALTH_CHECK_KEY) in (0, 1)
+    except Exception:
+        return False
+
+
+class StorePool:
+    """
+    Thread-safe pool of set-up ``KVCacheStore`` instances.
+    
+    Idle stores are reused most-recently-used first, so the pool keeps its
+    warmest clients and the rest age out after ``max_idle_time``.
+    """
+    
+    def __init__(self,
+                 factory: Callable[[], KVCacheStore],
+                 max_size: int = 8,
+                 max_idle_time: Optional[float] = 300.0,
+                 health_check: Optional[Callable[[KVCacheStore], bool]] = default_health_check,
+                 health_check_interval: float = 30.0):
+        """
+        Initialize the pool.
+        
+        Args:
+            factory: Creates a new store that is already set up, e.g.
+                     ``lambda: create_store_from_config(config)``
+            max_size: Maximum number of stores, idle and checked out
+            max_idle_time: Seconds after which an idle store is closed;
+                           None to keep idle stores forever
+            health_check: Returns False for a broken store, which is then
+                          closed and replaced. None disables checks
+            health_check_interval: Minimum idle seconds before a store is
+                                   checked again on checkout
+        """
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        if max_idle_time is not None and max_idle_time <= 0:
+            raise ValueError("max_idle_time must be positive")
+        
+        self._factory = factory
+        self._max_size = max_size
+        self._max_idle_time = max_idle_time
+        self._health_check = health_check
+        self._health_check_interval = health_check_interval
+        self._cond = threading.Condition()
+        # (store, time it was checked in), most recently used last
+        self._idle: List[Tuple[KVCacheStore, float]] = []
+        self._size = 0
+        self._closed = False
+        
+        self._created = 0
+        self._reused = 0
+        self._evicted = 0
+        self._unhealthy = 0
+    
+    def checkout(self, timeout: Optional[float] = None) -> KVCacheStore:
+        """
+        Take a store from the pool, creating one if none is idle.
+        
+        Args:
+            timeout: Seconds to wait when ``max_size`` stores are checked
+                     out; None waits forever
+            
+        Returns:
+            A set-up store; hand it back with ``checkin``
+            
+        Raises:
+            StorageError: If the pool is closed or no store became
+                          available within ``timeout``
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                expired = self._take_expired_locked()
+            self._close_all(expired)
+            with self._cond:
+                while not self._idle and self._size >= self._max_size:
+                    if self._closed:
+                        raise StorageError("Store pool is closed")
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise StorageError(f"Store pool exhausted ({self._max_size} stores checked out)")
+                    self._cond.wait(remaining)
+                if self._closed:
+                    raise StorageError("Store pool is closed")
+                
+                if self._idle:
+                    store, since = self._idle.pop()
+                else:
+                    # Reserve the slot, then set up outside the lock
+                    self._size += 1
+                    store = None
+            
+            if store is None:
+                try:
+                    store = self._factory()
+                except BaseException:
+                    self._release_slot()
+                    raise
+                with self._cond:
+                    self._created += 1
+                return store
+            
+            idle_for = time.monotonic() - since
+            if (self._health_check is not None and idle_for >= self._health_check_interval
+                    and not self._health_check(store)):
+                with self._cond:
+                    self._unhealthy += 1
+                self._discard(store)
+                continue
+            with self._cond:
+                self._reused += 1
+            return store
+    
+    def checkin(self, store: KVCacheStore, discard: bool = False) -> None:
+        """
+        Return a store to the pool.
+        
+        Args:
+            store: A store obtained from ``checkout``
+            discard: Close the store instead of reusing it, e.g. after an
+                     error that may have left it broken
+        """
+        with self._cond:
+            if not discard and not self._closed:
+                self._idle.append((store, time.monotonic()))
+                self._cond.notify()
+                return
+        self._discard(store)
+    
+    @contextmanager
+    def store(self, timeout: Optional[float] = None):
+        """
+        Check out a store for the duration of a ``with`` block. The store is
+        discarded instead of reused if the block raises a ``StorageError``.
+        """
+        store = self.checkout(timeout)
+        try:
+            yield store
+        except StorageError:
+            self.checkin(store, discard=True)
+            raise
+        except BaseException:
+            self.checkin(store)
+            raise
+        self.checkin(store)
+    
+    def evict_idle(self) -> int:
+        """
+        Close stores idle for longer than ``max_idle_time``.
+        
+        Returns:
+            Number of stores closed
+        """
+        with self._cond:
+            expired = self._take_expired_locked()
+        self._close_all(expired)
+        return len(expired)
+    
+    def _take_expired_locked(self) -> List[KVCacheStore]:
+        """Remove stores idle past ``max_idle_time``; the caller closes them after unlocking."""
+        if self._max_idle_time is None or not self._idle:
+            return []
+        cutoff = time.monotonic() - self._max_idle_time
+        expired = [store for store, since in self._idle if since < cutoff]
+        if not expired:
+            return []
+        self._idle = [(store, since) for store, since in self._idle if since >= cutoff]
+        self._size -= len(expired)
+        self._evicted += len(expired)
+        self._cond.notify(len(expired))
+        return expired
+    
+    def _discard(self, store: KVCacheStore) -> None:
+        self._close_quietly(store)
+        self._release_slot()
+    
+    def _release_slot(self) -> None:
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+    
+    @staticmethod
+    def _close_quietly(store: KVCacheStore) -> None:
+        try:
+            store.close()
+        except Exception:
+            pass
+    
+    @classmethod
+    def _close_all(cls, stores: List[KVCacheStore]) -> None:
+        # Closing may block on the network, so it never runs under ``_cond``
+        for store in stores:
+            cls._close_quietly(store)
+    
+    def close(self) -> None:
+        """Close idle stores; stores still checked out are closed on checkin."""
+        with self._cond:
+            self._closed = True
+            idle = [store for store, _ in self._idle]
+            self._idle = []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        self._close_all(idle)
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get pool counters.
+        
+        Returns:
+            Dictionary with size, idle, checked_out, created, reused,
+            evicted (idle timeouts) and unhealthy (failed health checks)
+        """
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'checked_out': self._size - len(self._idle),
+                'created': self._created,
+                'reused': self._reused,
+                'evicted': self._evicted,
+                'unhealthy': self._unhealthy,
+            }
+
+
+class _SharedClient(KVCacheStore):
+    """
+    Handle on a store shared by a ``get_store_pool`` pool: forwards every
+    call, while ``setup`` and ``close`` leave the shared store alone.
+    """
+    
+    def __init__(self, store: KVCacheStore):
+        self._store = store
+    
+    def setup(self,
+              local_hostname: str,
+              metadata_server: str,
+              global_segment_size: int,
+              local_buffer_size: int,
+              protocol: str = "tcp",
+              device_name: str = "lo",
+              master_server_address: Optional[str] = None) -> int:
+        """The shared store is already set up."""
+        return 0
+    
+    def put(self, key: str, *values: Union[bytes, bytearray]) -> int:
+        """Store a value in the shared store."""
+        return self._store.put(key, *values)
+    
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """Store buffer-protocol slices in the shared store."""
+        return self._store.put_from(key, *buffers)
+    
+    def put_with_hints(self, key: str, *values: Union[bytes, bytearray],
+                       ttl: Optional[float] = None, priority: int = 0, pin: bool = False) -> int:
+        """Store a value with hints in the shared store."""
+        return self._store.put_with_hints(key, *values, ttl=ttl, priority=priority, pin=pin)
+    
+    def get(self, key: str) -> bytes:
+        """Retrieve a value from the shared store."""
+        return self._store.get(key)
+    
+    def get_buffer(self, key: str) -> Optional[Any]:
+        """Get a buffer from the shared store."""
+        return self._store.get_buffer(key)
+    
+    def get_into(self, key: str, out: Any) -> int:
+        """Read a value into ``out`` from the shared store."""
+        return self._store.get_into(key, out)
+    
+    def get_size(self, key: str) -> int:
+        """Get the size of a value from the shared store."""
+        return self._store.get_size(key)
+    
+    def is_exist(self, key: str) -> int:
+        """Check existence in the shared store."""
+        return self._store.is_exist(key)
+    
+    def remove(self, key: str) -> int:
+        """Remove a key from the shared store."""
+        return self._store.remove(key)
+    
+    def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """Store multiple values in the shared store."""
+        return self._store.batch_put(keys, values)
+    
+    def batch_get(self, keys: List[str]) -> List[bytes]:
+        """Retrieve multiple values from the shared store."""
+        return self._store.batch_get(keys)
+    
+    def batch_get_into(self, keys: List[str], outs: List[Any]) -> List[int]:
+        """Read multiple values into caller buffers."""
+        return self._store.batch_get_into(keys, outs)
+    
+    def batch_is_exist(self, keys: List[str]) -> List[int]:
+        """Check existence of multiple keys."""
+        return self._store.batch_is_exist(keys)
+    
+    def batch_remove(self, keys: List[str]) -> List[int]:
+        """Remove multiple keys from the shared store."""
+        return self._store.batch_remove(keys)
+    
+    def register_buffer(self, buffer: Any) -> int:
+        """Register a buffer with the shared store."""
+        return self._store.register_buffer(buffer)
+    
+    def unregister_buffer(self, buffer: Any) -> int:
+        """Unregister a buffer from the shared store."""
+        return self._store.unregister_buffer(buffer)
+    
+    def close(self) -> int:
+        """Release the handle; the pool closes the shared store."""
+        return 0
+    
+    @property
+    def inner_store(self) -> KVCacheStore:
+        """The shared store."""
+        return self._store
+
+
+class _SharedStorePool(StorePool):
+    """``StorePool`` of handles on one store, created on first checkout."""
+    
+    def __init__(self, create: Callable[[], KVCacheStore], **pool_kwargs: Any):
+        self._create = create
+        self._shared: Optional[KVCacheStore] = None
+        self._shared_lock = threading.Lock()
+        super().__init__(self._new_client, **pool_kwargs)
+    
+    def _new_client(self) -> KVCacheStore:
+        with self._shared_lock:
+            if self._shared is None:
+                self._shared = self._create()
+            return _SharedClient(self._shared)
+    
+    def close(self) -> None:
+        """Close the idle handles, then the shared store."""
+        super().close()
+        with self._shared_lock:
+            shared, self._shared = self._shared, None
+        if shared is not None:
+            self._close_quietly(shared)
+
+
+_pools: Dict[str, StorePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_store_pool(config: KVCacheConfig, **pool_kwargs: Any) -> StorePool:
+    """
+    Get the process-wide pool for a configuration, creating it on first use.
+    
+    Configurations with the same contents share one pool. Its stores are
+    handles on a single store created from ``config`` on first checkout:
+    the node's segment is contributed once and checkouts see each other's
+    writes, also with in-process backends and an L1 cache. Closing a
+    handle leaves the shared store open; it is closed with the pool, and
+    a broken shared store is not replaced. ``pool_kwargs`` only apply when
+    the pool is created.
+    
+    Args:
+        config: KVCacheConfig the pooled stores are created from
+        **pool_kwargs: Arguments for ``StorePool`` other than ``factory``
+        
+    Returns:
+        The StorePool for ``config``
+    """
+    key = config.fingerprint()
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            from .utils import create_store_from_config
+            pool = _SharedStorePool(lambda: create_store_from_config(config), **pool_kwargs)
+            _pools[key] = pool
+        return pool
+
+
+@atexit.register
+def close_all_pools() -> None:
+    """Close every process-wide pool."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,568 @@
+"""
+Prefetching for the KV Cache API layer.
+
+A scheduler usually knows which prefixes upcoming requests need well
+before decode starts. ``PrefetchingStore.prefetch`` queues those keys and
+background workers pull them into a local tier (or, with
+``prefetch_into``, into a registered buffer), highest priority first.
+Requests for a key that is already queued or being fetched share the
+existing fetch, and work whose deadline has passed is dropped instead of
+competing with requests that can still make it.
+
+Hit-on-prefetch counters show how much of the prefetched data was read and
+how often a read arrived before its prefetch finished, which is what the
+look-ahead distance should be tuned against.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, wait
+from typing import Union, Optional, Any, List, Dict, Iterable, Callable
+from .api import KVCacheStore, BatchValue
+from .exceptions import StorageError
+
+_QUEUED = 0
+_RUNNING = 1
+
+
+class PrefetchHandle:
+    """
+    Futures of one ``prefetch`` call, one per key.
+    
+    Each future resolves to True once the key is available locally, or to
+    False if it was not found, failed, expired or was cancelled.
+    """
+    
+    def __init__(self, futures: Dict[str, Future]):
+        self.futures = futures
+    
+    def done(self) -> bool:
+        """Whether every key has been resolved."""
+        return all(f.done() for f in self.futures.values())
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for every key.
+        
+        Returns:
+            True if all keys were resolved within ``timeout``
+        """
+        _, not_done = wait(list(self.futures.values()), timeout=timeout)
+        return not not_done
+    
+    def results(self) -> Dict[str, Optional[bool]]:
+        """Key to result, None for keys that are still pending."""
+        return {key: f.result() if f.done() else None for key, f in self.futures.items()}
+
+
+class _Task:
+    __slots__ = ('key', 'out', 'priority', 'deadline', 'future', 'state', 'read_early')
+    
+    def __init__(self, key: str, out: Any, priority: int, deadline: Optional[float]):
+        self.key = key
+        self.out = out
+        self.priority = priority
+        self.deadline = deadline
+        self.future: Future = Future()
+        self.state = _QUEUED
+        # A read arrived before the fetch finished; it is counted as late
+        self.read_early = False
+
+
+class PrefetchingStore(KVCacheStore):
+    """
+    ``KVCacheStore`` decorator with a background prefetch scheduler.
+    
+    With a ``local`` store, prefetched values are copied into it and reads
+    are served from it while it still holds them; local writes and removes
+    invalidate the copy. Without one, prefetching reads through the
+    wrapped store, which warms whatever caching it does itself, e.g. the
+    upper tiers of a ``TieredStore`` or a ``CachingStore``.
+    """
+    
+    def __init__(self,
+                 store: KVCacheStore,
+                 local: Optional[KVCacheStore] = None,
+                 local_setup_overrides: Optional[Dict[str, Any]] = None,
+                 max_workers: int = 4,
+                 max_tracked_keys: int = 65536):
+        """
+        Wrap a store with a prefetcher.
+        
+        Args:
+            store: The store to prefetch from
+            local: Store that prefetched values are copied into, e.g. a
+                   ``LocalStore``; set up together with ``store``
+            local_setup_overrides: ``setup`` arguments that replace the
+                                   shared ones for ``local``, e.g. its
+                                   ``global_segment_size``
+            max_workers: Number of concurrent fetches
+            max_tracked_keys: Prefetched keys remembered for hit counting
+                              and for serving reads from ``local``; the
+                              oldest unread ones beyond this count as
+                              unused
+        """
+        if max_workers <= 0:
+            raise ValueError("max_workers must be positive")
+        if max_tracked_keys <= 0:
+            raise ValueError("max_tracked_keys must be positive")
+        
+        self._store = store
+        self._local = local
+        self._local_setup_overrides = dict(local_setup_overrides or {})
+        self._max_workers = max_workers
+        self._max_tracked_keys = max_tracked_keys
+        
+        self._cond = threading.Condition()
+        # (-priority, deadline, seq, task); entries whose priority no longer
+        # matches their task are stale and skipped
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._inflight: Dict[str, _Task] = {}
+        self._workers: List[threading.Thread] = []
+        self._running = 0
+        self._closed = False
+        # Bumped on every local write; a fetch that overlaps one is not kept
+        self._epoch = 0
+        # Keys held by ``local`` because of a prefetch, oldest first; may
+        # include keys ``local`` evicted since, see ``eviction_handler``
+        self._resident: "OrderedDict[str, None]" = OrderedDict()
+        # Prefetched keys not read yet, oldest first
+        self._unread: "OrderedDict[str, None]" = OrderedDict()
+        
+        self._requested = 0
+        self._deduplicated = 0
+        self._fetched = 0
+        self._expired = 0
+        self._missing = 0
+        self._errors = 0
+        self._hits = 0
+        self._late = 0
+        self._unused = 0
+    
+    # Scheduling
+    
+    def prefetch(self,
+                 keys: Iterable[str],
+                 priority: int = 0,
+                 deadline: Optional[float] = None) -> PrefetchHandle:
+        """
+        Fetch keys in the background.
+        
+        Args:
+            keys: Keys to fetch
+            priority: Higher values are fetched first
+            deadline: ``time.monotonic()`` value after which a key that has
+                      not started fetching is dropped; None for no deadline
+            
+        Returns:
+            A handle with one future per key
+        """
+        keys = list(keys)
+        resident = set()
+        if self._local is not None:
+            with self._cond:
+                candidates = [key for key in keys if key in self._resident]
+            # ``local`` may have evicted them since; ask it outside the lock
+            resident = {key for key in candidates if self._local.is_exist(key) == 1}
+        
+        futures = {}
+        with self._cond:
+            self._check_open()
+            for key in keys:
+                if key in futures:
+                    continue
+                self._requested += 1
+                task = self._inflight.get(key)
+                if task is not None:
+                    self._deduplicated += 1
+                    self._merge(task, priority, deadline)
+                elif key in resident:
+                    # Already prefetched into the local store
+                    self._deduplicated += 1
+                    futures[key] = Future()
+                    futures[key].set_result(True)
+                    continue
+                else:
+                    self._resident.pop(key, None)
+                    task = _Task(key, None, priority, deadline)
+                    self._inflight[key] = task
+                    self._push(task)
+                futures[key] = task.future
+            self._start_workers()
+        return PrefetchHandle(futures)
+    
+    def prefetch_into(self,
+                      key: str,
+                      out: Any,
+                      priority: int = 0,
+                      deadline: Optional[float] = None) -> Future:
+        """
+        Fetch a value into a caller buffer, e.g. one passed to
+        ``register_buffer``, in the background.
+        
+        Args:
+            key: Key to fetch
+            out: Writable buffer large enough for the value
+            priority: Higher values are fetched first
+            deadline: ``time.monotonic()`` value after which the fetch is
+                      dropped if it has not started
+            
+        Returns:
+            Future resolving to the number of bytes written, or a negative
+            value if the key was not found, failed or expired
+        """
+        with self._cond:
+            self._check_open()
+            self._requested += 1
+            task = _Task(key, out, priority, deadline)
+            self._push(task)
+            self._start_workers()
+        return task.future
+    
+    def _check_open(self) -> None:
+        if self._closed:
+            raise StorageError("PrefetchingStore is closed")
+    
+    def _push(self, task: _Task) -> None:
+        deadline = task.deadline if task.deadline is not None else float('inf')
+        heapq.heappush(self._heap, (-task.priority, deadline, next(self._seq), task))
+        self._cond.notify()
+    
+    def _merge(self, task: _Task, priority: int, deadline: Optional[float]) -> None:
+        """Fold a duplicate request into a queued task: highest priority, latest deadline."""
+        if task.state != _QUEUED:
+            return
+        if task.deadline is not None:
+            task.deadline = None if deadline is None else max(task.deadline, deadline)
+        if priority > task.priority:
+            task.priority = priority
+            self._push(task)
+    
+    def _start_workers(self) -> None:
+        while len(self._workers) < self._max_workers:
+            worker = threading.Thread(target=self._run, name="kvcache-prefetch", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+    
+    def _next_task(self) -> Optional[_Task]:
+        with self._cond:
+            while True:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if not self._heap:
+                    return None
+                neg_priority, _, _, task = heapq.heappop(self._heap)
+                if task.state != _QUEUED or -neg_priority != task.priority or task.future.done():
+                    continue
+                if task.deadline is not None and time.monotonic() > task.deadline:
+                    self._expired += 1
+                    self._finish(task, False if task.out is None else -1)
+                    continue
+                task.state = _RUNNING
+                self._running += 1
+                return task
+    
+    def _finish(self, task: _Task, result: Any) -> None:
+        """Resolve a task; called with the lock held."""
+        if task.state == _RUNNING:
+            self._running -= 1
+        if task.out is None and self._inflight.get(task.key) is task:
+            del self._inflight[task.key]
+        if not task.future.done():
+            task.future.set_result(result)
+    
+    def _run(self) -> None:
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            try:
+                if task.out is not None:
+                    result = self._store.get_into(task.key, task.out)
+                    found = result >= 0
+                else:
+                    found = result = self._fetch(task.key)
+            except Exception:
+                with self._cond:
+                    self._errors += 1
+                    self._finish(task, False if task.out is None else -1)
+                continue
+            with self._cond:
+                if found:
+                    self._fetched += 1
+                    if task.out is None and not task.read_early:
+                        self._track_unread(task.key)
+                else:
+                    self._missing += 1
+                self._finish(task, result)
+    
+    def _fetch(self, key: str) -> bool:
+        """Fetch one key; True if it is now available."""
+        with self._cond:
+            epoch = self._epoch
+        if self._local is None:
+            return self._store.get_buffer(key) is not None
+        # A private copy: a zero-copy view of the wrapped store may be
+        # overwritten or evicted while it is copied into ``local``
+        value = self._store.get(key)
+        if not value:
+            return False
+        if self._local.put(key, value) != 0:
+            return False
+        with self._cond:
+            if epoch == self._epoch:
+                self._resident[key] = None
+                self._resident.move_to_end(key)
+                while len(self._resident) > self._max_tracked_keys:
+                    # Reads of the forgotten key go to the wrapped store
+                    self._resident.popitem(last=False)
+                return True
+        # A local write raced with the fetch; the copy may be stale
+        self._local.remove(key)
+        return False
+    
+    def _track_unread(self, key: str) -> None:
+        self._unread[key] = None
+        self._unread.move_to_end(key)
+        while len(self._unread) > self._max_tracked_keys:
+            self._unread.popitem(last=False)
+            self._unused += 1
+    
+    def eviction_handler(self) -> Callable[[str, memoryview], None]:
+        """
+        Eviction callback for ``local`` that forgets evicted keys, e.g. as
+        ``LocalStore(on_evict=...)``. Without it, evicted keys are noticed
+        on the next read or prefetch of the key.
+        """
+        def on_evict(key: str, view: memoryview) -> None:
+            with self._cond:
+                self._resident.pop(key, None)
+                if key in self._unread:
+                    # Evicted before anyone read it
+                    del self._unread[key]
+                    self._unused += 1
+        return on_evict
+    
+    # Read and write paths
+    
+    def _note_read(self, key: str) -> Optional[_Task]:
+        """
+        Count a read for the hit statistics.
+        
+        Returns:
+            The key's prefetch if one is being fetched right now
+        """
+        with self._cond:
+            if key in self._unread:
+                del self._unread[key]
+                self._hits += 1
+                return None
+            task = self._inflight.get(key)
+            if task is not None:
+                self._late += 1
+                task.read_early = True
+                if task.state == _RUNNING:
+                    return task
+            return None
+    
+    def _local_read(self, key: str, fn: Callable[[KVCacheStore], Any]) -> Any:
+        """
+        Serve a read from ``local`` if a prefetch put the key there.
+        
+        Returns:
+            ``fn(local)``, or None if the key must be read from the wrapped
+            store; ``fn`` returns None on a miss
+        """
+        task = self._note_read(key)
+        if self._local is None:
+            return None
+        if task is not None:
+            # Share the fetch already under way instead of starting another
+            task.future.result()
+        if key not in self._resident:
+            return None
+        result = fn(self._local)
+        if result is None:
+            # Evicted from the local store since
+            with self._cond:
+                self._resident.pop(key, None)
+        return result
+    
+    def _invalidate(self, keys: List[str]) -> None:
+        with self._cond:
+            self._epoch += 1
+            dropped = [key for key in keys if key in self._resident]
+            for key in keys:
+                self._resident.pop(key, None)
+                self._unread.pop(key, None)
+        for key in dropped:
+            self._local.remove(key)
+    
+    def _write(self, keys: List[str], fn, *args: Any) -> Any:
+        """
+        Run a write on the wrapped store with the prefetched copies
+        invalidated, both before and after it, so that a prefetch racing
+        with the write cannot keep the value it replaces.
+        """
+        self._invalidate(keys)
+        try:
+            return fn(*args)
+        finally:
+            self._invalidate(keys)
+    
+    # KVCacheStore interface
+    
+    def setup(self,
+              local_hostname: str,
+              metadata_server: str,
+              global_segment_size: int,
+              local_buffer_size: int,
+              protocol: str = "tcp",
+              device_name: str = "lo",
+              master_server_address: Optional[str] = None) -> int:
+        """Set up the wrapped store and the local store."""
+        args = {
+            'local_hostname': local_hostname,
+            'metadata_server': metadata_server,
+            'global_segment_size': global_segment_size,
+            'local_buffer_size': local_buffer_size,
+            'protocol': protocol,
+            'device_name': device_name,
+            'master_server_address': master_server_address,
+        }
+        result = self._store.setup(**args)
+        if result != 0 or self._local is None:
+            return result
+        return self._local.setup(**{**args, **self._local_setup_overrides})
+    
+    def put(self, key: str, *values: Union[bytes, bytearray]) -> int:
+        """Invalidate the prefetched copy and store through."""
+        return self._write([key], self._store.put, key, *values)
+    
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """Invalidate the prefetched copy and store through."""
+        return self._write([key], self._store.put_from, key, *buffers)
+    
+    def get(self, key: str) -> bytes:
+        """Retrieve a value, from the local store if it was prefetched."""
+        value = self._local_read(key, lambda local: local.get(key) or None)
+        return value if value is not None else self._store.get(key)
+    
+    def get_buffer(self, key: str) -> Optional[Any]:
+        """Get a buffer, from the local store if the key was prefetched."""
+        buffer = self._local_read(key, lambda local: local.get_buffer(key))
+        return buffer if buffer is not None else self._store.get_buffer(key)
+    
+    def get_into(self, key: str, out: Any) -> int:
+        """Read a value into ``out``, from the local store if it was prefetched."""
+        def read(local: KVCacheStore) -> Optional[int]:
+            written = local.get_into(key, out)
+            return written if written >= 0 else None
+        
+        written = self._local_read(key, read)
+        return written if written is not None else self._store.get_into(key, out)
+    
+    def get_size(self, key: str) -> int:
+        """Get the size of a value."""
+        if self._local is not None and key in self._resident:
+            size = self._local.get_size(key)
+            if size >= 0:
+                return size
+        return self._store.get_size(key)
+    
+    def is_exist(self, key: str) -> int:
+        """Check existence."""
+        if self._local is not None and key in self._resident and self._local.is_exist(key) == 1:
+            return 1
+        return self._store.is_exist(key)
+    
+    def remove(self, key: str) -> int:
+        """Invalidate the prefetched copy and remove the key."""
+        return self._write([key], self._store.remove, key)
+    
+    def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """Invalidate the prefetched copies and store through in one batch."""
+        return self._write(keys, self._store.batch_put, keys, values)
+    
+    def batch_get(self, keys: List[str]) -> List[bytes]:
+        """Serve prefetched keys locally and fetch the rest in one batch."""
+        results = [self._local_read(key, lambda local, key=key: local.get(key) or None) for key in keys]
+        miss_idx = [i for i, value in enumerate(results) if value is None]
+        if miss_idx:
+            fetched = self._store.batch_get([keys[i] for i in miss_idx])
+            for i, value in zip(miss_idx, fetched):
+                results[i] = value
+        return results
+    
+    def batch_remove(self, keys: List[str]) -> List[int]:
+        """Invalidate the prefetched copies and remove the keys in one batch."""
+        return self._write(keys, self._store.batch_remove, keys)
+    
+    def register_buffer(self, buffer: Any) -> int:
+        """Register a buffer with the wrapped store."""
+        return self._store.register_buffer(buffer)
+    
+    def unregister_buffer(self, buffer: Any) -> int:
+        """Unregister a buffer from the wrapped store."""
+        return self._store.unregister_buffer(buffer)
+    
+    def close(self) -> int:
+        """Drop queued prefetches, wait for running ones, then close both stores."""
+        with self._cond:
+            self._closed = True
+            for _, _, _, task in self._heap:
+                if task.state == _QUEUED:
+                    self._finish(task, False if task.out is None else -1)
+            self._heap = []
+            self._cond.notify_all()
+            workers = list(self._workers)
+        for worker in workers:
+            worker.join()
+        status = 0
+        if self._local is not None:
+            status = self._local.close()
+        result = self._store.close()
+        return status or result
+    
+    # Prefetch management
+    
+    def pending(self) -> int:
+        """Number of prefetches queued or running."""
+        with self._cond:
+            queued = {id(task) for _, _, _, task in self._heap if task.state == _QUEUED}
+            return len(queued) + self._running
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get prefetch counters.
+        
+        Returns:
+            Dictionary with requested, deduplicated (requests folded into
+            an earlier one), fetched, expired (dropped at their deadline),
+            missing, errors, hits (first reads of a prefetched key), late
+            (reads that arrived before their prefetch finished), unused
+            (prefetched keys forgotten unread) and hit_ratio (hits per
+            fetched key)
+        """
+        with self._cond:
+            return {
+                'requested': self._requested,
+                'deduplicated': self._deduplicated,
+                'fetched': self._fetched,
+                'expired': self._expired,
+                'missing': self._missing,
+                'errors': self._errors,
+                'hits': self._hits,
+                'late': self._late,
+                'unused': self._unused,
+                'hit_ratio': self._hits / self._fetched if self._fetched else 0.0,
+            }
+    
+    @property
+    def inner_store(self) -> KVCacheStore:
+        """The wrapped store."""
+        return self._store
@@ -0,0 +1,146 @@
+"""
+Prefix-aware keys for token-block KV caches.
+
+A prompt is split into fixed-size blocks of token ids. Each block's hash is
+chained with the hash of the block before it, so a block key identifies the
+whole prefix up to and including that block. Two prompts that share their
+first N blocks therefore share their first N keys, and the cached part of a
+prompt is always a prefix of its key list.
+"""
+
+import hashlib
+import struct
+from typing import Optional, List, Sequence
+from .api import KVCacheStore
+
+
+class PrefixKeyBuilder:
+    """Turns token-id sequences into chained block hashes and store keys."""
+    
+    def __init__(self,
+                 block_size: int = 16,
+                 namespace: str = "kv",
+                 digest_size: int = 16):
+        """
+        Initialize the key builder.
+        
+        Args:
+            block_size: Number of tokens per block
+            namespace: Prefix for every key, e.g. the model name, so that
+                       caches of different models never collide
+            digest_size: Size of each block hash in bytes (1-64)
+            
+        Raises:
+            ValueError: If block_size or digest_size is out of range
+        """
+        if block_size <= 0:
+            raise ValueError("block_size must be positive")
+        if not 1 <= digest_size <= 64:
+            raise ValueError("digest_size must be between 1 and 64")
+        
+        self.block_size = block_size
+        self.namespace = namespace
+        self.digest_size = digest_size
+        # Root of the hash chain depends on the namespace and block size so
+        # that changing either never reuses stale keys
+        self._root = hashlib.blake2b(f"{namespace}:{block_size}".encode(),
+                                     digest_size=digest_size).digest()
+    
+    def block_hashes(self, tokens: Sequence[int], parent: Optional[bytes] = None) -> List[bytes]:
+        """
+        Compute chained hashes for every full block of ``tokens``.
+        
+        A trailing partial block is ignored because its KV entries are not
+        complete yet.
+        
+        Args:
+            tokens: Token ids
+            parent: Hash of the block preceding ``tokens``, to continue an
+                    existing chain. Defaults to the root of the chain
+            
+        Returns:
+            One hash per full block
+        """
+        prev = parent if parent is not None else self._root
+        n_blocks = len(tokens) // self.block_size
+        pack = struct.Struct(f"<{self.block_size}q").pack
+        hashes = []
+        for i in range(n_blocks):
+            block = tokens[i * self.block_size:(i + 1) * self.block_size]
+            h = hashlib.blake2b(prev, digest_size=self.digest_size)
+            h.update(pack(*block))
+            prev = h.digest()
+            hashes.append(prev)
+        return hashes
+    
+    def key_for_hash(self, block_hash: bytes) -> str:
+        """
+        Build a store key from a block hash.
+        
+        Args:
+            block_hash: A hash returned by ``block_hashes``
+            
+        Returns:
+            The store key
+        """
+        return f"{self.namespace}/{block_hash.hex()}"
+    
+    def block_keys(self, tokens: Sequence[int]) -> List[str]:
+        """
+        Compute store keys for every full block of ``tokens``.
+        
+        Args:
+            tokens: Token ids
+            
+        Returns:
+            One key per full block, in prompt order
+        """
+        return [self.key_for_hash(h) for h in self.block_hashes(tokens)]
+
+
+def longest_cached_prefix(store: KVCacheStore,
+                          builder: PrefixKeyBuilder,
+                          tokens: Sequence[int],
+                          probe_batch: int = 8) -> int:
+    """
+    Find how many leading tokens of a prompt are already cached.
+    
+    Since the cached blocks of a prompt form a prefix of its key list, the
+    boundary is found by binary search. Each step checks ``probe_batch``
+    evenly spaced keys with one ``batch_is_exist`` call, so a prompt of B
+    blocks needs about log(B) / log(probe_batch + 1) round trips instead of
+    B single ``is_exist`` calls.
+    
+    Args:
+        store: The store to query
+        builder: The key builder used when the blocks were stored
+        tokens: Token ids of the prompt
+        probe_batch: Number of keys checked per round trip
+        
+    Returns:
+        Number of leading tokens covered by cached blocks (a multiple of
+        ``builder.block_size``)
+    """
+    if probe_batch <= 0:
+        raise ValueError("probe_batch must be positive")
+    
+    keys = builder.block_keys(tokens)
+    # Invariant: blocks [0, lo) are cached, blocks [hi, len) are not known
+    # to be; the answer lies in [lo, hi]
+    lo, hi = 0, len(keys)
+    while lo < hi:
+        span = hi - lo
+        step = max(1, span // (probe_batch + 1))
+        probes = list(range(lo + step - 1, hi, step))[:probe_batch]
+        exists = store.batch_is_exist([keys[i] for i in probes])
+        
+        new_lo, new_hi = lo, hi
+        for idx, status in zip(probes, exists):
+            if status == 1:
+                new_lo = idx + 1
+            else:
+                new_hi = idx
+                break
+        lo, hi = new_lo, new_hi
+    
+    return lo * builder.block_size
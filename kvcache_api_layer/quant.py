@@ -0,0 +1,293 @@
+"""
+Quantized KV value encoding for the KV Cache API layer.
+
+FP16/FP32 KV tensors are stored as INT8 or FP8 (E4M3) with float32 scales,
+halving or quartering their footprint. Quantization is vectorized with NumPy
+and runs on the CPU only.
+
+A quantized value is written with the multi-part ``put(key, *values)`` as
+three parts::
+
+    header | scales (float32) | payload (1 byte per element)
+    
+where the header records the quantization type, scale granularity, original
+dtype and shape, so ``get_quantized`` can rebuild the tensor on its own.
+"""
+
+import struct
+from typing import Optional, Any, Dict, Tuple
+from .api import KVCacheStore
+from .exceptions import StorageError, BackendNotFoundError
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+MAGIC = b"KVQ1"
+# magic | qtype | granularity | source dtype | ndim | axis | block size
+HEADER = struct.Struct("<4sBBBBiI")
+
+QTYPES = {"int8": 1, "fp8_e4m3": 2}
+GRANULARITIES = {"channel": 0, "block": 1}
+_SOURCE_DTYPES = ("float16", "float32")
+
+_INT8_MAX = 127.0
+_E4M3_MAX = 448.0
+
+_e4m3_table = None
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise BackendNotFoundError("NumPy is required for quantized KV encoding")
+
+
+def _e4m3_positive_values():
+    """Values of the 127 non-negative, non-NaN FP8 E4M3 codes, ascending."""
+    global _e4m3_table
+    if _e4m3_table is None:
+        codes = np.arange(127, dtype=np.uint8)
+        exp = (codes >> 3).astype(np.int32)
+        mant = (codes & 0x7).astype(np.float32)
+        subnormal = mant / 8.0 * 2.0 ** -6
+        normal = (1.0 + mant / 8.0) * np.exp2(exp - 7).astype(np.float32)
+        _e4m3_table = np.where(exp == 0, subnormal, normal).astype(np.float32)
+    return _e4m3_table
+
+
+def _encode_e4m3(x: "np.ndarray") -> "np.ndarray":
+    """Round float32 values (already within +-448) to the nearest E4M3 code."""
+    table = _e4m3_positive_values()
+    mag = np.abs(x)
+    hi = np.clip(np.searchsorted(table, mag), 1, len(table) - 1)
+    lo = hi - 1
+    # Pick whichever neighbour is closer
+    codes = np.where(mag - table[lo] <= table[hi] - mag, lo, hi).astype(np.uint8)
+    return codes | (np.signbit(x).astype(np.uint8) << 7)
+
+
+def _decode_e4m3(codes: "np.ndarray") -> "np.ndarray":
+    table = _e4m3_positive_values()
+    mag = table[codes & 0x7F]
+    return np.where(codes & 0x80, -mag, mag)
+
+
+def _scale_shape(array: "np.ndarray", granularity: str, axis: int, block_size: int):
+    """Return the array reshaped for scaling and the reduction axes."""
+    if granularity == "channel":
+        reduce_axes = tuple(i for i in range(array.ndim) if i != axis)
+        return array, reduce_axes
+    flat = array.reshape(-1)
+    pad = (-flat.size) % block_size
+    if pad:
+        flat = np.concatenate([flat, np.zeros(pad, dtype=flat.dtype)])
+    return flat.reshape(-1, block_size), (1,)
+
+
+def quantize(array: Any,
+             qtype: str = "int8",
+             granularity: str = "channel",
+             axis: int = -1,
+             block_size: int = 128) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Quantize a float tensor.
+    
+    Args:
+        array: float16 or float32 array
+        qtype: ``int8`` or ``fp8_e4m3``
+        granularity: ``channel`` for one scale per index along ``axis``, or
+                     ``block`` for one scale per ``block_size`` consecutive
+                     elements of the flattened tensor
+        axis: Channel axis for ``channel`` granularity
+        block_size: Elements per scale for ``block`` granularity
+        
+    Returns:
+        (payload, scales): payload has one byte per element in the original
+        shape (int8 or uint8 FP8 codes); scales are float32
+        
+    Raises:
+        ValueError: If an option is not supported
+    """
+    _require_numpy()
+    if qtype not in QTYPES:
+        raise ValueError(f"qtype must be one of: {', '.join(QTYPES)}")
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    if block_size <= 0:
+        raise ValueError("block_size must be positive")
+    
+    array = np.asarray(array)
+    if array.dtype.name not in _SOURCE_DTYPES:
+        raise ValueError(f"array dtype must be one of: {', '.join(_SOURCE_DTYPES)}")
+    axis = axis % max(array.ndim, 1)
+    
+    x = array.astype(np.float32)
+    shaped, reduce_axes = _scale_shape(x, granularity, axis, block_size)
+    qmax = _INT8_MAX if qtype == "int8" else _E4M3_MAX
+    amax = np.max(np.abs(shaped), axis=reduce_axes, keepdims=True)
+    scales = np.where(amax > 0, amax / qmax, 1.0).astype(np.float32)
+    scaled = shaped / scales
+    
+    if qtype == "int8":
+        q = np.clip(np.rint(scaled), -_INT8_MAX, _INT8_MAX).astype(np.int8)
+    else:
+        q = _encode_e4m3(np.clip(scaled, -_E4M3_MAX, _E4M3_MAX))
+    
+    payload = q.reshape(-1)[:array.size].reshape(array.shape)
+    return payload, scales.reshape(-1)
+
+
+def dequantize(payload: "np.ndarray",
+               scales: "np.ndarray",
+               qtype: str = "int8",
+               granularity: str = "channel",
+               axis: int = -1,
+               block_size: int = 128,
+               dtype: str = "float16") -> "np.ndarray":
+    """
+    Reverse ``quantize``.
+    
+    Args:
+        payload: Quantized payload as returned by ``quantize``
+        scales: Scales as returned by ``quantize``
+        qtype, granularity, axis, block_size: Same options as for ``quantize``
+        dtype: Output dtype
+        
+    Returns:
+        The reconstructed tensor
+    """
+    _require_numpy()
+    if qtype == "int8":
+        values = payload.astype(np.float32)
+    else:
+        values = _decode_e4m3(payload.astype(np.uint8, copy=False))
+    
+    if granularity == "channel":
+        axis = axis % max(payload.ndim, 1)
+        shape = [1] * payload.ndim
+        shape[axis] = -1
+        out = values * scales.reshape(shape)
+    else:
+        flat = values.reshape(-1)
+        pad = (-flat.size) % block_size
+        if pad:
+            flat = np.concatenate([flat, np.zeros(pad, dtype=flat.dtype)])
+        out = (flat.reshape(-1, block_size) * scales.reshape(-1, 1)).reshape(-1)
+        out = out[:payload.size].reshape(payload.shape)
+    return out.astype(dtype)
+
+
+def put_quantized(store: KVCacheStore,
+                  key: str,
+                  array: Any,
+                  qtype: str = "int8",
+                  granularity: str = "channel",
+                  axis: int = -1,
+                  block_size: int = 128) -> int:
+    """
+    Quantize a tensor and store it as a multi-part value.
+    
+    Args:
+        store: Target store
+        key: The key to store
+        array: float16 or float32 tensor
+        qtype, granularity, axis, block_size: See ``quantize``
+        
+    Returns:
+        0 on success, non-zero error code on failure
+    """
+    payload, scales = quantize(array, qtype, granularity, axis, block_size)
+    ndim = payload.ndim
+    header = HEADER.pack(MAGIC, QTYPES[qtype], GRANULARITIES[granularity],
+                         _SOURCE_DTYPES.index(np.asarray(array).dtype.name), ndim,
+                         axis % max(ndim, 1), block_size)
+    header += struct.pack(f"<{ndim}Q", *payload.shape)
+    return store.put(key, header, scales.tobytes(), np.ascontiguousarray(payload).view(np.uint8).reshape(-1))
+
+
+def get_quantized(store: KVCacheStore, key: str, dtype: Optional[str] = None) -> Optional["np.ndarray"]:
+    """
+    Fetch a value written by ``put_quantized`` and dequantize it.
+    
+    Args:
+        store: Source store
+        key: The key to retrieve
+        dtype: Output dtype; defaults to the dtype that was quantized
+        
+    Returns:
+        The reconstructed tensor, or None if the key was not found
+        
+    Raises:
+        StorageError: If the value is not a quantized tensor
+    """
+    _require_numpy()
+    # Decode from a private copy: a zero-copy ``get_buffer`` view may point
+    # into backend memory that a concurrent overwrite or eviction reuses
+    buffer = store.get(key)
+    if not buffer:
+        return None
+    
+    data = memoryview(buffer).cast("B")
+    if data.nbytes < HEADER.size or data[:4] != MAGIC:
+        raise StorageError(f"Value of key '{key}' is not a quantized tensor")
+    
+    _, qtype_id, gran_id, dtype_id, ndim, axis, block_size = HEADER.unpack(data[:HEADER.size])
+    offset = HEADER.size
+    shape = struct.unpack(f"<{ndim}Q", data[offset:offset + 8 * ndim])
+    offset += 8 * ndim
+    
+    qtype = next(name for name, i in QTYPES.items() if i == qtype_id)
+    granularity = next(name for name, i in GRANULARITIES.items() if i == gran_id)
+    count = 1
+    for dim in shape:
+        count *= dim
+    if granularity == "channel":
+        n_scales = shape[axis] if ndim else 1
+    else:
+        n_scales = -(-count // block_size)
+    
+    scales = np.frombuffer(data, dtype=np.float32, count=n_scales, offset=offset)
+    offset += 4 * n_scales
+    payload_dtype = np.int8 if qtype == "int8" else np.uint8
+    payload = np.frombuffer(data, dtype=payload_dtype, count=count, offset=offset).reshape(shape)
+    
+    return dequantize(payload, scales, qtype, granularity, axis, block_size,
+                      dtype or _SOURCE_DTYPES[dtype_id])
+
+
+def roundtrip_error(array: Any,
+                    qtype: str = "int8",
+                    granularity: str = "channel",
+                    axis: int = -1,
+                    block_size: int = 128) -> Dict[str, float]:
+    """
+    Measure the accuracy of quantizing a tensor.
+    
+    Args:
+        array: float16 or float32 tensor
+        qtype, granularity, axis, block_size: See ``quantize``
+        
+    Returns:
+        Dictionary with max_abs_error, mean_abs_error, rmse, relative_rmse
+        (rmse divided by the tensor's RMS), snr_db and compression_ratio
+        (original bytes over payload plus scale bytes)
+    """
+    _require_numpy()
+    array = np.asarray(array)
+    payload, scales = quantize(array, qtype, granularity, axis, block_size)
+    restored = dequantize(payload, scales, qtype, granularity, axis, block_size, "float32")
+    
+    ref = array.astype(np.float32)
+    err = restored - ref
+    rmse = float(np.sqrt(np.mean(err ** 2)))
+    rms = float(np.sqrt(np.mean(ref ** 2)))
+    return {
+        "max_abs_error": float(np.max(np.abs(err))),
+        "mean_abs_error": float(np.mean(np.abs(err))),
+        "rmse": rmse,
+        "relative_rmse": rmse / rms if rms else 0.0,
+        "snr_db": float(20 * np.log10(rms / rmse)) if rmse else float("inf"),
+        "compression_ratio": array.nbytes / (payload.nbytes + scales.nbytes),
+    }
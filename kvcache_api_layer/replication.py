@@ -0,0 +1,460 @@
+"""
+Replication and hedged reads for the KV Cache API layer.
+
+``ReplicatedStore`` writes every key to R of N stores, chosen by rendezvous
+(highest random weight) hashing, and reads with hedging: the read goes to
+the first replica, and if it has not answered after a delay, a duplicate
+read goes to the next one. Whichever answers first wins; the loser is
+cancelled if it has not started yet, otherwise its result is dropped. A
+single slow node then costs one hedge delay instead of its full latency.
+
+Batch calls group their keys by replica and send one native batch to each
+store. Reads hedge per batch: keys still unanswered after the delay, or
+answered with a miss, are sent as a batch to their next replicas.
+"""
+
+import hashlib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Union, Optional, Any, List, Dict, Callable, Iterable, Tuple
+from .api import KVCacheStore, BatchValue, copy_into
+
+
+def _weight(name: str, key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{name}\0{key}".encode(), digest_size=8).digest(), "little")
+
+
+class ReplicatedStore(KVCacheStore):
+    """``KVCacheStore`` that replicates keys over several stores and hedges reads."""
+    
+    def __init__(self,
+                 stores: Optional[Dict[str, KVCacheStore]] = None,
+                 replicas: int = 2,
+                 write_quorum: Optional[int] = None,
+                 hedge_delay: float = 0.005,
+                 hedge_percentile: Optional[float] = None,
+                 max_workers: Optional[int] = None):
+        """
+        Initialize the replicated store.
+        
+        Args:
+            stores: Placement name to store. Names decide placement, so they
+                    must stay stable across restarts
+            replicas: Number of stores each key is written to
+            write_quorum: Replica writes that must succeed for ``put`` to
+                          return 0. Defaults to ``replicas``
+            hedge_delay: Seconds to wait for a replica before hedging to the
+                         next one; also the floor of the adaptive delay
+            hedge_percentile: If set (e.g. 95), hedge after this percentile
+                              of recent first-replica read latencies instead
+                              of after a fixed delay
+            max_workers: Threads for replica calls. Defaults to four per
+                         store
+        """
+        if replicas <= 0:
+            raise ValueError("replicas must be positive")
+        if write_quorum is not None and not 1 <= write_quorum <= replicas:
+            raise ValueError("write_quorum must be between 1 and replicas")
+        if hedge_delay < 0:
+            raise ValueError("hedge_delay must not be negative")
+        if hedge_percentile is not None and not 0 < hedge_percentile < 100:
+            raise ValueError("hedge_percentile must be between 0 and 100")
+        
+        self._stores: Dict[str, KVCacheStore] = {}
+        self._setup_overrides: Dict[str, Dict[str, Any]] = {}
+        self._replicas = replicas
+        self._write_quorum = write_quorum or replicas
+        self._hedge_delay = hedge_delay
+        self._hedge_percentile = hedge_percentile
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        
+        # Recent first-replica latencies for the adaptive hedge delay
+        self._latencies: deque = deque(maxlen=1024)
+        self._current_delay = hedge_delay
+        self._samples_since_update = 0
+        
+        self._reads = 0
+        self._hedges_fired = 0
+        self._hedge_wins = 0
+        self._write_failures = 0
+        for name, store in (stores or {}).items():
+            self.add_store(name, store)
+    
+    def add_store(self, name: str, store: KVCacheStore, setup_overrides: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Add a placement.
+        
+        Args:
+            name: Unique placement name
+            store: The store
+            setup_overrides: ``setup`` arguments that replace the shared
+                             ones for this store
+        """
+        with self._lock:
+            if name in self._stores:
+                raise ValueError(f"Store '{name}' already exists")
+            self._stores[name] = store
+            self._setup_overrides[name] = dict(setup_overrides or {})
+    
+    def placements(self, key: str) -> List[str]:
+        """Names of the stores holding ``key``, preferred replica first."""
+        names = sorted(self._stores, key=lambda name: _weight(name, key), reverse=True)
+        return names[:self._replicas]
+    
+    def setup(self,
+              local_hostname: str,
+              metadata_server: str,
+              global_segment_size: int,
+              local_buffer_size: int,
+              protocol: str = "tcp",
+              device_name: str = "lo",
+              master_server_address: Optional[str] = None) -> int:
+        """
+        Set up every store, applying each store's ``setup_overrides``.
+        
+        Returns:
+            0 on success, or the first non-zero code returned by a store
+        """
+        if len(self._stores) < self._replicas:
+            raise ValueError(f"ReplicatedStore needs at least {self._replicas} stores")
+        
+        args = {
+            'local_hostname': local_hostname,
+            'metadata_server': metadata_server,
+            'global_segment_size': global_segment_size,
+            'local_buffer_size': local_buffer_size,
+            'protocol': protocol,
+            'device_name': device_name,
+            'master_server_address': master_server_address,
+        }
+        for name, store in self._stores.items():
+            result = store.setup(**{**args, **self._setup_overrides[name]})
+            if result != 0:
+                return result
+        return 0
+    
+    # Internals
+    
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self._max_workers or 4 * max(1, len(self._stores)),
+                        thread_name_prefix="kvcache-replica")
+        return self._executor
+    
+    def _record_latency(self, seconds: float) -> None:
+        if self._hedge_percentile is None:
+            return
+        with self._lock:
+            self._latencies.append(seconds)
+            self._samples_since_update += 1
+            # Re-sorting on every read would cost more than it saves
+            if self._samples_since_update >= 64 and len(self._latencies) >= 32:
+                ordered = sorted(self._latencies)
+                idx = min(len(ordered) - 1, int(len(ordered) * self._hedge_percentile / 100))
+                self._current_delay = max(self._hedge_delay, ordered[idx])
+                self._samples_since_update = 0
+    
+    def _hedged(self, key: str, fn: Callable[[KVCacheStore], Any], hit: Callable[[Any], bool]) -> Any:
+        """
+        Run a read on the key's replicas with hedging.
+        
+        Returns:
+            The first result for which ``hit`` holds, or the last miss
+        """
+        stores = [self._stores[name] for name in self.placements(key)]
+        pool = self._pool()
+        start = time.perf_counter()
+        
+        def timed_primary(store):
+            result = fn(store)
+            self._record_latency(time.perf_counter() - start)
+            return result
+        
+        pending: Dict[Future, int] = {pool.submit(timed_primary, stores[0]): 0}
+        next_replica = 1
+        hedged = False
+        miss = None
+        try:
+            while pending:
+                timeout = self._current_delay if next_replica < len(stores) else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    # Slow replica: hedge to the next one
+                    pending[pool.submit(fn, stores[next_replica])] = next_replica
+                    next_replica += 1
+                    hedged = True
+                    with self._lock:
+                        self._hedges_fired += 1
+                    continue
+                for future in done:
+                    replica = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception:
+                        result = None
+                    if result is not None and hit(result):
+                        if hedged and replica > 0:
+                            with self._lock:
+                                self._hedge_wins += 1
+                        return result
+                    miss = result
+                # A replica answered with a miss: ask the next one at once
+                if not pending and next_replica < len(stores):
+                    pending[pool.submit(fn, stores[next_replica])] = next_replica
+                    next_replica += 1
+            return miss
+        finally:
+            for future in pending:
+                future.cancel()
+            with self._lock:
+                self._reads += 1
+    
+    def _hedged_batch(self, keys: List[str],
+                      fn: Callable[[KVCacheStore, List[str]], List[Any]],
+                      hit: Callable[[Any], bool]) -> List[Any]:
+        """
+        Run a batch read on the keys' replicas with hedging.
+        
+        Returns:
+            One result per key: the first for which ``hit`` holds, the last
+            miss, or None if no replica answered
+        """
+        placements = [self.placements(key) for key in keys]
+        results: List[Any] = [None] * len(keys)
+        resolved = [False] * len(keys)
+        tried = [0] * len(keys)
+        waiting = [0] * len(keys)
+        unresolved = len(keys)
+        pool = self._pool()
+        # future -> (key indices, whether it is a hedge)
+        pending: Dict[Future, Tuple[List[int], bool]] = {}
+        
+        def submit(indices: Iterable[int], hedge: bool) -> int:
+            groups: Dict[str, List[int]] = {}
+            for i in indices:
+                if resolved[i] or tried[i] >= len(placements[i]):
+                    continue
+                groups.setdefault(placements[i][tried[i]], []).append(i)
+                tried[i] += 1
+                waiting[i] += 1
+            for name, idx in groups.items():
+                future = pool.submit(fn, self._stores[name], [keys[i] for i in idx])
+                pending[future] = (idx, hedge)
+            return sum(len(idx) for idx in groups.values())
+        
+        submit(range(len(keys)), False)
+        try:
+            while pending and unresolved:
+                can_hedge = any(not resolved[i] and tried[i] < len(placements[i])
+                                for idx, _ in pending.values() for i in idx)
+                done, _ = wait(pending, timeout=self._current_delay if can_hedge else None,
+                               return_when=FIRST_COMPLETED)
+                if not done:
+                    # Slow batches: hedge their unanswered keys to the next replicas
+                    slow = [i for idx, _ in list(pending.values()) for i in idx]
+                    fired = submit(slow, True)
+                    with self._lock:
+                        self._hedges_fired += fired
+                    continue
+                misses = []
+                for future in done:
+                    idx, hedge = pending.pop(future)
+                    try:
+                        batch = future.result()
+                    except Exception:
+                        batch = [None] * len(idx)
+                    for i, result in zip(idx, batch):
+                        waiting[i] -= 1
+                        if resolved[i]:
+                            continue
+                        if result is not None and hit(result):
+                            results[i] = result
+                            resolved[i] = True
+                            unresolved -= 1
+                            if hedge:
+                                with self._lock:
+                                    self._hedge_wins += 1
+                            continue
+                        if result is not None:
+                            results[i] = result
+                        if not waiting[i]:
+                            misses.append(i)
+                # Keys that missed everywhere they were asked go to the next replica at once
+                submit(misses, False)
+            return results
+        finally:
+            for future in pending:
+                future.cancel()
+            with self._lock:
+                self._reads += len(keys)
+    
+    def _on_replicas(self, key: str, fn: Callable[[KVCacheStore], int]) -> List[int]:
+        """Run a write on all of the key's replicas in parallel."""
+        pool = self._pool()
+        futures = [pool.submit(fn, self._stores[name]) for name in self.placements(key)]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception:
+                results.append(-1)
+        return results
+    
+    def _on_batch_replicas(self, keys: List[str],
+                           fn: Callable[[KVCacheStore, List[int]], List[int]]) -> List[List[int]]:
+        """
+        Run a batch write on the keys' replicas, one batch per store, in parallel.
+        
+        Returns:
+            The replica results of each key
+        """
+        groups: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            for name in self.placements(key):
+                groups.setdefault(name, []).append(i)
+        pool = self._pool()
+        futures = {pool.submit(fn, self._stores[name], idx): idx for name, idx in groups.items()}
+        results: List[List[int]] = [[] for _ in keys]
+        for future, idx in futures.items():
+            try:
+                batch = future.result()
+            except Exception:
+                batch = [-1] * len(idx)
+            for i, result in zip(idx, batch):
+                results[i].append(result)
+        return results
+    
+    def _quorum(self, results: List[int]) -> int:
+        """Apply the write quorum to one key's replica results."""
+        failures = [r for r in results if r != 0]
+        if failures:
+            with self._lock:
+                self._write_failures += len(failures)
+        if len(results) - len(failures) >= self._write_quorum:
+            return 0
+        return failures[0]
+    
+    # KVCacheStore interface
+    
+    def put(self, key: str, *values: Union[bytes, bytearray]) -> int:
+        """
+        Write a value to all of its replicas in parallel.
+        
+        Returns:
+            0 if at least ``write_quorum`` replicas succeeded, otherwise the
+            first failing status
+        """
+        return self._quorum(self._on_replicas(key, lambda store: store.put(key, *values)))
+    
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """Write buffer-protocol slices to all replicas."""
+        return self._quorum(self._on_replicas(key, lambda store: store.put_from(key, *buffers)))
+    
+    def get(self, key: str) -> bytes:
+        """Retrieve a value with a hedged read."""
+        return self._hedged(key, lambda store: store.get(key), bool) or b""
+    
+    def get_buffer(self, key: str) -> Optional[Any]:
+        """Get a buffer with a hedged read."""
+        return self._hedged(key, lambda store: store.get_buffer(key), lambda b: b is not None)
+    
+    def get_into(self, key: str, out: Any) -> int:
+        """
+        Copy a value into ``out``. Two replicas must not write into the same
+        buffer concurrently, so the hedged read fetches a buffer first.
+        """
+        buffer = self.get_buffer(key)
+        if buffer is None:
+            return -1
+        return copy_into(buffer, out)
+    
+    def get_size(self, key: str) -> int:
+        """Get the size of a value with a hedged read."""
+        size = self._hedged(key, lambda store: store.get_size(key), lambda n: n >= 0)
+        return -1 if size is None else size
+    
+    def is_exist(self, key: str) -> int:
+        """Check existence with a hedged read."""
+        status = self._hedged(key, lambda store: store.is_exist(key), lambda s: s == 1)
+        return 1 if status == 1 else 0
+    
+    def remove(self, key: str) -> int:
+        """Remove a key from all of its replicas; 0 if any replica held it."""
+        results = self._on_replicas(key, lambda store: store.remove(key))
+        return 0 if 0 in results else -1
+    
+    def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """
+        Write values to their replicas with one batch per store.
+        
+        Returns:
+            One status per key: 0 if at least ``write_quorum`` replicas
+            succeeded, otherwise the first failing status
+        """
+        if len(keys) != len(values):
+            raise ValueError("keys and values must have the same length")
+        results = self._on_batch_replicas(
+            keys, lambda store, idx: store.batch_put([keys[i] for i in idx], [values[i] for i in idx]))
+        return [self._quorum(r) for r in results]
+    
+    def batch_get(self, keys: List[str]) -> List[bytes]:
+        """Retrieve values with hedged batch reads."""
+        results = self._hedged_batch(keys, lambda store, ks: store.batch_get(ks), bool)
+        return [r or b"" for r in results]
+    
+    def batch_get_into(self, keys: List[str], outs: List[Any]) -> List[int]:
+        """
+        Copy values into ``outs``. Two replicas must not write into the same
+        buffer concurrently, so the hedged batch read fetches values first.
+        """
+        if len(keys) != len(outs):
+            raise ValueError("keys and outs must have the same length")
+        return [copy_into(data, out) if data else -1 for data, out in zip(self.batch_get(keys), outs)]
+    
+    def batch_is_exist(self, keys: List[str]) -> List[int]:
+        """Check existence with hedged batch reads."""
+        results = self._hedged_batch(keys, lambda store, ks: store.batch_is_exist(ks), lambda s: s == 1)
+        return [1 if r == 1 else 0 for r in results]
+    
+    def batch_remove(self, keys: List[str]) -> List[int]:
+        """Remove keys from their replicas with one batch per store; 0 if any replica held a key."""
+        results = self._on_batch_replicas(
+            keys, lambda store, idx: store.batch_remove([keys[i] for i in idx]))
+        return [0 if 0 in r else -1 for r in results]
+    
+    def close(self) -> int:
+        """Close every store."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        status = 0
+        for store in self._stores.values():
+            result = store.close()
+            status = status or result
+        return status
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hedging and replication counters.
+        
+        Returns:
+            Dictionary with reads, hedges_fired, hedge_wins, hedge_rate
+            (hedges per read), hedge_delay_ms (current delay) and
+            write_failures
+        """
+        with self._lock:
+            return {
+                'reads': self._reads,
+                'hedges_fired': self._hedges_fired,
+                'hedge_wins': self._hedge_wins,
+                'hedge_rate': self._hedges_fired / self._reads if self._reads else 0.0,
+                'hedge_delay_ms': self._current_delay * 1000,
+                'write_failures': self._write_failures,
+            }
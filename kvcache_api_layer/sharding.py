@@ -0,0 +1,301 @@
+"""
+Client-side sharding for the KV Cache API layer.
+
+``ShardedStore`` spreads keys over several independent stores, e.g. Mooncake
+clusters with their own masters, using a consistent-hash ring with virtual
+nodes. Adding or removing one of N shards moves only about 1/N of the keys.
+"""
+
+import bisect
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, Optional, Any, List, Dict, Callable
+from .api import KVCacheStore, BatchValue
+
+
+def _hash64(data: bytes) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+class _Ring:
+    """Immutable consistent-hash ring; replaced as a whole on membership changes."""
+    
+    def __init__(self, names: List[str], vnodes: int):
+        points = sorted((_hash64(f"{name}#{i}".encode()), name)
+                        for name in names for i in range(vnodes))
+        self.hashes = [h for h, _ in points]
+        self.names = [name for _, name in points]
+    
+    def lookup(self, key: str) -> str:
+        idx = bisect.bisect(self.hashes, _hash64(key.encode()))
+        return self.names[idx % len(self.names)]
+
+
+class ShardedStore(KVCacheStore):
+    """
+    ``KVCacheStore`` that routes each key to one of several shards.
+    
+    Single-key calls go straight to the owning shard. Batch calls are split
+    per shard, issued in parallel and merged back in the caller's order.
+    """
+    
+    def __init__(self,
+                 shards: Optional[Dict[str, KVCacheStore]] = None,
+                 vnodes: int = 160,
+                 max_workers: Optional[int] = None):
+        """
+        Initialize the sharded store.
+        
+        Args:
+            shards: Shard name to store. Names, not positions, place the
+                    shard on the ring, so they must stay stable across
+                    restarts
+            vnodes: Virtual nodes per shard; more gives a more even split
+            max_workers: Threads for parallel batch calls. Defaults to the
+                         number of shards at the first batch call
+        """
+        if vnodes <= 0:
+            raise ValueError("vnodes must be positive")
+        if max_workers is not None and max_workers <= 0:
+            raise ValueError("max_workers must be positive")
+        
+        self._vnodes = vnodes
+        self._max_workers = max_workers
+        self._shards: Dict[str, KVCacheStore] = {}
+        self._setup_overrides: Dict[str, Dict[str, Any]] = {}
+        self._ring: Optional[_Ring] = None
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        for name, store in (shards or {}).items():
+            self.add_shard(name, store)
+    
+    @property
+    def shards(self) -> Dict[str, KVCacheStore]:
+        """Shard name to store."""
+        return dict(self._shards)
+    
+    def add_shard(self, name: str, store: KVCacheStore, setup_overrides: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Add a shard; about 1/N of the keys move to it.
+        
+        Args:
+            name: Unique shard name
+            store: The shard's store
+            setup_overrides: ``setup`` arguments that replace the shared
+                             ones for this shard, e.g. its own
+                             ``master_server_address``
+        """
+        with self._lock:
+            if name in self._shards:
+                raise ValueError(f"Shard '{name}' already exists")
+            self._shards[name] = store
+            self._setup_overrides[name] = dict(setup_overrides or {})
+            self._ring = _Ring(list(self._shards), self._vnodes)
+    
+    def remove_shard(self, name: str) -> KVCacheStore:
+        """
+        Remove a shard; only its keys move to other shards. The store is
+        returned without being closed.
+        """
+        with self._lock:
+            store = self._shards.pop(name)
+            del self._setup_overrides[name]
+            self._ring = _Ring(list(self._shards), self._vnodes) if self._shards else None
+        return store
+    
+    def shard_for(self, key: str) -> str:
+        """Name of the shard owning ``key``."""
+        ring = self._ring
+        if ring is None:
+            raise ValueError("ShardedStore has no shards")
+        return ring.lookup(key)
+    
+    def _store_for(self, key: str) -> KVCacheStore:
+        return self._shards[self.shard_for(key)]
+    
+    def setup(self,
+              local_hostname: str,
+              metadata_server: str,
+              global_segment_size: int,
+              local_buffer_size: int,
+              protocol: str = "tcp",
+              device_name: str = "lo",
+              master_server_address: Optional[str] = None) -> int:
+        """
+        Set up every shard, applying each shard's ``setup_overrides``.
+        
+        Returns:
+            0 on success, or the first non-zero code returned by a shard
+        """
+        if not self._shards:
+            raise ValueError("ShardedStore has no shards")
+        
+        args = {
+            'local_hostname': local_hostname,
+            'metadata_server': metadata_server,
+            'global_segment_size': global_segment_size,
+            'local_buffer_size': local_buffer_size,
+            'protocol': protocol,
+            'device_name': device_name,
+            'master_server_address': master_server_address,
+        }
+        for name, store in self._shards.items():
+            result = store.setup(**{**args, **self._setup_overrides[name]})
+            if result != 0:
+                return result
+        return 0
+    
+    # Batch fan-out
+    
+    def _group(self, keys: List[str]) -> Dict[str, List[int]]:
+        """Indices of ``keys`` grouped by owning shard."""
+        ring = self._ring
+        if ring is None:
+            raise ValueError("ShardedStore has no shards")
+        groups: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            groups.setdefault(ring.lookup(key), []).append(i)
+        return groups
+    
+    def _fan_out(self, keys: List[str], call: Callable[[KVCacheStore, List[int]], List[Any]]) -> List[Any]:
+        """Run ``call(store, indices)`` per shard in parallel and merge in key order."""
+        groups = self._group(keys)
+        results: List[Any] = [None] * len(keys)
+        if len(groups) == 1:
+            name, indices = next(iter(groups.items()))
+            for i, value in zip(indices, call(self._shards[name], indices)):
+                results[i] = value
+            return results
+        
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self._max_workers or max(1, len(self._shards)),
+                        thread_name_prefix="kvcache-shard")
+        futures = [(indices, self._executor.submit(call, self._shards[name], indices))
+                   for name, indices in groups.items()]
+        for indices, future in futures:
+            for i, value in zip(indices, future.result()):
+                results[i] = value
+        return results
+    
+    # KVCacheStore interface
+    
+    def put(self, key: str, *values: Union[bytes, bytearray]) -> int:
+        """Store a value on its shard."""
+        return self._store_for(key).put(key, *values)
+    
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """Store buffer-protocol slices on the key's shard."""
+        return self._store_for(key).put_from(key, *buffers)
+    
+    def get(self, key: str) -> bytes:
+        """Retrieve a value from its shard."""
+        return self._store_for(key).get(key)
+    
+    def get_buffer(self, key: str) -> Optional[Any]:
+        """Get a buffer from the key's shard."""
+        return self._store_for(key).get_buffer(key)
+    
+    def get_into(self, key: str, out: Any) -> int:
+        """Copy a value from its shard into ``out``."""
+        return self._store_for(key).get_into(key, out)
+    
+    def get_size(self, key: str) -> int:
+        """Get the size of a value from its shard."""
+        return self._store_for(key).get_size(key)
+    
+    def is_exist(self, key: str) -> int:
+        """Check existence on the key's shard."""
+        return self._store_for(key).is_exist(key)
+    
+    def remove(self, key: str) -> int:
+        """Remove a key from its shard."""
+        return self._store_for(key).remove(key)
+    
+    def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """Store multiple values with one parallel batch call per shard."""
+        if len(keys) != len(values):
+            raise ValueError("keys and values must have the same length")
+        return self._fan_out(keys, lambda store, idx: store.batch_put([keys[i] for i in idx],
+                                                                      [values[i] for i in idx]))
+    
+    def batch_get(self, keys: List[str]) -> List[bytes]:
+        """Retrieve multiple values with one parallel batch call per shard."""
+        return self._fan_out(keys, lambda store, idx: store.batch_get([keys[i] for i in idx]))
+    
+    def batch_get_into(self, keys: List[str], outs: List[Any]) -> List[int]:
+        """Copy multiple values into caller buffers, one batch call per shard."""
+        if len(keys) != len(outs):
+            raise ValueError("keys and outs must have the same length")
+        return self._fan_out(keys, lambda store, idx: store.batch_get_into([keys[i] for i in idx],
+                                                                           [outs[i] for i in idx]))
+    
+    def batch_is_exist(self, keys: List[str]) -> List[int]:
+        """Check existence of multiple keys, one batch call per shard."""
+        return self._fan_out(keys, lambda store, idx: store.batch_is_exist([keys[i] for i in idx]))
+    
+    def batch_remove(self, keys: List[str]) -> List[int]:
+        """Remove multiple keys, one batch call per shard."""
+        return self._fan_out(keys, lambda store, idx: store.batch_remove([keys[i] for i in idx]))
+    
+    def register_buffer(self, buffer: Any) -> int:
+        """Register a buffer with every shard."""
+        status = 0
+        for store in self._shards.values():
+            result = store.register_buffer(buffer)
+            status = status or result
+        return status
+    
+    def unregister_buffer(self, buffer: Any) -> int:
+        """Unregister a buffer from every shard."""
+        status = 0
+        for store in self._shards.values():
+            result = store.unregister_buffer(buffer)
+            status = status or result
+        return status
+    
+    def close(self) -> int:
+        """Close every shard."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        status = 0
+        for store in self._shards.values():
+            result = store.close()
+            status = status or result
+        return status
+
+
+def build_sharded_store(spec, replication=None) -> KVCacheStore:
+    """
+    Create a store over the shards of a ``ShardingSpec`` with ``create_store``.
+    
+    Args:
+        spec: ShardingSpec from ``KVCacheConfig.sharding``
+        replication: ReplicationSpec from ``KVCacheConfig.replication``. If
+                     set, keys are replicated over the shards with hedged
+                     reads instead of living on exactly one shard
+        
+    Returns:
+        A ShardedStore (or ReplicatedStore) that still needs ``setup``
+    """
+    from .backends import BackendType, create_store
+    
+    if replication is not None:
+        from .replication import ReplicatedStore
+        store = ReplicatedStore(replicas=replication.replicas,
+                                write_quorum=replication.write_quorum,
+                                hedge_delay=replication.hedge_delay_ms / 1000,
+                                hedge_percentile=replication.hedge_percentile)
+        add = store.add_store
+    else:
+        store = ShardedStore(vnodes=spec.vnodes)
+        add = store.add_shard
+    
+    for shard in spec.shards:
+        add(shard.name, create_store(BackendType(shard.backend), **shard.options), shard.setup_overrides)
+    return store
@@ -0,0 +1,241 @@
+"""
+Streaming of large values for the KV Cache API layer.
+
+A single transfer is staged through ``local_buffer_size`` bytes, so values
+of a gigabyte or more are stored as fixed-size chunks under a manifest key.
+``put_stream`` writes the chunks and then the manifest, so a reader never
+sees a partial value. ``get_stream`` yields the chunks as memoryviews while
+the next ones are already being fetched. Both keep at most
+``max_in_flight + 1`` chunks in memory, however large the value is.
+
+Chunk keys embed a random generation, so overwriting a stream never mixes
+chunks of the old and new value; the old chunks are removed after the new
+manifest is written.
+"""
+
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional, Any, List, Iterable, Iterator, Tuple
+from .api import KVCacheStore, copy_bytes
+from .exceptions import KeyNotFoundError, StorageError
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_IN_FLIGHT = 4
+
+# magic, total size, chunk size, chunk count, generation
+_MANIFEST = struct.Struct("<8sQQQ16s")
+_MAGIC = b"KVSTREAM"
+
+
+def chunk_key(key: str, generation: str, index: int) -> str:
+    """Key of one chunk of a stream."""
+    return f"{key}#{generation}#{index}"
+
+
+def _read_manifest(store: KVCacheStore, key: str) -> Tuple[Optional[tuple], bytes]:
+    """
+    Read the value under ``key``.
+    
+    Returns:
+        (total size, chunk size, chunk count, generation) if it is a stream
+        manifest, else None; and the raw value
+    """
+    value = store.get(key)
+    if len(value) != _MANIFEST.size or not value.startswith(_MAGIC):
+        return None, value
+    _, total, chunk_size, count, generation = _MANIFEST.unpack(value)
+    return (total, chunk_size, count, generation.decode()), value
+
+
+def _chunk_keys(key: str, manifest: tuple) -> List[str]:
+    _, _, count, generation = manifest
+    return [chunk_key(key, generation, i) for i in range(count)]
+
+
+def put_stream(store: KVCacheStore,
+               key: str,
+               buffers: Iterable[Any],
+               chunk_size: int = DEFAULT_CHUNK_SIZE,
+               max_in_flight: int = DEFAULT_MAX_IN_FLIGHT) -> int:
+    """
+    Store a value given as an iterable of buffers of any sizes.
+    
+    The buffers are re-cut into ``chunk_size`` chunks and up to
+    ``max_in_flight`` chunk writes run concurrently. Each buffer is copied
+    before the next one is requested, so the iterable may reuse it.
+    
+    Args:
+        store: The store to write to
+        key: The stream key
+        buffers: Buffer-protocol objects making up the value, in order
+        chunk_size: Size of each chunk; at most the backend's
+                    ``local_buffer_size``
+        max_in_flight: Number of concurrent chunk writes
+        
+    Returns:
+        0 on success, otherwise the first failing chunk's status. On
+        failure the chunks written so far are removed and the previous
+        value, if any, is left in place
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if max_in_flight <= 0:
+        raise ValueError("max_in_flight must be positive")
+    
+    generation = os.urandom(8).hex()
+    arena = bytearray(chunk_size * (max_in_flight + 1))
+    slots = [memoryview(arena)[i * chunk_size:(i + 1) * chunk_size] for i in range(max_in_flight + 1)]
+    store.register_buffer(arena)
+    
+    pending: List[Future] = []
+    written = 0
+    total = 0
+    status = 0
+    executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="kvcache-stream")
+    completed = False
+    
+    def submit(fill: int) -> None:
+        nonlocal written
+        if len(pending) >= max_in_flight:
+            # The slot about to be reused must have been written out
+            wait_oldest()
+        slot = slots[written % len(slots)]
+        pending.append(executor.submit(store.put_from, chunk_key(key, generation, written), slot[:fill]))
+        written += 1
+    
+    def wait_oldest() -> None:
+        nonlocal status
+        try:
+            result = pending.pop(0).result()
+        except Exception:
+            result = -1
+        if result != 0 and status == 0:
+            status = result
+    
+    try:
+        fill = 0
+        for buffer in buffers:
+            view = memoryview(buffer).cast('B')
+            offset = 0
+            while offset < view.nbytes and status == 0:
+                n = min(chunk_size - fill, view.nbytes - offset)
+                copy_bytes(slots[written % len(slots)][fill:fill + n], view[offset:offset + n])
+                fill += n
+                offset += n
+                total += n
+                if fill == chunk_size:
+                    submit(fill)
+                    fill = 0
+            if status != 0:
+                break
+        if fill and status == 0:
+            submit(fill)
+        while pending:
+            wait_oldest()
+        completed = True
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        store.unregister_buffer(arena)
+        if not completed:
+            # The iterable raised: drop the chunks that reached the store
+            # once no write is in flight, then let the exception propagate
+            try:
+                store.batch_remove([chunk_key(key, generation, i) for i in range(written)])
+            except Exception:
+                pass
+    
+    if status != 0:
+        store.batch_remove([chunk_key(key, generation, i) for i in range(written)])
+        return status
+    
+    old, _ = _read_manifest(store, key)
+    status = store.put(key, _MANIFEST.pack(_MAGIC, total, chunk_size, written, generation.encode()))
+    if status != 0:
+        store.batch_remove([chunk_key(key, generation, i) for i in range(written)])
+        return status
+    if old is not None:
+        store.batch_remove(_chunk_keys(key, old))
+    return 0
+
+
+def get_stream(store: KVCacheStore,
+               key: str,
+               max_in_flight: int = DEFAULT_MAX_IN_FLIGHT) -> Iterator[memoryview]:
+    """
+    Read a value chunk by chunk with ``max_in_flight`` chunk fetches ahead.
+    
+    Each yielded memoryview is only valid until the next one is requested;
+    copy it to keep it. A key written with plain ``put`` is yielded as one
+    chunk.
+    
+    Args:
+        store: The store to read from
+        key: The stream key
+        max_in_flight: Number of chunks fetched ahead of the consumer
+        
+    Yields:
+        Read-only memoryviews of consecutive chunks
+        
+    Raises:
+        KeyNotFoundError: If the key does not exist
+        StorageError: If a chunk is missing or has the wrong size, e.g.
+                      because the stream was overwritten while being read
+    """
+    if max_in_flight <= 0:
+        raise ValueError("max_in_flight must be positive")
+    
+    manifest, value = _read_manifest(store, key)
+    if manifest is None:
+        if not value:
+            raise KeyNotFoundError(f"Key not found: {key}")
+        yield memoryview(value)
+        return
+    
+    total, chunk_size, count, _ = manifest
+    keys = _chunk_keys(key, manifest)
+    slot_count = min(count, max_in_flight + 1)
+    arena = bytearray(chunk_size * slot_count)
+    slots = [memoryview(arena)[i * chunk_size:(i + 1) * chunk_size] for i in range(slot_count)]
+    store.register_buffer(arena)
+    executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="kvcache-stream")
+    futures: List[Future] = []
+    
+    def expected(index: int) -> int:
+        return chunk_size if index < count - 1 else total - chunk_size * (count - 1)
+    
+    try:
+        for i in range(min(count, max_in_flight)):
+            futures.append(executor.submit(store.get_into, keys[i], slots[i % slot_count]))
+        for i in range(count):
+            ahead = i + max_in_flight
+            if ahead < count:
+                # Reuses the slot of chunk i - 1, which the consumer is done with
+                futures.append(executor.submit(store.get_into, keys[ahead], slots[ahead % slot_count]))
+            n = futures[i].result()
+            futures[i] = None
+            if n != expected(i):
+                raise StorageError(f"Chunk {i} of stream '{key}' is missing or truncated")
+            yield slots[i % slot_count][:n].toreadonly()
+    finally:
+        for future in futures:
+            if future is not None:
+                future.cancel()
+        executor.shutdown(wait=True)
+        store.unregister_buffer(arena)
+
+
+def remove_stream(store: KVCacheStore, key: str) -> int:
+    """
+    Remove a stream's manifest and chunks, or a plain value.
+    
+    Returns:
+        0 on success, -1 if the key does not exist
+    """
+    manifest, _ = _read_manifest(store, key)
+    status = store.remove(key)
+    if manifest is not None:
+        store.batch_remove(_chunk_keys(key, manifest))
+    return status
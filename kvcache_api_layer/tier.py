@@ -0,0 +1,553 @@
+"""
+Tiered store orchestration for the KV Cache API layer.
+
+``TieredStore`` composes several stores, fastest first, e.g. process-local
+memory, node-shared memory, remote Mooncake and local disk. Reads walk the
+tiers top-down and promote a value into every tier above it once it has
+been hit there repeatedly (``promote_after`` hits). Writes go to the
+top tier and reach the lower tiers either synchronously (``write_through``)
+or from background writers (``write_back``). Values evicted from a
+``LocalStore`` tier are demoted into the tier below.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from typing import Union, Optional, Any, List, Dict, Callable
+from .api import KVCacheStore
+from .exceptions import KVCacheError
+
+WRITE_THROUGH = "write_through"
+WRITE_BACK = "write_back"
+# Keys with fewer than ``promote_after`` hits in a lower tier that are tracked
+_PROMOTION_CANDIDATES = 65536
+
+
+class Tier:
+    """One level of a ``TieredStore`` together with its counters."""
+    
+    def __init__(self, name: str, store: KVCacheStore, setup_overrides: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            name: Name used in stats
+            store: The store backing this tier
+            setup_overrides: ``setup`` arguments that replace the shared
+                             ones for this tier, e.g. a smaller
+                             ``global_segment_size`` for a process-local tier
+        """
+        self.name = name
+        self.store = store
+        self.setup_overrides = dict(setup_overrides or {})
+        self.hits = 0
+        self.misses = 0
+        self.latency_ns = 0
+        self.lookups = 0
+        self.writer: Optional[ThreadPoolExecutor] = None
+
+
+class TieredStore(KVCacheStore):
+    """
+    ``KVCacheStore`` over an ordered list of tiers.
+    
+    Each lower tier has a single background writer, so write-back puts and
+    removes reach it in the order they were issued. ``flush()`` waits for
+    all of them. While a write of a key is under way or queued for a lower
+    tier, the lower tiers may still hold an older value, so reads of that
+    key are served from the top tier only and nothing is promoted.
+    """
+    
+    def __init__(self,
+                 tiers: Optional[List[Tier]] = None,
+                 mode: str = WRITE_THROUGH,
+                 promote: bool = True,
+                 promote_after: int = 2):
+        """
+        Initialize the tiered store.
+        
+        Args:
+            tiers: Tiers ordered from fastest to slowest; more can be added
+                   with ``add_tier`` before ``setup``
+            mode: ``write_through`` to write every tier before ``put``
+                  returns, or ``write_back`` to write the top tier and fill
+                  the others in the background
+            promote: Copy values found in a lower tier into the tiers above
+            promote_after: Lower-tier hits a key needs before it is
+                           promoted, so that a single scan does not flush
+                           the upper tiers; 1 promotes on every hit
+        """
+        if mode not in (WRITE_THROUGH, WRITE_BACK):
+            raise ValueError(f"mode must be one of: {WRITE_THROUGH}, {WRITE_BACK}")
+        if promote_after < 1:
+            raise ValueError("promote_after must be at least 1")
+        
+        self._tiers: List[Tier] = []
+        self._mode = mode
+        self._promote = promote
+        self._promote_after = promote_after
+        # Lower-tier hit counts of keys not yet promoted, oldest first
+        self._candidates: "OrderedDict[str, int]" = OrderedDict()
+        self._stats_lock = threading.Lock()
+        self._pending: "set[Future]" = set()
+        # Writes under way or queued per key, see ``_tiers_for``
+        self._pending_keys: Dict[str, int] = {}
+        self._promotions = 0
+        self._demotions = 0
+        self._write_errors = 0
+        for tier in tiers or []:
+            self.add_tier(tier.name, tier.store, tier.setup_overrides)
+    
+    @property
+    def tiers(self) -> List[Tier]:
+        """The tiers, fastest first."""
+        return list(self._tiers)
+    
+    def add_tier(self, name: str, store: KVCacheStore, setup_overrides: Optional[Dict[str, Any]] = None) -> Tier:
+        """Append a tier below the existing ones."""
+        tier = Tier(name, store, setup_overrides)
+        if self._tiers:
+            tier.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"kvcache-tier-{name}")
+        self._tiers.append(tier)
+        return tier
+    
+    def demotion_handler(self, index: int) -> Callable[[str, memoryview], None]:
+        """
+        Eviction callback for tier ``index`` that demotes the evicted value
+        into the tier below, e.g. as ``LocalStore(on_evict=...)``.
+        """
+        def on_evict(key: str, view: memoryview) -> None:
+            if index + 1 >= len(self._tiers):
+                return
+            # Under write-through the lower tiers already hold the value
+            if self._mode == WRITE_THROUGH:
+                return
+            data = bytes(view)
+            self._submit(index + 1, key, lambda store: store.put(key, data))
+            with self._stats_lock:
+                self._demotions += 1
+        return on_evict
+    
+    def setup(self,
+              local_hostname: str,
+              metadata_server: str,
+              global_segment_size: int,
+              local_buffer_size: int,
+              protocol: str = "tcp",
+              device_name: str = "lo",
+              master_server_address: Optional[str] = None) -> int:
+        """
+        Set up every tier, applying each tier's ``setup_overrides``.
+        
+        Returns:
+            0 on success, or the first non-zero code returned by a tier
+        """
+        if not self._tiers:
+            raise ValueError("TieredStore needs at least one tier")
+        
+        args = {
+            'local_hostname': local_hostname,
+            'metadata_server': metadata_server,
+            'global_segment_size': global_segment_size,
+            'local_buffer_size': local_buffer_size,
+            'protocol': protocol,
+            'device_name': device_name,
+            'master_server_address': master_server_address,
+        }
+        for tier in self._tiers:
+            result = tier.store.setup(**{**args, **tier.setup_overrides})
+            if result != 0:
+                return result
+        return 0
+    
+    # Internals
+    
+    def _begin_write(self, key: str) -> None:
+        with self._stats_lock:
+            self._pending_keys[key] = self._pending_keys.get(key, 0) + 1
+    
+    def _end_write(self, key: str) -> None:
+        with self._stats_lock:
+            self._pending_keys[key] -= 1
+            if not self._pending_keys[key]:
+                del self._pending_keys[key]
+    
+    @contextmanager
+    def _writing(self, key: str):
+        """Mark ``key`` as being written for the duration of a ``with`` block."""
+        self._begin_write(key)
+        try:
+            yield
+        finally:
+            self._end_write(key)
+    
+    def _submit(self, index: int, key: str, fn: Callable[[KVCacheStore], int]) -> None:
+        """Run ``fn(store)``, a write of ``key``, on a lower tier's background writer."""
+        tier = self._tiers[index]
+        
+        def run():
+            try:
+                if fn(tier.store) != 0:
+                    raise KVCacheError(f"write to tier '{tier.name}' failed")
+            except Exception:
+                with self._stats_lock:
+                    self._write_errors += 1
+            finally:
+                self._end_write(key)
+        
+        self._begin_write(key)
+        future = tier.writer.submit(run)
+        with self._stats_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._finished)
+    
+    def _finished(self, future: Future) -> None:
+        with self._stats_lock:
+            self._pending.discard(future)
+    
+    def _lower(self, key: str, fn: Callable[[KVCacheStore], int]) -> int:
+        """Apply a write of ``key`` to every tier below the top, per the write mode."""
+        status = 0
+        for index in range(1, len(self._tiers)):
+            if self._mode == WRITE_BACK:
+                self._submit(index, key, fn)
+                continue
+            try:
+                result = fn(self._tiers[index].store)
+            except KVCacheError:
+                result = -1
+            if result != 0:
+                with self._stats_lock:
+                    self._write_errors += 1
+                status = status or result
+        return status
+    
+    def _timed(self, tier: Tier, fn: Callable[[KVCacheStore], Any], hit: Callable[[Any], bool]) -> Any:
+        start = time.perf_counter_ns()
+        result = fn(tier.store)
+        elapsed = time.perf_counter_ns() - start
+        with self._stats_lock:
+            tier.lookups += 1
+            tier.latency_ns += elapsed
+            if hit(result):
+                tier.hits += 1
+            else:
+                tier.misses += 1
+        return result
+    
+    def _should_promote(self, index: int, key: str) -> bool:
+        """Count a hit in tier ``index``; True once the key is due for promotion."""
+        if not self._promote or index == 0:
+            return False
+        if self._promote_after == 1:
+            return True
+        with self._stats_lock:
+            hits = self._candidates.pop(key, 0) + 1
+            if hits >= self._promote_after:
+                return True
+            self._candidates[key] = hits
+            if len(self._candidates) > _PROMOTION_CANDIDATES:
+                self._candidates.popitem(last=False)
+        return False
+    
+    def _promote_to(self, index: int, key: str, data: Any) -> None:
+        """Copy a value found in tier ``index`` into the tiers above it."""
+        with self._stats_lock:
+            if key in self._pending_keys:
+                # A write started since the lookup; the value may be stale
+                return
+        for tier in self._tiers[:index]:
+            try:
+                tier.store.put(key, data)
+            except KVCacheError:
+                continue
+        with self._stats_lock:
+            self._promotions += 1
+    
+    def _tiers_for(self, key: str) -> List[Tier]:
+        """
+        Tiers that may serve a read of ``key``: only the top one while a
+        background write of the key is queued, as the lower tiers may still
+        hold the value it replaces or removes.
+        """
+        with self._stats_lock:
+            pending = key in self._pending_keys
+        return self._tiers[:1] if pending else self._tiers
+    
+    def _pending_among(self, keys: List[str]) -> "set[str]":
+        """The keys that only the top tier may serve, see ``_tiers_for``."""
+        with self._stats_lock:
+            if not self._pending_keys:
+                return set()
+            return {key for key in keys if key in self._pending_keys}
+    
+    def _lookup(self, key: str, fn: Callable[[KVCacheStore], Any], hit: Callable[[Any], bool]):
+        """Return (tier index, result) of the first tier serving ``key`` where ``hit`` holds."""
+        for index, tier in enumerate(self._tiers_for(key)):
+            result = self._timed(tier, fn, hit)
+            if hit(result):
+                return index, result
+        return -1, None
+    
+    # KVCacheStore interface
+    
+    def put(self, key: str, *values: Union[bytes, bytearray]) -> int:
+        """
+        Store a value in the top tier and, per the write mode, below it.
+        
+        Returns:
+            The top tier's status; under write-through also non-zero if any
+            lower tier failed
+        """
+        with self._writing(key):
+            status = self._tiers[0].store.put(key, *values)
+            if status != 0 or len(self._tiers) == 1:
+                return status
+            # Background writers must not see the caller's buffers change
+            data = values if self._mode == WRITE_THROUGH else tuple(bytes(v) for v in values)
+            return self._lower(key, lambda store: store.put(key, *data))
+    
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """Store buffer-protocol slices, zero-copy into the top tier where supported."""
+        with self._writing(key):
+            status = self._tiers[0].store.put_from(key, *buffers)
+            if status != 0 or len(self._tiers) == 1:
+                return status
+            data = buffers if self._mode == WRITE_THROUGH else tuple(bytes(b) for b in buffers)
+            return self._lower(key, lambda store: store.put_from(key, *data))
+    
+    def get(self, key: str) -> bytes:
+        """Retrieve a value from the first tier holding it, promoting it upward."""
+        index, data = self._lookup(key, lambda store: store.get(key), bool)
+        if index < 0:
+            return b""
+        if self._should_promote(index, key):
+            self._promote_to(index, key, data)
+        return data
+    
+    def get_buffer(self, key: str) -> Optional[Any]:
+        """Get a buffer from the first tier holding the key, promoting it upward."""
+        index, buffer = self._lookup(key, lambda store: store.get_buffer(key), lambda b: b is not None)
+        if index < 0:
+            return None
+        if self._should_promote(index, key):
+            self._promote_to(index, key, bytes(buffer))
+        return buffer
+    
+    def get_into(self, key: str, out: Any) -> int:
+        """
+        Copy a value into ``out`` from the first tier holding it.
+        
+        Returns:
+            Number of bytes written, -1 if no tier holds the key, or -2 if
+            the first tier holding it has a value larger than ``out``
+        """
+        index, written = self._lookup(key, lambda store: store.get_into(key, out), lambda n: n >= 0 or n == -2)
+        if index < 0:
+            return -1
+        if written == -2:
+            return -2
+        if self._should_promote(index, key):
+            self._promote_to(index, key, bytes(memoryview(out).cast('B')[:written]))
+        return written
+    
+    def get_size(self, key: str) -> int:
+        """Get the size of a value from the first tier holding it, or -1."""
+        for tier in self._tiers_for(key):
+            size = tier.store.get_size(key)
+            if size >= 0:
+                return size
+        return -1
+    
+    def is_exist(self, key: str) -> int:
+        """Return 1 if any tier holds the key, 0 if not."""
+        for tier in self._tiers_for(key):
+            if tier.store.is_exist(key) == 1:
+                return 1
+        return 0
+    
+    def remove(self, key: str) -> int:
+        """
+        Remove a key from every tier.
+        
+        Returns:
+            0 if the top tier (or, under write-through, any tier) held the
+            key, -1 otherwise
+        """
+        with self._writing(key):
+            status = self._tiers[0].store.remove(key)
+            if self._mode == WRITE_BACK:
+                def remove_quietly(store: KVCacheStore) -> int:
+                    # A tier that never received the key is not a write error
+                    store.remove(key)
+                    return 0
+                self._lower(key, remove_quietly)
+                return status
+            for tier in self._tiers[1:]:
+                if tier.store.remove(key) == 0:
+                    status = 0
+            return status
+    
+    def batch_get(self, keys: List[str]) -> List[bytes]:
+        """Retrieve multiple values, asking each tier only for keys still missing."""
+        results: List[bytes] = [b""] * len(keys)
+        missing = list(range(len(keys)))
+        pending = self._pending_among(keys)
+        for index, tier in enumerate(self._tiers):
+            if index == 1 and pending:
+                missing = [i for i in missing if keys[i] not in pending]
+            if not missing:
+                break
+            start = time.perf_counter_ns()
+            values = tier.store.batch_get([keys[i] for i in missing])
+            elapsed = time.perf_counter_ns() - start
+            
+            still_missing = []
+            for i, value in zip(missing, values):
+                if value:
+                    results[i] = value
+                    if self._should_promote(index, keys[i]):
+                        self._promote_to(index, keys[i], value)
+                else:
+                    still_missing.append(i)
+            with self._stats_lock:
+                tier.lookups += len(missing)
+                tier.latency_ns += elapsed
+                tier.hits += len(missing) - len(still_missing)
+                tier.misses += len(still_missing)
+            missing = still_missing
+        return results
+    
+    def batch_is_exist(self, keys: List[str]) -> List[int]:
+        """Check existence of multiple keys across the tiers."""
+        results = [0] * len(keys)
+        missing = list(range(len(keys)))
+        pending = self._pending_among(keys)
+        for index, tier in enumerate(self._tiers):
+            if index == 1 and pending:
+                missing = [i for i in missing if keys[i] not in pending]
+            if not missing:
+                break
+            found = tier.store.batch_is_exist([keys[i] for i in missing])
+            still_missing = []
+            for i, status in zip(missing, found):
+                if status == 1:
+                    results[i] = 1
+                else:
+                    still_missing.append(i)
+            missing = still_missing
+        return results
+    
+    def demote(self, keys: List[str], tier: str) -> List[int]:
+        """
+        Move values from the named tier into the tier below it.
+        
+        Args:
+            keys: Keys to move
+            tier: Name of the tier to demote from
+            
+        Returns:
+            List of status codes, -1 for keys the tier does not hold
+        """
+        index = next((i for i, t in enumerate(self._tiers) if t.name == tier), None)
+        if index is None:
+            raise ValueError(f"Unknown tier: {tier}")
+        if index + 1 >= len(self._tiers):
+            raise ValueError(f"Tier '{tier}' is the lowest tier")
+        
+        upper = self._tiers[index].store
+        lower = self._tiers[index + 1].store
+        results = []
+        for key in keys:
+            data = upper.get(key)
+            if not data:
+                results.append(-1)
+                continue
+            status = lower.put(key, data)
+            if status == 0:
+                upper.remove(key)
+                with self._stats_lock:
+                    self._demotions += 1
+            results.append(status)
+        return results
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for background writes to the lower tiers.
+        
+        Returns:
+            True if all pending writes finished within ``timeout``
+        """
+        with self._stats_lock:
+            pending = list(self._pending)
+        _, not_done = wait(pending, timeout=timeout)
+        return not not_done
+    
+    def close(self) -> int:
+        """Drain background writes, then close every tier."""
+        self.flush()
+        status = 0
+        for tier in self._tiers:
+            if tier.writer is not None:
+                tier.writer.shutdown(wait=True)
+            result = tier.store.close()
+            status = status or result
+        return status
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get per-tier and orchestration counters.
+        
+        Returns:
+            Dictionary with ``tiers`` (per tier: hits, misses, hit_ratio,
+            avg_latency_us) plus promotions, demotions, pending_writes and
+            write_errors
+        """
+        with self._stats_lock:
+            tiers = {}
+            for tier in self._tiers:
+                tiers[tier.name] = {
+                    'hits': tier.hits,
+                    'misses': tier.misses,
+                    'hit_ratio': tier.hits / tier.lookups if tier.lookups else 0.0,
+                    'avg_latency_us': tier.latency_ns / tier.lookups / 1000 if tier.lookups else 0.0,
+                }
+            return {
+                'tiers': tiers,
+                'promotions': self._promotions,
+                'demotions': self._demotions,
+                'pending_writes': len(self._pending),
+                'write_errors': self._write_errors,
+            }
+
+
+def build_tiered_store(spec, sharding=None, replication=None) -> TieredStore:
+    """
+    Create a ``TieredStore`` from a ``TieringSpec`` with ``create_store``.
+    
+    ``local`` tiers get a demotion handler as their ``on_evict`` callback
+    unless the spec sets one.
+    
+    Args:
+        spec: TieringSpec from ``KVCacheConfig.tiering``
+        sharding: ShardingSpec from ``KVCacheConfig.sharding``, used by
+                  ``sharded`` tiers
+        replication: ReplicationSpec from ``KVCacheConfig.replication``
+        
+    Returns:
+        A TieredStore that still needs ``setup``
+    """
+    from .backends import BackendType, create_store
+    
+    tiered = TieredStore(mode=spec.mode, promote=spec.promote, promote_after=spec.promote_after)
+    for level in spec.levels:
+        if level.backend == 'sharded':
+            from .sharding import build_sharded_store
+            tiered.add_tier(level.name, build_sharded_store(sharding, replication), level.setup_overrides)
+            continue
+        backend = BackendType(level.backend)
+        options = dict(level.options)
+        if backend == BackendType.LOCAL:
+            options.setdefault('on_evict', tiered.demotion_handler(len(tiered.tiers)))
+        tiered.add_tier(level.name, create_store(backend, **options), level.setup_overrides)
+    return tiered
@@ -2,7 +2,7 @@
 Utility functions for the KV Cache API layer.
 """
 
-from typing import Optional
+from typing import Optional, Any, List
 from .backends import BackendType
 from .exceptions import StoreInitializationError
 from .config import KVCacheConfig
@@ -123,10 +123,75 @@ def create_store_from_config(config: KVCacheConfig):
         StoreInitializationError: If setup fails
     """
     from .backends import create_store
+    from .backends.local import LocalStore
     
-    backend_type = config.get_backend_type()
-    store = create_store(backend_type)
+    # Values evicted or expired below the L1 cache must not stay in it;
+    # the cache is created last, so the hook looks it up when called
+    l1: List[Any] = []
+    
+    def drop_from_l1(key: str, view: Any = None) -> None:
+        if l1:
+            l1[0].invalidate([key])
+    
+    on_evict = drop_from_l1 if config.l1_cache is not None else None
+    
+    if config.tiering is not None:
+        from .tier import build_tiered_store
+        store = build_tiered_store(config.tiering, config.sharding, config.replication)
+    elif config.sharding is not None:
+        from .sharding import build_sharded_store
+        store = build_sharded_store(config.sharding, config.replication)
+    else:
+        backend = config.get_backend_type()
+        if config.eviction is not None and backend == BackendType.LOCAL:
+            # The arena applies the hints and policy itself
+            store = create_store(backend, eviction_policy=config.eviction.policy, on_evict=on_evict)
+        elif backend == BackendType.LOCAL:
+            store = create_store(backend, on_evict=on_evict)
+        else:
+            store = create_store(backend)
     get_client_with_config(store, config)
+    
+    # Other stores get TTLs, pins and the policy emulated with metadata
+    if config.eviction is not None and not isinstance(store, LocalStore):
+        from .eviction import EvictingStore
+        store = EvictingStore(store,
+                              policy=config.eviction.policy,
+                              capacity_bytes=config.eviction.capacity_bytes,
+                              on_evict=on_evict)
+    
+    if config.compression is not None:
+        from .codec import CompressedStore
+        store = CompressedStore(store,
+                                codec=config.compression.codec,
+                                level=config.compression.level,
+                                shuffle=config.compression.shuffle,
+                                min_size=config.compression.min_size)
+    
+    # Queued writes are compressed by the writer, off the caller's path
+    if config.write_behind is not None:
+        from .writebehind import WriteBehindStore
+        spec = config.write_behind
+        store = WriteBehindStore(store,
+                                 max_batch_items=spec.max_batch_items,
+                                 max_batch_bytes=spec.max_batch_bytes,
+                                 max_delay=spec.max_delay_ms / 1000,
+                                 max_queued_bytes=spec.max_queued_bytes,
+                                 put_timeout=None if spec.put_timeout_ms is None else spec.put_timeout_ms / 1000)
+    
+    # The L1 cache sits above compression so hits skip decoding too
+    if config.l1_cache is not None:
+        from .cache import CachingStore
+        store = CachingStore(store,
+                             capacity_bytes=config.l1_cache.capacity_bytes,
+                             policy=config.l1_cache.policy,
+                             max_item_size=config.l1_cache.max_item_size)
+        l1.append(store)
+    
+    # Outermost, so latencies are the ones callers see
+    if config.enable_metrics:
+        from .metrics import InstrumentedStore
+        store = InstrumentedStore(store)
     return store
 
 
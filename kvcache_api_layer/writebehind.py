@@ -0,0 +1,570 @@
+"""
+Write-behind put queue for the KV Cache API layer.
+
+``put`` on a remote backend blocks until the store acknowledges, which puts
+every KV block written after prefill on the critical path.
+``WriteBehindStore`` makes ``put`` return as soon as the value is queued.
+A background writer gathers queued values into ``batch_put`` calls, sent
+once a batch is full or its oldest value has waited ``max_delay`` seconds.
+
+Queued values are held in memory up to ``max_queued_bytes``; beyond that
+``put`` blocks until the writer catches up. Reads of a queued key are
+served from the queue, ``flush()`` waits for everything queued before it,
+and ``put_async`` reports each key's final status.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, wait
+from typing import Union, Optional, Any, List, Dict, Callable, Tuple
+from .api import KVCacheStore, BatchValue, copy_into
+from .eviction import check_hints
+from .exceptions import StorageError
+
+StatusCallback = Callable[[str, int], None]
+
+
+class _Write:
+    """One queued value and everyone waiting for it to be written."""
+    
+    __slots__ = ('key', 'data', 'hints', 'enqueued', 'waiters')
+    
+    def __init__(self, key: str, data: bytes, hints: Optional[Dict[str, Any]], enqueued: float):
+        self.key = key
+        self.data = data
+        # ``put_with_hints`` keyword arguments, None for a plain put
+        self.hints = hints
+        self.enqueued = enqueued
+        self.waiters: List[Tuple[Future, Optional[StatusCallback]]] = []
+
+
+class WriteBehindStore(KVCacheStore):
+    """
+    ``KVCacheStore`` decorator that writes puts in the background.
+    
+    ``put``, ``put_from`` and ``batch_put`` copy the values, queue them and
+    return 0; a non-zero status means the value was not queued. The final
+    status of each write is reported through ``put_async`` futures and the
+    ``on_complete`` callback. A key put again while queued is written once,
+    with the newest value, and all its puts get that write's status.
+    
+    A single writer sends the batches in order, so writes of a key reach the
+    wrapped store in the order they were made. ``remove`` drops a queued
+    value instead of writing it, and waits for a write of the key that is
+    already under way, so the value does not reappear after the remove.
+    
+    Values queued with ``put_with_hints`` are written with their hints, one
+    call each; their TTL counts from when they are written.
+    """
+    
+    def __init__(self,
+                 store: KVCacheStore,
+                 max_batch_items: int = 64,
+                 max_batch_bytes: int = 64 * 1024 * 1024,
+                 max_delay: float = 0.005,
+                 max_queued_bytes: int = 256 * 1024 * 1024,
+                 put_timeout: Optional[float] = None,
+                 on_complete: Optional[StatusCallback] = None):
+        """
+        Wrap a store with a write-behind queue.
+        
+        Args:
+            store: The store to write to
+            max_batch_items: Maximum number of values per ``batch_put``
+            max_batch_bytes: A batch is sent once its values reach this
+                             size; a single larger value is sent alone
+            max_delay: Seconds a value may wait for its batch to fill
+            max_queued_bytes: Memory budget for queued and in-flight values.
+                              ``put`` blocks while it is exhausted; a value
+                              larger than the budget waits for an empty queue
+            put_timeout: Seconds ``put`` may block on the budget before it
+                         gives up and returns -1; None waits indefinitely
+            on_complete: Called as ``on_complete(key, status)`` from the
+                         writer thread once each queued value is written
+                         or has failed. It must not wait on this store's
+                         budget, e.g. by calling ``put``
+            
+        Raises:
+            ValueError: If a limit is not positive
+        """
+        if max_batch_items <= 0:
+            raise ValueError("max_batch_items must be positive")
+        if max_batch_bytes <= 0:
+            raise ValueError("max_batch_bytes must be positive")
+        if max_delay < 0:
+            raise ValueError("max_delay must not be negative")
+        if max_queued_bytes <= 0:
+            raise ValueError("max_queued_bytes must be positive")
+        
+        self._store = store
+        self._max_batch_items = max_batch_items
+        self._max_batch_bytes = max_batch_bytes
+        self._max_delay = max_delay
+        self._max_queued_bytes = max_queued_bytes
+        self._put_timeout = put_timeout
+        self._on_complete = on_complete
+        
+        self._cond = threading.Condition()
+        # Values not picked up by the writer yet, oldest first
+        self._queue: "OrderedDict[str, _Write]" = OrderedDict()
+        # Values in the batch being written
+        self._writing: Dict[str, _Write] = {}
+        # Bytes of queued and in-flight values, counted against the budget
+        self._held_bytes = 0
+        self._queued_bytes = 0
+        # Callers blocked in ``flush`` or on the budget; the writer stops
+        # waiting for batches to fill while there are any
+        self._waiting = 0
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+        
+        self._enqueued = 0
+        self._overwritten = 0
+        self._batches = 0
+        self._written = 0
+        self._failed = 0
+        self._blocked = 0
+        self._rejected = 0
+        self._callback_errors = 0
+    
+    # Queue
+    
+    def _check_open(self) -> None:
+        if self._closed:
+            raise StorageError("WriteBehindStore is closed")
+    
+    def _lookup(self, key: str) -> Optional[bytes]:
+        """The newest queued or in-flight value of a key, if any."""
+        with self._cond:
+            write = self._queue.get(key) or self._writing.get(key)
+            return write.data if write is not None else None
+    
+    def _enqueue(self, key: str, data: bytes, hints: Optional[Dict[str, Any]],
+                 callback: Optional[StatusCallback]) -> Future:
+        """
+        Queue a value, blocking while the memory budget is exhausted.
+        
+        Returns:
+            A future of the write's status; already -1 if the value could
+            not be queued within ``put_timeout``
+        """
+        future: Future = Future()
+        size = len(data)
+        deadline = None if self._put_timeout is None else time.monotonic() + self._put_timeout
+        with self._cond:
+            self._check_open()
+            blocked = False
+            rejected = False
+            try:
+                while True:
+                    replaced = self._queue.get(key)
+                    freed = len(replaced.data) if replaced is not None else 0
+                    empty = not self._queue and not self._writing
+                    if empty or self._held_bytes + size - freed <= self._max_queued_bytes:
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._rejected += 1
+                        rejected = True
+                        break
+                    if not blocked:
+                        blocked = True
+                        self._blocked += 1
+                        self._waiting += 1
+                        self._start_writer()
+                        self._cond.notify_all()
+                    self._cond.wait(remaining)
+                    self._check_open()
+            finally:
+                if blocked:
+                    self._waiting -= 1
+            
+            if not rejected:
+                write = _Write(key, data, hints, time.monotonic())
+                if replaced is not None:
+                    # Keep the older value's place and age in the queue
+                    write.enqueued = replaced.enqueued
+                    write.waiters = replaced.waiters
+                    self._overwritten += 1
+                write.waiters.append((future, callback))
+                self._queue[key] = write
+                self._held_bytes += size - freed
+                self._queued_bytes += size - freed
+                self._enqueued += 1
+                self._start_writer()
+                self._cond.notify_all()
+                return future
+        
+        self._resolve(key, [(future, callback)], -1)
+        return future
+    
+    def _start_writer(self) -> None:
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run, name="kvcache-write-behind", daemon=True)
+            self._writer.start()
+    
+    def _due(self, now: float) -> bool:
+        """Whether the writer should send a batch now; called with the lock held."""
+        if not self._queue:
+            return False
+        if self._closed or self._waiting:
+            return True
+        if len(self._queue) >= self._max_batch_items or self._queued_bytes >= self._max_batch_bytes:
+            return True
+        oldest = next(iter(self._queue.values()))
+        return now - oldest.enqueued >= self._max_delay
+    
+    def _take_batch(self) -> List[_Write]:
+        batch: List[_Write] = []
+        size = 0
+        while self._queue and len(batch) < self._max_batch_items:
+            write = next(iter(self._queue.values()))
+            if batch and size + len(write.data) > self._max_batch_bytes:
+                break
+            del self._queue[write.key]
+            self._writing[write.key] = write
+            self._queued_bytes -= len(write.data)
+            size += len(write.data)
+            batch.append(write)
+        return batch
+    
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    if self._due(now):
+                        break
+                    if self._closed and not self._queue:
+                        return
+                    timeout = None
+                    if self._queue:
+                        oldest = next(iter(self._queue.values()))
+                        timeout = max(0.0, oldest.enqueued + self._max_delay - now)
+                    self._cond.wait(timeout)
+                batch = self._take_batch()
+            
+            statuses = self._write(batch)
+            
+            with self._cond:
+                for write, status in zip(batch, statuses):
+                    del self._writing[write.key]
+                    self._held_bytes -= len(write.data)
+                    if status == 0:
+                        self._written += 1
+                    else:
+                        self._failed += 1
+                self._batches += 1
+                self._cond.notify_all()
+            for write, status in zip(batch, statuses):
+                self._resolve(write.key, write.waiters, status)
+    
+    def _write(self, batch: List[_Write]) -> List[int]:
+        """Send a batch to the wrapped store; one status per value."""
+        plain = [i for i, write in enumerate(batch) if write.hints is None]
+        statuses = [-1] * len(batch)
+        if plain:
+            try:
+                results = self._store.batch_put([batch[i].key for i in plain], [batch[i].data for i in plain])
+            except Exception:
+                results = [-1] * len(plain)
+            for i, status in zip(plain, results):
+                statuses[i] = status
+        for i, write in enumerate(batch):
+            if write.hints is not None:
+                try:
+                    statuses[i] = self._store.put_with_hints(write.key, write.data, **write.hints)
+                except Exception:
+                    statuses[i] = -1
+        return statuses
+    
+    def _resolve(self, key: str, waiters: List[Tuple[Future, Optional[StatusCallback]]], status: int) -> None:
+        """Report a write's status; a failing callback must not stop the writer."""
+        callbacks = [cb for _, cb in waiters if cb is not None]
+        if self._on_complete is not None:
+            callbacks.append(self._on_complete)
+        for future, _ in waiters:
+            future.set_result(status)
+        for callback in callbacks:
+            try:
+                callback(key, status)
+            except Exception:
+                with self._cond:
+                    self._callback_errors += 1
+    
+    def _drop(self, keys: List[str]) -> List[bool]:
+        """
+        Drop queued values of ``keys`` and wait for in-flight writes of them.
+        
+        Returns:
+            Per key, whether a queued value was dropped
+        """
+        dropped = []
+        with self._cond:
+            removed = []
+            for key in keys:
+                write = self._queue.pop(key, None)
+                dropped.append(write is not None)
+                if write is not None:
+                    self._held_bytes -= len(write.data)
+                    self._queued_bytes -= len(write.data)
+                    removed.append(write)
+            while any(key in self._writing for key in keys):
+                self._cond.wait()
+            if removed:
+                self._cond.notify_all()
+        # The value was superseded by the remove, so its put succeeded
+        for write in removed:
+            self._resolve(write.key, write.waiters, 0)
+        return dropped
+    
+    # KVCacheStore interface
+    
+    def setup(self,
+              local_hostname: str,
+              metadata_server: str,
+              global_segment_size: int,
+              local_buffer_size: int,
+              protocol: str = "tcp",
+              device_name: str = "lo",
+              master_server_address: Optional[str] = None) -> int:
+        """Set up the wrapped store."""
+        return self._store.setup(local_hostname, metadata_server, global_segment_size,
+                                 local_buffer_size, protocol, device_name,
+                                 master_server_address)
+    
+    def put_async(self, key: str, *values: Union[bytes, bytearray],
+                  callback: Optional[StatusCallback] = None) -> Future:
+        """
+        Queue a value and return a future of its write status.
+        
+        Args:
+            key: The key to store
+            *values: One or more parts, stored as one value like ``put``
+            callback: Called as ``callback(key, status)`` once the value is
+                      written or has failed
+            
+        Returns:
+            A future resolving to 0 once the wrapped store has the value,
+            or to a non-zero status if the write failed or the value could
+            not be queued
+            
+        Raises:
+            StorageError: If the store is closed
+        """
+        return self._enqueue(key, self._copy(values), None, callback)
+    
+    @staticmethod
+    def _copy(values: tuple) -> bytes:
+        """Join the parts of a value, so the caller may reuse its buffers."""
+        if not values:
+            raise ValueError("At least one value must be provided")
+        if len(values) == 1 and isinstance(values[0], bytes):
+            return values[0]
+        return b"".join(values)
+    
+    def put(self, key: str, *values: Union[bytes, bytearray]) -> int:
+        """
+        Queue a value for writing.
+        
+        Returns:
+            0 once the value is queued, -1 if it could not be queued within
+            ``put_timeout``
+        """
+        future = self.put_async(key, *values)
+        return future.result() if future.done() else 0
+    
+    def put_with_hints(self, key: str, *values: Union[bytes, bytearray],
+                       ttl: Optional[float] = None, priority: int = 0, pin: bool = False) -> int:
+        """Queue a value to be written with ``put_with_hints``; returns as ``put``."""
+        check_hints(ttl, priority)
+        hints = {'ttl': ttl, 'priority': priority, 'pin': pin}
+        future = self._enqueue(key, self._copy(values), hints, None)
+        return future.result() if future.done() else 0
+    
+    def put_from(self, key: str, *buffers: Any) -> int:
+        """Copy buffer-protocol slices into the queue as one value."""
+        if not buffers:
+            raise ValueError("At least one buffer must be provided")
+        return self.put(key, *[memoryview(b) for b in buffers])
+    
+    def get(self, key: str) -> bytes:
+        """Retrieve a value, from the queue if it has not been written yet."""
+        data = self._lookup(key)
+        if data is not None:
+            return data
+        return self._store.get(key)
+    
+    def get_buffer(self, key: str) -> Optional[Any]:
+        """Get a buffer for the value, from the queue if it has not been written yet."""
+        data = self._lookup(key)
+        if data is not None:
+            return data
+        return self._store.get_buffer(key)
+    
+    def get_into(self, key: str, out: Any) -> int:
+        """Read a value into ``out``, from the queue if it has not been written yet."""
+        data = self._lookup(key)
+        if data is not None:
+            return copy_into(data, out)
+        return self._store.get_into(key, out)
+    
+    def get_size(self, key: str) -> int:
+        """Get the size of a value, from the queue if it has not been written yet."""
+        data = self._lookup(key)
+        if data is not None:
+            return len(data)
+        return self._store.get_size(key)
+    
+    def is_exist(self, key: str) -> int:
+        """Check existence, answering queued keys locally."""
+        if self._lookup(key) is not None:
+            return 1
+        return self._store.is_exist(key)
+    
+    def remove(self, key: str) -> int:
+        """
+        Remove a key, dropping its queued value.
+        
+        Returns:
+            The wrapped store's status, or 0 if only a queued value existed
+        """
+        dropped, = self._drop([key])
+        status = self._store.remove(key)
+        return 0 if dropped else status
+    
+    def batch_put(self, keys: List[str], values: List[BatchValue]) -> List[int]:
+        """Queue multiple values; one status per key as for ``put``."""
+        if len(keys) != len(values):
+            raise ValueError("keys and values must have the same length")
+        
+        results = []
+        for key, value in zip(keys, values):
+            parts = value if isinstance(value, (list, tuple)) else (value,)
+            results.append(self.put(key, *parts))
+        return results
+    
+    def batch_get(self, keys: List[str]) -> List[bytes]:
+        """Serve queued keys from the queue and fetch the rest in one batch."""
+        results: List[Optional[bytes]] = [self._lookup(key) for key in keys]
+        miss_idx = [i for i, value in enumerate(results) if value is None]
+        if miss_idx:
+            fetched = self._store.batch_get([keys[i] for i in miss_idx])
+            for i, value in zip(miss_idx, fetched):
+                results[i] = value
+        return results
+    
+    def batch_get_into(self, keys: List[str], outs: List[Any]) -> List[int]:
+        """Serve queued keys from the queue and fetch the rest in one batch."""
+        if len(keys) != len(outs):
+            raise ValueError("keys and outs must have the same length")
+        
+        results = [0] * len(keys)
+        miss_idx = []
+        for i, key in enumerate(keys):
+            data = self._lookup(key)
+            if data is None:
+                miss_idx.append(i)
+            else:
+                results[i] = copy_into(data, outs[i])
+        
+        if miss_idx:
+            fetched = self._store.batch_get_into([keys[i] for i in miss_idx],
+                                                 [outs[i] for i in miss_idx])
+            for i, written in zip(miss_idx, fetched):
+                results[i] = written
+        return results
+    
+    def batch_is_exist(self, keys: List[str]) -> List[int]:
+        """Answer queued keys locally and check the rest in one batch."""
+        results: List[Optional[int]] = [1 if self._lookup(key) is not None else None for key in keys]
+        miss_idx = [i for i, value in enumerate(results) if value is None]
+        if miss_idx:
+            fetched = self._store.batch_is_exist([keys[i] for i in miss_idx])
+            for i, value in zip(miss_idx, fetched):
+                results[i] = value
+        return results
+    
+    def batch_remove(self, keys: List[str]) -> List[int]:
+        """Remove multiple keys, dropping their queued values."""
+        dropped = self._drop(keys)
+        statuses = self._store.batch_remove(keys)
+        return [0 if d else status for d, status in zip(dropped, statuses)]
+    
+    def register_buffer(self, buffer: Any) -> int:
+        """Register a buffer with the wrapped store."""
+        return self._store.register_buffer(buffer)
+    
+    def unregister_buffer(self, buffer: Any) -> int:
+        """Unregister a buffer from the wrapped store."""
+        return self._store.unregister_buffer(buffer)
+    
+    def close(self) -> int:
+        """Write all queued values, then close the wrapped store."""
+        with self._cond:
+            self._check_open()
+            self._closed = True
+            writer = self._writer
+            self._cond.notify_all()
+        if writer is not None:
+            writer.join()
+        return self._store.close()
+    
+    # Queue management
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every value queued before this call has been written,
+        without waiting for batches to fill.
+        
+        Returns:
+            True if all of them finished within ``timeout``
+        """
+        with self._cond:
+            pending = [write.waiters[-1][0]
+                       for write in list(self._queue.values()) + list(self._writing.values())]
+            if not pending:
+                return True
+            self._waiting += 1
+            self._cond.notify_all()
+        try:
+            _, not_done = wait(pending, timeout=timeout)
+        finally:
+            with self._cond:
+                self._waiting -= 1
+        return not not_done
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get queue counters.
+        
+        Returns:
+            Dictionary with queued and queued_bytes (waiting for the
+            writer), writing (values in the batch being sent), held_bytes
+            (counted against max_queued_bytes), enqueued, overwritten
+            (puts merged into a queued value of the same key), batches,
+            avg_batch_items, written, failed, blocked (puts that waited on
+            the budget), rejected (puts that timed out) and callback_errors
+        """
+        with self._cond:
+            return {
+                'queued': len(self._queue),
+                'queued_bytes': self._queued_bytes,
+                'writing': len(self._writing),
+                'held_bytes': self._held_bytes,
+                'enqueued': self._enqueued,
+                'overwritten': self._overwritten,
+                'batches': self._batches,
+                'avg_batch_items': (self._written + self._failed) / self._batches if self._batches else 0.0,
+                'written': self._written,
+                'failed': self._failed,
+                'blocked': self._blocked,
+                'rejected': self._rejected,
+                'callback_errors': self._callback_errors,
+            }
+    
+    @property
+    def inner_store(self) -> KVCacheStore:
+        """The wrapped store."""
+        return self._store
@@ -0,0 +1,51 @@
+import threading
+
+from kvcache_api_layer.backends.local import LocalStore
+from kvcache_api_layer.cache import CachingStore
+
+
+class SlowReadStore(LocalStore):
+    """LocalStore whose reads signal ``reading`` and wait until ``gate`` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.reading = threading.Event()
+        self.gate = threading.Event()
+
+    def get(self, key):
+        value = super().get(key)
+        self.reading.set()
+        self.gate.wait(5)
+        return value
+
+
+def read_during(write):
+    inner = SlowReadStore()
+    assert inner.setup("localhost", "", 1024 * 1024, 0) == 0
+    cache = CachingStore(inner, capacity_bytes=1024 * 1024)
+    inner.gate.set()
+    assert cache.put("a", b"old") == 0
+    assert cache.put("b", b"b") == 0
+    inner.gate.clear()
+    result = []
+    reader = threading.Thread(target=lambda: result.append(cache.get("a")))
+    reader.start()
+    assert inner.reading.wait(5)
+    write(cache)
+    inner.gate.set()
+    reader.join()
+    assert result == [b"old"]
+    return cache
+
+
+def test_write_to_another_key_does_not_block_admission():
+    cache = read_during(lambda cache: cache.put("b", b"new"))
+    assert cache.keys() == ["a"]
+    cache.close()
+
+
+def test_write_to_the_read_key_blocks_admission():
+    cache = read_during(lambda cache: cache.put("a", b"new"))
+    assert cache.keys() == []
+    assert cache.get("a") == b"new"
+    cache.close()
@@ -0,0 +1,46 @@
+from kvcache_api_layer.backends.local import LocalStore
+from kvcache_api_layer.codec import CompressedStore
+
+
+class CountingStore(LocalStore):
+    """LocalStore that counts full value reads."""
+
+    def __init__(self):
+        super().__init__(page_size=64 * 1024)
+        self.reads = 0
+
+    def get(self, key):
+        self.reads += 1
+        return super().get(key)
+
+    def get_buffer(self, key):
+        self.reads += 1
+        return super().get_buffer(key)
+
+
+def make_store():
+    inner = CountingStore()
+    assert inner.setup("localhost", "", 1024 * 1024, 0) == 0
+    return inner, CompressedStore(inner, codec="zlib", min_size=0)
+
+
+def test_get_size_does_not_read_values_it_wrote():
+    inner, store = make_store()
+    value = b"\x00\x01" * 8192
+    assert store.put("k", value) == 0
+    assert store.get_size("k") == len(value)
+    assert inner.reads == 0
+    store.close()
+
+
+def test_get_size_follows_writes_through_another_handle():
+    inner, store = make_store()
+    other = CompressedStore(inner, codec="zlib", min_size=0)
+    assert store.put("k", b"a" * 1000) == 0
+    assert store.get_size("k") == 1000
+    assert other.put("k", bytes(range(256)) * 40) == 0
+    assert store.get_size("k") == 10240
+    assert store.get_size("missing") == -1
+    assert other.remove("k") == 0
+    assert store.get_size("k") == -1
+    store.close()
@@ -0,0 +1,50 @@
+import argparse
+import importlib.util
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("yaml")
+
+_PATH = os.path.join(os.path.dirname(__file__), "..", "entrypoint", "just_client.py")
+_spec = importlib.util.spec_from_file_location("just_client", _PATH)
+just_client = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(just_client)
+
+CONFIG = {
+    'local_hostname': "localhost",
+    'contribute_to_cluster_pool_size': 16 * 1024 * 1024,
+    'protocal': {'type': "tcp"},
+    'log_level': "INFO",
+    'backend': "local",
+    'mooncake_spec': {
+        'local_buffer_size': 1024 * 1024,
+        'metadata_server': "127.0.0.1:2379",
+        'master_server_address': "127.0.0.1:50051",
+    },
+    'compression': {'codec': "zlib"},
+}
+
+
+def start_node(spill_dir):
+    args = argparse.Namespace(spill_dir=str(spill_dir), spill_max_bytes=None,
+                              drain_delay=0.0, drain_timeout=10.0, metrics_port=0)
+    node = just_client.ServerNode(args, dict(CONFIG), threading.Event())
+    node._setup()
+    assert node.state == just_client.READY
+    return node
+
+
+def test_spill_and_restore_round_trip(tmp_path):
+    value = b"kvcache block " * 500
+    node = start_node(tmp_path / "spill")
+    assert node.store.put("k", value) == 0
+    node.drain()
+
+    node = start_node(tmp_path / "spill")
+    node.warm_thread.join(10)
+    try:
+        assert node.store.get("k") == value
+    finally:
+        node.drain()
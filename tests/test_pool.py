@@ -0,0 +1,34 @@
+from kvcache_api_layer.config import KVCacheConfig
+from kvcache_api_layer.pool import get_store_pool
+
+CONFIG = {
+    'local_hostname': "localhost",
+    'contribute_to_cluster_pool_size': 16 * 1024 * 1024,
+    'protocal': {'type': "tcp"},
+    'log_level': "INFO",
+    'backend': "local",
+    'mooncake_spec': {
+        'local_buffer_size': 1024 * 1024,
+        'metadata_server': "127.0.0.1:2379",
+        'master_server_address': "127.0.0.1:50051",
+    },
+    'l1_cache': {'capacity_bytes': 1024 * 1024},
+}
+
+
+def test_config_pool_checkouts_share_one_store():
+    pool = get_store_pool(KVCacheConfig(dict(CONFIG)))
+    try:
+        a = pool.checkout()
+        b = pool.checkout()
+        assert a is not b
+        assert a.inner_store is b.inner_store
+        assert a.put("k", b"v") == 0
+        assert b.get("k") == b"v"
+
+        # Releasing a handle leaves the shared store usable
+        pool.checkin(a, discard=True)
+        assert b.get("k") == b"v"
+        pool.checkin(b)
+    finally:
+        pool.close()
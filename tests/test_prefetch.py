@@ -0,0 +1,41 @@
+import threading
+
+from kvcache_api_layer.backends.local import LocalStore
+from kvcache_api_layer.prefetch import PrefetchingStore
+
+
+class GatedStore(LocalStore):
+    """LocalStore whose puts wait until ``gate`` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+
+    def put(self, key, *values):
+        self.entered.set()
+        self.gate.wait(5)
+        return super().put(key, *values)
+
+
+def test_prefetch_during_write_does_not_keep_old_value():
+    remote = GatedStore()
+    store = PrefetchingStore(remote, LocalStore())
+    assert store.setup("localhost", "", 1024 * 1024, 0) == 0
+    store.put("k", b"old")
+
+    remote.gate.clear()
+    remote.entered.clear()
+    writer = threading.Thread(target=store.put, args=("k", b"new"))
+    writer.start()
+    try:
+        assert remote.entered.wait(5)
+        # Runs after the write invalidated the key but before it landed
+        assert store.prefetch(["k"]).wait(5)
+    finally:
+        remote.gate.set()
+    writer.join()
+
+    assert store.get("k") == b"new"
+    store.close()
@@ -0,0 +1,77 @@
+import time
+
+from kvcache_api_layer.backends.local import LocalStore
+from kvcache_api_layer.replication import ReplicatedStore
+
+
+class BatchCountingStore(LocalStore):
+    """LocalStore that counts calls and can be made slow."""
+
+    def __init__(self):
+        super().__init__(page_size=64 * 1024)
+        self.calls = []
+        self.delay = 0.0
+
+    def get(self, key):
+        self.calls.append("get")
+        return super().get(key)
+
+    def put(self, key, *values):
+        self.calls.append("put")
+        return super().put(key, *values)
+
+    def batch_get(self, keys):
+        self.calls.append("batch_get")
+        time.sleep(self.delay)
+        return super().batch_get(keys)
+
+    def batch_put(self, keys, values):
+        self.calls.append("batch_put")
+        return super().batch_put(keys, values)
+
+
+def make_store(**kwargs):
+    stores = {name: BatchCountingStore() for name in ("a", "b", "c")}
+    replicated = ReplicatedStore(stores, replicas=2, **kwargs)
+    assert replicated.setup("localhost", "", 1024 * 1024, 0) == 0
+    return replicated, stores
+
+
+def test_batches_go_to_each_store_once():
+    replicated, stores = make_store()
+    keys = [f"k{i}" for i in range(32)]
+    assert replicated.batch_put(keys, [k.encode() for k in keys]) == [0] * 32
+    assert replicated.batch_get(keys + ["missing"]) == [k.encode() for k in keys] + [b""]
+    assert replicated.batch_is_exist(["k0", "missing"]) == [1, 0]
+    for store in stores.values():
+        assert "put" not in store.calls and "get" not in store.calls
+        assert store.calls.count("batch_put") == 1
+    assert replicated.batch_remove(keys) == [0] * 32
+    assert replicated.batch_is_exist(keys) == [0] * 32
+    replicated.close()
+
+
+def test_slow_replica_is_hedged_per_batch():
+    replicated, stores = make_store(hedge_delay=0.01)
+    keys = [f"k{i}" for i in range(32)]
+    assert replicated.batch_put(keys, [k.encode() for k in keys]) == [0] * 32
+    slow = stores["a"]
+    slow.delay = 1.0
+    start = time.perf_counter()
+    assert replicated.batch_get(keys) == [k.encode() for k in keys]
+    assert time.perf_counter() - start < 0.5
+    assert replicated.stats()["hedge_wins"] > 0
+    slow.delay = 0.0
+    replicated.close()
+
+
+def test_write_quorum_is_applied_per_key():
+    replicated, stores = make_store(write_quorum=1)
+    for store in stores.values():
+        store.close()
+    stores["a"].setup("localhost", "", 1024 * 1024, 0)
+    keys = [f"k{i}" for i in range(32)]
+    on_a = [k for k in keys if "a" in replicated.placements(k)]
+    results = dict(zip(keys, replicated.batch_put(keys, [b"v"] * 32)))
+    assert on_a and all(results[k] == 0 for k in on_a)
+    assert all(results[k] != 0 for k in keys if k not in on_a)
@@ -0,0 +1,95 @@
+import os
+import subprocess
+import sys
+import threading
+import uuid
+
+import pytest
+
+from kvcache_api_layer.backends.shm import SharedMemoryStore, _ALLOC_LOCK
+
+pytestmark = pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="needs /dev/shm")
+
+
+@pytest.fixture
+def name():
+    name = f"kvcache_test_{uuid.uuid4().hex[:12]}"
+    yield name
+    SharedMemoryStore(name=name).destroy()
+    try:
+        os.unlink(f"/dev/shm/{name}.lock")
+    except FileNotFoundError:
+        pass
+
+
+def open_store(name):
+    store = SharedMemoryStore(name=name, expected_value_size=1024, lock_stripes=4)
+    assert store.setup("localhost", "", 0, 1024 * 1024) == 0
+    return store
+
+
+def locked_elsewhere(path, idx):
+    """Whether another process fails to take lock byte ``idx`` of ``path``."""
+    code = (
+        "import fcntl, os, sys\n"
+        f"fd = os.open({path!r}, os.O_RDWR)\n"
+        "try:\n"
+        f"    fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, {idx})\n"
+        "except OSError:\n"
+        "    sys.exit(1)\n"
+    )
+    return subprocess.run([sys.executable, "-c", code]).returncode == 1
+
+
+def test_stores_in_one_process_share_locks(name):
+    first = open_store(name)
+    second = open_store(name)
+    try:
+        assert first._locks is second._locks
+
+        # A lock held through one store excludes threads using the other
+        acquired = threading.Event()
+
+        def contend():
+            with second._locks.hold(_ALLOC_LOCK):
+                acquired.set()
+
+        thread = threading.Thread(target=contend)
+        with first._locks.hold(_ALLOC_LOCK):
+            thread.start()
+            assert not acquired.wait(0.2)
+
+            # Closing the other store must not drop the process's record lock
+            second.close()
+            assert locked_elsewhere(f"/dev/shm/{name}.lock", _ALLOC_LOCK)
+        thread.join()
+        assert acquired.is_set()
+    finally:
+        first.close()
+        second.close()
+
+
+def test_concurrent_writers_through_two_stores(name):
+    stores = [open_store(name), open_store(name)]
+    errors = []
+
+    def worker(store, tid):
+        try:
+            for i in range(200):
+                key = f"k{i % 16}"
+                value = bytes([tid]) * 512
+                assert store.put(key, value) == 0
+                got = store.get(key)
+                # Another writer may have replaced it, but never torn it
+                assert got == b"" or got == bytes([got[0]]) * 512
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(stores[t % 2], t)) for t in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for store in stores:
+        store.close()
+    assert not errors
@@ -0,0 +1,67 @@
+import threading
+
+from kvcache_api_layer.backends.local import LocalStore
+from kvcache_api_layer.tier import WRITE_BACK, TieredStore
+
+
+class GatedStore(LocalStore):
+    """LocalStore whose writes wait until ``gate`` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def put(self, key, *values):
+        self.gate.wait(5)
+        return super().put(key, *values)
+
+    def remove(self, key):
+        self.gate.wait(5)
+        return super().remove(key)
+
+
+def make_tiers():
+    top, lower = LocalStore(), GatedStore()
+    tiered = TieredStore(mode=WRITE_BACK, promote_after=1)
+    tiered.add_tier("memory", top)
+    tiered.add_tier("slow", lower)
+    assert tiered.setup("localhost", "", 1024 * 1024, 0) == 0
+    return tiered, top, lower
+
+
+def test_queued_remove_is_not_undone_by_promotion():
+    tiered, top, lower = make_tiers()
+    lower.gate.set()
+    tiered.put("k", b"old")
+    assert tiered.flush(5)
+    lower.gate.clear()
+    try:
+        assert tiered.remove("k") == 0
+        # The lower tier still holds the old value while its remove is queued
+        assert tiered.get("k") == b""
+        assert tiered.is_exist("k") == 0
+        assert tiered.batch_get(["k"]) == [b""]
+    finally:
+        lower.gate.set()
+    assert tiered.flush(5)
+    assert top.get("k") == b""
+    assert tiered.get("k") == b""
+    tiered.close()
+
+
+def test_stale_lower_value_does_not_replace_queued_put():
+    tiered, top, lower = make_tiers()
+    lower.gate.set()
+    tiered.put("k", b"old")
+    assert tiered.flush(5)
+    lower.gate.clear()
+    try:
+        tiered.put("k", b"new")
+        top.remove("k")
+        # Served from the top tier only, so the old lower value is not promoted
+        assert tiered.get("k") == b""
+    finally:
+        lower.gate.set()
+    assert tiered.flush(5)
+    assert tiered.get("k") == b"new"
+    tiered.close()